@@ -26,7 +26,13 @@ import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from legal_risk_analysis_agent import create_legal_risk_analysis_agent, DataRoom
-from data_room_indexer import DataRoomIndexer
+from data_room_indexer import (
+    DataRoomIndexer,
+    PageRenderCache,
+    detect_index_format,
+    read_data_room_index,
+    write_data_room_index,
+)
 from hitl_implementation import (
     create_agent_with_hitl,
     run_agent_with_hitl,
@@ -84,6 +90,9 @@ pending_approvals: Dict[str, Dict[str, Any]] = {}
 # Data room index cache
 data_room_index_cache: Optional[Dict] = None
 
+# Page images of lazily indexed documents, rendered when first requested
+page_render_cache = PageRenderCache(str(DATA_ROOM_DIR / "render_cache"))
+
 # ============================================================================
 # PYDANTIC MODELS
 # ============================================================================
@@ -163,12 +172,12 @@ manager = ConnectionManager()
 # ============================================================================
 
 def load_data_room_index() -> Optional[Dict]:
-    """Load the data room index from disk"""
+    """Load the data room index from disk (monolithic or sharded; pages of a sharded index load lazily)"""
     global data_room_index_cache
-    index_path = DATA_ROOM_DIR / "data_room_index.json"
-    if index_path.exists():
-        with open(index_path, 'r') as f:
-            data_room_index_cache = json.load(f)
+    if data_room_index_cache is not None:
+        return data_room_index_cache
+    if detect_index_format(DATA_ROOM_DIR) is not None:
+        data_room_index_cache = read_data_room_index(DATA_ROOM_DIR)
         return data_room_index_cache
     return None
 
@@ -285,8 +294,9 @@ async def list_documents():
         documents.append({
             "doc_id": doc["doc_id"],
             "summary": doc.get("summdesc", "No summary available"),
-            "page_count": len(doc.get("pages", [])),
-            "filename": doc.get("filename", doc["doc_id"])
+            "page_count": doc["page_count"] if "page_count" in doc else len(doc.get("pages", [])),
+            "filename": doc.get("filename", doc["doc_id"]),
+            "folder": doc.get("folder", "")
         })
 
     return {
@@ -302,12 +312,36 @@ async def get_document(doc_id: str):
     if not index:
         raise HTTPException(status_code=404, detail="Data room not found")
 
-    for doc in index.get("documents", []):
-        if doc["doc_id"] == doc_id:
-            return doc
+    doc = DataRoom(index).get_document(doc_id)
+    if doc is not None:
+        return dict(doc)
 
     raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
 
+@app.get("/api/documents/{doc_id}/pages/{page_num}/image")
+async def get_page_image(doc_id: str, page_num: int, dpi: Optional[int] = None):
+    """Get a page image, rendering it on demand for lazily indexed documents or a requested DPI"""
+    index = load_data_room_index()
+    if not index:
+        raise HTTPException(status_code=404, detail="Data room not found")
+
+    data_room = DataRoom(index, page_render_cache.render_document_page)
+    if data_room.get_document(doc_id) is None:
+        raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
+    if dpi is not None and not 36 <= dpi <= 600:
+        raise HTTPException(status_code=400, detail="dpi must be between 36 and 600")
+
+    # Rendering runs poppler; keep it off the event loop
+    page = (await asyncio.to_thread(data_room.get_document_pages_images, doc_id, [page_num], dpi))[0]
+    if "error" in page:
+        raise HTTPException(status_code=404, detail=page["error"])
+    if not page["page_image"] or not Path(page["page_image"]).exists():
+        raise HTTPException(status_code=404, detail=f"No image for page {page_num} of document {doc_id}")
+
+    media_types = {".png": "image/png", ".webp": "image/webp", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+    image_path = Path(page["page_image"])
+    return FileResponse(path=image_path, media_type=media_types.get(image_path.suffix.lower(), "application/octet-stream"))
+
 @app.post("/api/documents/upload")
 async def upload_documents(
     files: List[UploadFile] = File(...),
@@ -386,10 +420,8 @@ async def delete_document(doc_id: str):
         if doc["doc_id"] == doc_id:
             documents.pop(i)
 
-            # Save updated index
-            index_path = DATA_ROOM_DIR / "data_room_index.json"
-            with open(index_path, 'w') as f:
-                json.dump(index, f, indent=2)
+            # Save updated index in the format it was stored in
+            write_data_room_index(index, DATA_ROOM_DIR, detect_index_format(DATA_ROOM_DIR))
 
             # Clear cache
             global data_room_index_cache
@@ -443,7 +475,8 @@ async def start_analysis(request: AnalysisRequest, background_tasks: BackgroundT
                 approval_level=approval_config,
                 review_interface=AutoApproveInterface(),  # Auto-approve for web demo
                 reviewer_name="web_user",
-                enable_audit=True
+                enable_audit=True,
+                page_renderer=page_render_cache.render_document_page
             )
 
             await update_session_status(session_id, "running", 20, "Running analysis")
@@ -749,7 +782,7 @@ async def get_statistics():
     return {
         "documents": {
             "total": len(index.get("documents", [])) if index else 0,
-            "pages": sum(len(doc.get("pages", [])) for doc in index.get("documents", [])) if index else 0
+            "pages": sum(doc["page_count"] if "page_count" in doc else len(doc.get("pages", [])) for doc in index.get("documents", [])) if index else 0
         },
         "sessions": {
             "total": len(analysis_sessions),
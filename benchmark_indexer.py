@@ -0,0 +1,557 @@
+"""
+Data Room Indexer Benchmarks
+
+Builds synthetic data rooms and runs DataRoomIndexer over them end to end,
+with the offline StubSummarizer standing in for the model, so indexing
+performance can be measured reproducibly and compared between commits.
+
+The generator writes:
+1. Text PDFs with a real text layer
+2. Scanned-style PDFs holding one grayscale page image each
+3. Word documents (.docx, requires python-docx)
+4. Excel workbooks (.xlsx, requires openpyxl)
+
+Every scenario records wall time, pages per second, peak RSS, bytes written
+to the output folder and the per-stage timings of the indexer. Results are
+saved as JSON; pass an earlier results file with --compare to flag
+regressions.
+
+Usage:
+    python benchmark_indexer.py --text-pdfs 20 --scanned-pdfs 10 --pages 2-30 \\
+        --output benchmark_results.json --compare previous_results.json
+"""
+
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+
+# ============================================================================
+# SYNTHETIC DATA ROOM GENERATOR
+# ============================================================================
+
+WORDS = (
+    "agreement party parties shall indemnify warrant represent covenant term termination "
+    "notice breach remedy liability damages confidential information disclosure license "
+    "assignment governing law jurisdiction arbitration payment invoice fee schedule "
+    "delivery acceptance obligation consent amendment waiver severability force majeure "
+    "effective date exhibit annex schedule subsidiary affiliate employee consultant "
+    "intellectual property trademark patent copyright lease premises rent landlord tenant"
+).split()
+
+# Top-level folders the generated files are spread across
+FOLDERS = ("Corporate", "Finance", "Legal", "Commercial")
+
+# Scanned pages are rendered at 100 DPI on US letter paper
+SCAN_WIDTH = 850
+SCAN_HEIGHT = 1100
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _pdf_document(pages: List[Dict[str, Any]]) -> bytes:
+    """
+    Serialize a minimal PDF.
+
+    Args:
+        pages: One dict per page with its content stream ("content") and
+            optionally a grayscale image ("image": (width, height, pixels))
+            drawn as /Im1
+
+    Returns:
+        The PDF file contents
+    """
+    objects: List[bytes] = [b"", b""]  # catalog and page tree, filled in below
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    kids = []
+    for page in pages:
+        resources = f"/Font << /F1 {font} 0 R >>"
+        if page.get("image"):
+            width, height, pixels = page["image"]
+            data = zlib.compress(pixels)
+            image = add(
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode "
+                f"/Length {len(data)} >>\nstream\n".encode() + data + b"\nendstream"
+            )
+            resources += f" /XObject << /Im1 {image} 0 R >>"
+        content = page["content"]
+        contents = add(f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+        kids.append(add(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << {resources} >> /Contents {contents} 0 R >>".encode()
+        ))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>".encode()
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode()
+    return bytes(output)
+
+
+def write_text_pdf(path: Path, pages: int, rng: random.Random) -> None:
+    """Write a PDF whose pages carry about 45 lines of selectable text each."""
+    pdf_pages = []
+    for page_num in range(1, pages + 1):
+        lines = [f"Section {page_num}. {_sentence(rng, 4)}"]
+        lines += [_sentence(rng, rng.randint(7, 11)) for _ in range(44)]
+        text = " T* ".join(f"({_pdf_escape(line)}) Tj" for line in lines)
+        pdf_pages.append({"content": f"BT /F1 10 Tf 14 TL 60 740 Td {text} ET".encode()})
+    path.write_bytes(_pdf_document(pdf_pages))
+
+
+def write_scanned_pdf(path: Path, pages: int, rng: random.Random) -> None:
+    """
+    Write a PDF of page images without a text layer, like a scanner produces.
+
+    Pages are built from seeded rows of paper noise and of dark "text" runs,
+    so they compress, render and hash like real scans while every page
+    still differs from the others.
+    """
+    paper_rows = [bytes(rng.randint(228, 255) for _ in range(SCAN_WIDTH)) for _ in range(24)]
+    ink_rows = []
+    for _ in range(24):
+        row = bytearray(rng.choice(paper_rows))
+        x = 80
+        while x < SCAN_WIDTH - 80:
+            word = rng.randint(15, 70)
+            for column in range(x, min(x + word, SCAN_WIDTH - 80)):
+                row[column] = rng.randint(20, 90)
+            x += word + rng.randint(8, 14)
+        ink_rows.append(bytes(row))
+
+    pdf_pages = []
+    for _ in range(pages):
+        rows = []
+        lines = rng.randint(25, 45)
+        for y in range(SCAN_HEIGHT):
+            # Lines of text are 12 pixels high on a 22 pixel pitch below the top margin
+            in_text = 100 <= y < 100 + lines * 22 and (y - 100) % 22 < 12
+            rows.append(rng.choice(ink_rows) if in_text else rng.choice(paper_rows))
+        pdf_pages.append({
+            "content": b"q 612 0 0 792 0 0 cm /Im1 Do Q",
+            "image": (SCAN_WIDTH, SCAN_HEIGHT, b"".join(rows))
+        })
+    path.write_bytes(_pdf_document(pdf_pages))
+
+
+def write_docx(path: Path, pages: int, rng: random.Random) -> None:
+    """Write a Word document with a page break after each page of prose."""
+    import docx
+
+    document = docx.Document()
+    document.add_heading(_sentence(rng, 4).rstrip("."), level=1)
+    for page_num in range(pages):
+        if page_num:
+            document.add_page_break()
+        for _ in range(5):
+            document.add_paragraph(" ".join(_sentence(rng, rng.randint(8, 14)) for _ in range(5)))
+    document.save(str(path))
+
+
+def write_xlsx(path: Path, pages: int, rng: random.Random) -> None:
+    """Write a workbook with one sheet of ledger rows per page."""
+    import openpyxl
+
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet_num in range(1, pages + 1):
+        sheet = workbook.create_sheet(f"Schedule {sheet_num}")
+        sheet.append(["Date", "Counterparty", "Description", "Quantity", "Unit price", "Amount"])
+        for row in range(40):
+            quantity = rng.randint(1, 500)
+            price = round(rng.uniform(5, 5000), 2)
+            sheet.append([
+                f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                rng.choice(WORDS).title() + " Ltd",
+                _sentence(rng, 4),
+                quantity,
+                price,
+                round(quantity * price, 2)
+            ])
+    workbook.save(str(path))
+
+
+# Writer and file extension of each kind of generated document
+DOCUMENT_KINDS = {
+    "text_pdf": (write_text_pdf, ".pdf"),
+    "scanned_pdf": (write_scanned_pdf, ".pdf"),
+    "docx": (write_docx, ".docx"),
+    "xlsx": (write_xlsx, ".xlsx"),
+}
+
+
+def generate_data_room(
+    folder: str,
+    text_pdfs: int = 10,
+    scanned_pdfs: int = 5,
+    docx_files: int = 5,
+    xlsx_files: int = 3,
+    pages: Tuple[int, int] = (1, 20),
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Build a synthetic data room.
+
+    Files are spread across a few top-level folders and their page counts
+    are drawn uniformly from `pages`. The same arguments always produce the
+    same files, so benchmark runs on different commits index identical input.
+
+    Args:
+        folder: Folder to create the data room in (emptied first)
+        text_pdfs: Number of PDFs with a text layer
+        scanned_pdfs: Number of image-only PDFs
+        docx_files: Number of Word documents
+        xlsx_files: Number of Excel workbooks
+        pages: Smallest and largest page count per document
+        seed: Seed for page counts and contents
+
+    Returns:
+        Description of the data room: the arguments, file and page counts
+        per kind of document and the total size in bytes
+    """
+    root = Path(folder)
+    if root.exists():
+        shutil.rmtree(root)
+    root.mkdir(parents=True)
+
+    rng = random.Random(seed)
+    counts = {"text_pdf": text_pdfs, "scanned_pdf": scanned_pdfs, "docx": docx_files, "xlsx": xlsx_files}
+    by_kind: Dict[str, Dict[str, int]] = {}
+    for kind, count in counts.items():
+        writer, extension = DOCUMENT_KINDS[kind]
+        by_kind[kind] = {"files": count, "pages": 0}
+        for number in range(1, count + 1):
+            page_count = rng.randint(*pages)
+            subfolder = root / FOLDERS[(number - 1) % len(FOLDERS)]
+            subfolder.mkdir(exist_ok=True)
+            # Each file gets its own generator so counts of one kind don't
+            # change the contents of another
+            writer(subfolder / f"{kind}_{number:03d}{extension}", page_count, random.Random(rng.random()))
+            by_kind[kind]["pages"] += page_count
+
+    return {
+        "seed": seed,
+        "page_range": list(pages),
+        "files": sum(counts.values()),
+        "pages": sum(entry["pages"] for entry in by_kind.values()),
+        "bytes": folder_size(root),
+        "by_kind": by_kind
+    }
+
+
+# ============================================================================
+# BENCHMARK RUNNER
+# ============================================================================
+
+# Indexer constructor and build_data_room_index arguments of each scenario;
+# "engine_concurrency" adds an AsyncSummarizationEngine
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    "sequential": {},
+    "pipelined": {"build": {"pipelined": True}},
+    "batch_conversion": {"build": {"batch_conversion": True}},
+    "concurrent_summaries": {"engine_concurrency": 16},
+    "compressed_images": {"indexer": {"image_format": "auto", "trim_margins": True}},
+    "split_pages": {"indexer": {"split_workers": os.cpu_count() or 1}},
+    "native_office_files": {"indexer": {"native_extraction": True}},
+}
+
+
+def folder_size(folder: Path) -> int:
+    """Total size in bytes of the files below a folder."""
+    total = 0
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def peak_rss_bytes() -> Dict[str, Optional[int]]:
+    """
+    Peak resident set size of this process and of its largest child.
+
+    Children are worker processes, LibreOffice and poppler. Both values are
+    None where the resource module is unavailable (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return {"self": None, "children": None}
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    }
+
+
+def run_scenario(
+    name: str,
+    room_folder: str,
+    output_folder: str,
+    latency: float = 0.0,
+    seed: int = 0
+) -> Dict[str, Any]:
+    """
+    Index a data room once with the settings of one scenario.
+
+    Args:
+        name: Key of SCENARIOS
+        room_folder: Data room to index
+        output_folder: Fresh output folder for this run (emptied first)
+        latency: Seconds each stub model request takes
+        seed: Seed of the stub summarizer
+
+    Returns:
+        Documents and pages indexed, wall time, pages per second, peak RSS,
+        bytes written, model calls and the indexer's per-stage timings
+    """
+    from data_room_indexer import AsyncSummarizationEngine, DataRoomIndexer, StubSummarizer
+
+    scenario = SCENARIOS[name]
+    output = Path(output_folder)
+    if output.exists():
+        shutil.rmtree(output)
+
+    summarizer = StubSummarizer(latency=latency, seed=seed)
+    engine = None
+    if scenario.get("engine_concurrency"):
+        engine = AsyncSummarizationEngine(
+            max_concurrency=scenario["engine_concurrency"],
+            requests_per_minute=1_000_000,
+            tokens_per_minute=1_000_000_000
+        )
+    indexer = DataRoomIndexer(
+        input_folder=room_folder,
+        output_folder=str(output),
+        summarizer=summarizer,
+        summarization_engine=engine,
+        **scenario.get("indexer", {})
+    )
+
+    start = time.perf_counter()
+    data_room_index = indexer.build_data_room_index(**scenario.get("build", {}))
+    wall_seconds = time.perf_counter() - start
+
+    metrics = indexer.metrics.summary()
+    rss = peak_rss_bytes()
+    return {
+        "scenario": name,
+        "documents": len(data_room_index["documents"]),
+        "pages": metrics["pages"],
+        "wall_seconds": round(wall_seconds, 3),
+        "pages_per_second": round(metrics["pages"] / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+        "peak_rss_bytes": rss["self"],
+        "peak_child_rss_bytes": rss["children"],
+        "bytes_written": folder_size(output),
+        "model_calls": summarizer.usage()["calls"],
+        "stages": metrics["stages"],
+        "counters": metrics["counters"]
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Commit the benchmark runs against, if this is a git checkout."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_benchmarks(
+    room_folder: str,
+    work_folder: str,
+    scenarios: Optional[List[str]] = None,
+    latency: float = 0.0,
+    seed: int = 0,
+    isolate: bool = True
+) -> Dict[str, Any]:
+    """
+    Run several scenarios over the same data room.
+
+    Args:
+        room_folder: Data room to index
+        work_folder: Each scenario writes its output to a subfolder of this
+        scenarios: Keys of SCENARIOS to run (all by default)
+        latency: Seconds each stub model request takes
+        seed: Seed of the stub summarizer
+        isolate: Run each scenario in a fresh process, so peak RSS is
+            measured per scenario rather than as a high-water mark of the
+            whole benchmark
+
+    Returns:
+        The environment the benchmark ran in and one result per scenario
+    """
+    results = {}
+    for name in scenarios or list(SCENARIOS):
+        print(f"\n>>> Benchmark scenario: {name}")
+        args = (name, room_folder, str(Path(work_folder) / name), latency, seed)
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results[name] = executor.submit(run_scenario, *args).result()
+        else:
+            results[name] = run_scenario(*args)
+
+    return {
+        "created_at": datetime.now().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "summarizer_latency": latency,
+        "scenarios": results
+    }
+
+
+# Result fields compared between runs and whether higher values are better
+COMPARED_FIELDS = {
+    "wall_seconds": False,
+    "pages_per_second": True,
+    "peak_rss_bytes": False,
+    "bytes_written": False,
+}
+
+
+def compare_results(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float = 0.10
+) -> List[str]:
+    """
+    Find regressions between two benchmark results.
+
+    Args:
+        baseline: Earlier output of run_benchmarks
+        current: Newer output of run_benchmarks
+        tolerance: Relative change allowed before a field counts as regressed
+
+    Returns:
+        One description per regressed field of a scenario present in both runs
+    """
+    regressions = []
+    for name, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        for field, higher_is_better in COMPARED_FIELDS.items():
+            old, new = previous.get(field), result.get(field)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{name}: {field} {old} -> {new} ({change:+.1%})")
+    return regressions
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    """Print one line per scenario."""
+    print("\n" + "=" * 70)
+    print(f"Benchmark results (commit {results.get('commit') or 'unknown'})")
+    print("=" * 70)
+    print(f"{'scenario':<22}{'docs':>6}{'pages':>7}{'wall s':>9}{'pages/s':>9}{'RSS MB':>9}{'out MB':>9}")
+    for name, result in results["scenarios"].items():
+        rss = result["peak_rss_bytes"]
+        print(f"{name:<22}{result['documents']:>6}{result['pages']:>7}{result['wall_seconds']:>9.2f}"
+              f"{result['pages_per_second']:>9.2f}{(rss or 0) / 2**20:>9.1f}{result['bytes_written'] / 2**20:>9.1f}")
+
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Generate (or reuse) a data room, run the benchmarks and save the results."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark DataRoomIndexer on a synthetic data room")
+    parser.add_argument("--room", default="benchmark_data/room", help="Data room folder (generated if missing)")
+    parser.add_argument("--work", default="benchmark_data/runs", help="Folder for the indexer outputs")
+    parser.add_argument("--regenerate", action="store_true", help="Rebuild the data room even if it exists")
+    parser.add_argument("--text-pdfs", type=int, default=10)
+    parser.add_argument("--scanned-pdfs", type=int, default=5)
+    parser.add_argument("--docx", type=int, default=5)
+    parser.add_argument("--xlsx", type=int, default=3)
+    parser.add_argument("--pages", default="1-20", help="Page count range per document, e.g. 2-30")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per stub model request")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable; all by default)")
+    parser.add_argument("--no-isolate", action="store_true", help="Run all scenarios in this process")
+    parser.add_argument("--output", default="benchmark_results.json", help="Results JSON file")
+    parser.add_argument("--compare", help="Earlier results JSON file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    low, _, high = args.pages.partition("-")
+    pages = (int(low), int(high or low))
+
+    manifest_path = Path(args.room) / "benchmark_room.json"
+    if args.regenerate or not manifest_path.exists():
+        print(f"Generating data room in {args.room}...")
+        room = generate_data_room(
+            args.room, args.text_pdfs, args.scanned_pdfs, args.docx, args.xlsx, pages, args.seed
+        )
+        manifest_path.write_text(json.dumps(room, indent=2))
+    else:
+        room = json.loads(manifest_path.read_text())
+    print(f"Data room: {room['files']} files, {room['pages']} pages, {room['bytes'] / 2**20:.1f} MB")
+
+    results = run_benchmarks(
+        args.room, args.work, args.scenario, args.latency, args.seed, isolate=not args.no_isolate
+    )
+    results["data_room"] = room
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print_results(results)
+    print(f"\nResults saved to: {args.output}")
+
+    if args.compare:
+        regressions = compare_results(json.loads(Path(args.compare).read_text()), results, args.tolerance)
+        for line in regressions:
+            print(f"  ✗ Regression: {line}")
+        if regressions:
+            return 1
+        print("No regressions against", args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -14,14 +14,2219 @@ Process:
 
 import os
 import json
+import hashlib
+import queue
+import shutil
+import signal
 import subprocess
+import threading
+import time
+import fnmatch
+import heapq
+import weakref
+from collections.abc import Mapping
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import base64
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 import io
 
+try:
+    from pdf2image.exceptions import PDFPopplerTimeoutError
+except ImportError:
+    # pdf2image releases without the timeout error never raise it
+    class PDFPopplerTimeoutError(Exception):
+        """Placeholder for pdf2image's poppler timeout error."""
+
+
+# Marks the end of the work stream flowing through the pipeline queues
+_PIPELINE_DONE = object()
+
+# Marks a hard page break between the text blocks of a natively read document
+_PAGE_BREAK = object()
+
+
+def _completed_future(result: Any = None, exception: Optional[BaseException] = None) -> Future:
+    """Create an already-resolved future so pipeline stages can treat every item uniformly."""
+    future = Future()
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+    return future
+
+
+# Set in the threads of the pipelined summarization pool, whose size already
+# bounds how many model requests run at once
+_summary_worker = threading.local()
+
+
+def _init_summary_worker() -> None:
+    """Pool initializer marking a thread as a pipelined summarization worker."""
+    _summary_worker.active = True
+
+
+# Common install locations of soffice.exe on Windows
+WINDOWS_LIBREOFFICE_PATHS = [
+    r'C:\Program Files\LibreOffice\program\soffice.exe',
+    r'C:\Program Files (x86)\LibreOffice\program\soffice.exe',
+]
+
+
+def find_libreoffice_command() -> str:
+    """Determine the LibreOffice executable for the current OS."""
+    import platform
+    
+    if platform.system() == 'Windows':
+        # Try common Windows paths for soffice.exe
+        for path in WINDOWS_LIBREOFFICE_PATHS:
+            if Path(path).exists():
+                return path
+        # Try using PATH (command is 'soffice' on Windows)
+        return 'soffice'
+    
+    # Linux/Mac use 'libreoffice' command
+    return 'libreoffice'
+
+
+# ============================================================================
+# SUBPROCESS WATCHDOG
+# ============================================================================
+
+def _new_process_group() -> Dict[str, Any]:
+    """Popen arguments that start a command in a process group of its own."""
+    if os.name == 'nt':
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_group(process: subprocess.Popen) -> None:
+    """
+    Kill a process started with _new_process_group and everything it spawned.
+    
+    The `libreoffice` launcher runs soffice.bin as a child, so killing just
+    the launcher would leave a hung instance running (and holding its user
+    profile) after a timeout.
+    """
+    if os.name == 'nt':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True)
+    else:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    if process.poll() is None:
+        process.kill()
+    process.wait()
+
+
+def run_watched(
+    args: List[str],
+    timeout: Optional[float] = None,
+    check: bool = False,
+    capture_output: bool = False,
+    text: bool = False
+) -> subprocess.CompletedProcess:
+    """
+    Run a command like subprocess.run, killing its whole process group on timeout.
+    
+    Args:
+        args: Command and arguments
+        timeout: Seconds the command may run (None waits forever)
+        check: Raise CalledProcessError when the command fails
+        capture_output: Capture stdout and stderr
+        text: Decode the captured output as text
+        
+    Returns:
+        The finished process
+        
+    Raises:
+        subprocess.TimeoutExpired: The command was still running after timeout
+            seconds; it and its children have been killed
+    """
+    pipe = subprocess.PIPE if capture_output else None
+    with subprocess.Popen(args, stdout=pipe, stderr=pipe, text=text, **_new_process_group()) as process:
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_group(process)
+            raise
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, args, stdout, stderr)
+    return subprocess.CompletedProcess(args, process.returncode, stdout, stderr)
+
+
+def failure_kind(error: BaseException) -> str:
+    """
+    Classify why a document failed.
+    
+    Returns:
+        "timeout" for a LibreOffice or poppler call that was killed,
+        "crash" for one that exited with an error, otherwise "error"
+    """
+    if isinstance(error, (TimeoutError, subprocess.TimeoutExpired, PDFPopplerTimeoutError)):
+        return "timeout"
+    if isinstance(error, subprocess.CalledProcessError):
+        return "crash"
+    return "error"
+
+
+# ============================================================================
+# LIBREOFFICE CONVERSION SERVICE
+# ============================================================================
+
+# Profile slot of the conversion worker running in this thread; slot 0 is
+# the main thread's. Other threads outside worker pools borrow a numbered
+# slot and return it when they end. Its name includes the PID, since
+# processes sharing a profile folder number their threads independently.
+_conversion_worker = threading.local()
+_free_thread_slots: List[int] = []
+_thread_slot_count = 0
+_thread_slots_lock = threading.Lock()
+
+
+class _ThreadSlot:
+    """Profile slot borrowed by a thread, returned when the thread's locals are dropped."""
+    
+    def __init__(self):
+        global _thread_slot_count
+        with _thread_slots_lock:
+            if _free_thread_slots:
+                number = heapq.heappop(_free_thread_slots)
+            else:
+                number = _thread_slot_count
+                _thread_slot_count += 1
+        self.pid = os.getpid()
+        self.name = f"thread_{self.pid}_{number}"
+        weakref.finalize(self, _release_thread_slot, number)
+
+
+def _release_thread_slot(number: int) -> None:
+    with _thread_slots_lock:
+        heapq.heappush(_free_thread_slots, number)
+
+
+def _init_conversion_worker(slots) -> None:
+    """Pool initializer giving each conversion worker a profile slot of its own."""
+    _conversion_worker.profile_slot = slots.get()
+
+
+class LibreOfficeProfiles:
+    """
+    Private LibreOffice user profiles for concurrent headless conversions.
+    
+    soffice processes that share a user profile wait on its lock or exit
+    without converting anything, so every conversion worker gets a profile
+    directory of its own (passed with -env:UserInstallation). LibreOffice
+    takes several seconds to create a profile, so this is done once for a
+    seed profile that is copied for each worker. Profiles are kept in
+    `folder` and reused by later runs.
+    """
+    
+    def __init__(self, folder: str, timeout: float = 120.0, libreoffice_cmd: Optional[str] = None):
+        """
+        Args:
+            folder: Folder holding the seed and the worker profiles
+            timeout: Seconds LibreOffice may take to create the seed profile
+            libreoffice_cmd: LibreOffice executable (detected from the OS if omitted)
+        """
+        self.folder = Path(folder)
+        self.timeout = timeout
+        self.libreoffice_cmd = libreoffice_cmd
+    
+    @property
+    def seed_path(self) -> Path:
+        return self.folder / "seed"
+    
+    def is_seeded(self) -> bool:
+        return (self.seed_path / "user").is_dir()
+    
+    def seed(self) -> bool:
+        """
+        Create the seed profile, unless it already exists.
+        
+        Call this before starting concurrent workers. Without a seed each
+        worker's LibreOffice creates its profile on first use.
+        
+        Returns:
+            Whether a seed profile is available
+        """
+        if self.is_seeded():
+            return True
+        self.folder.mkdir(parents=True, exist_ok=True)
+        staging = self.folder / f"seed.{os.getpid()}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        try:
+            run_watched([
+                self.libreoffice_cmd or find_libreoffice_command(),
+                '--headless',
+                '--terminate_after_init',
+                f'-env:UserInstallation={staging.resolve().as_uri()}'
+            ], timeout=self.timeout, check=True, capture_output=True)
+            if not (staging / "user").is_dir():
+                raise RuntimeError("LibreOffice did not create a profile")
+            os.replace(staging, self.seed_path)
+        except Exception as e:
+            print(f"  Could not create a seed LibreOffice profile ({e}); each worker creates its own")
+            return False
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return True
+    
+    def profile(self, slot) -> Path:
+        """Profile folder of a worker slot, copied from the seed on first use."""
+        path = self.folder / (slot if isinstance(slot, str) else f"worker_{slot}")
+        if not path.exists() and self.is_seeded():
+            staging = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            shutil.copytree(self.seed_path, staging)
+            try:
+                os.replace(staging, path)
+            except OSError:
+                # Another process set the profile up first
+                shutil.rmtree(staging, ignore_errors=True)
+        return path
+    
+    def argument(self, slot=None) -> str:
+        """
+        The -env:UserInstallation argument for a worker slot.
+        
+        Args:
+            slot: Worker slot (defaults to the slot of the calling conversion worker)
+        """
+        if slot is None:
+            slot = getattr(_conversion_worker, "profile_slot", None)
+        if slot is None and threading.current_thread() is threading.main_thread():
+            slot = 0
+        elif slot is None:
+            thread_slot = getattr(_conversion_worker, "thread_slot", None)
+            if thread_slot is None or thread_slot.pid != os.getpid():
+                thread_slot = _conversion_worker.thread_slot = _ThreadSlot()
+            slot = thread_slot.name
+        return f'-env:UserInstallation={self.profile(slot).resolve().as_uri()}'
+
+
+class _LibreOfficeWorker:
+    """
+    A single warm headless LibreOffice instance listening on a UNO socket.
+    
+    Each worker owns its user profile directory, so several instances can
+    run side by side without fighting over the profile lock.
+    """
+    
+    # PDF export filter per document type, checked in order
+    EXPORT_FILTERS = [
+        ("com.sun.star.sheet.SpreadsheetDocument", "calc_pdf_Export"),
+        ("com.sun.star.presentation.PresentationDocument", "impress_pdf_Export"),
+        ("com.sun.star.drawing.DrawingDocument", "draw_pdf_Export"),
+        ("com.sun.star.text.TextDocument", "writer_pdf_Export"),
+    ]
+    
+    def __init__(self, libreoffice_cmd: str, port: int, profile_dir: Path, startup_timeout: float):
+        self.libreoffice_cmd = libreoffice_cmd
+        self.port = port
+        self.profile_dir = profile_dir
+        self.startup_timeout = startup_timeout
+        self.process = None
+        self.desktop = None
+    
+    def start(self) -> None:
+        """Launch the soffice process and connect to it over UNO."""
+        try:
+            import uno
+        except ImportError:
+            raise ImportError(
+                "The 'uno' module is required for the persistent conversion pool. "
+                "It ships with LibreOffice's Python (Ubuntu/Debian: sudo apt-get install python3-uno)."
+            )
+        
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.process = subprocess.Popen([
+            self.libreoffice_cmd,
+            '--headless',
+            '--invisible',
+            '--nologo',
+            '--norestore',
+            '--nodefault',
+            f'--accept=socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext',
+            f'-env:UserInstallation={self.profile_dir.resolve().as_uri()}'
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, **_new_process_group())
+        
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                context = resolver.resolve(
+                    f"uno:socket,host=127.0.0.1,port={self.port};urp;StarOffice.ComponentContext"
+                )
+                break
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"LibreOffice worker on port {self.port} failed to start")
+                time.sleep(0.25)
+        
+        self.desktop = context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", context
+        )
+    
+    def is_alive(self) -> bool:
+        """Whether the soffice process is still running."""
+        return self.process is not None and self.process.poll() is None
+    
+    def convert(self, file_path: Path, output_path: Path) -> Path:
+        """Load a document into this instance and export it as PDF."""
+        import uno
+        from com.sun.star.beans import PropertyValue
+        
+        def properties(**kwargs):
+            values = []
+            for name, value in kwargs.items():
+                prop = PropertyValue()
+                prop.Name = name
+                prop.Value = value
+                values.append(prop)
+            return tuple(values)
+        
+        document = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(str(file_path.resolve())), "_blank", 0, properties(Hidden=True)
+        )
+        if document is None:
+            raise RuntimeError(f"LibreOffice could not open {file_path.name}")
+        try:
+            export_filter = next(
+                (name for service, name in self.EXPORT_FILTERS if document.supportsService(service)),
+                "writer_pdf_Export"
+            )
+            document.storeToURL(
+                uno.systemPathToFileUrl(str(output_path.resolve())), properties(FilterName=export_filter)
+            )
+        finally:
+            document.close(True)
+        return output_path
+    
+    def stop(self) -> None:
+        """Kill the soffice process and anything it started."""
+        self.desktop = None
+        if self.process is not None:
+            kill_process_group(self.process)
+        self.process = None
+
+
+class LibreOfficeConversionPool:
+    """
+    Keeps a pool of warm headless LibreOffice instances for PDF conversion.
+    
+    Starting soffice costs several seconds per file, so instead of one process
+    per conversion the pool starts `size` long-lived instances, each with its
+    own user profile, and feeds them jobs over a UNO socket. A worker whose
+    process dies is restarted and the job retried once; a job that exceeds
+    `job_timeout` has its worker killed and restarted.
+    
+    Usage:
+        with LibreOfficeConversionPool(size=4) as pool:
+            indexer = DataRoomIndexer(input_folder, output_folder, conversion_pool=pool)
+            indexer.build_data_room_index()
+    """
+    
+    def __init__(
+        self,
+        size: int = 2,
+        profiles_folder: Optional[str] = None,
+        base_port: int = 2002,
+        job_timeout: float = 120.0,
+        startup_timeout: float = 30.0,
+        libreoffice_cmd: Optional[str] = None
+    ):
+        """
+        Initialize the conversion pool.
+        
+        Args:
+            size: Number of LibreOffice instances to keep running
+            profiles_folder: Where worker user profiles live (defaults to a temp folder)
+            base_port: UNO socket port of the first worker; worker i uses base_port + i
+            job_timeout: Seconds a single conversion may take before its worker is restarted
+            startup_timeout: Seconds to wait for a worker to accept UNO connections
+            libreoffice_cmd: LibreOffice executable (detected from the OS if omitted)
+        """
+        import tempfile
+        
+        self.size = size
+        self.profiles_folder = Path(profiles_folder or tempfile.mkdtemp(prefix="lo_profiles_"))
+        self.base_port = base_port
+        self.job_timeout = job_timeout
+        self.startup_timeout = startup_timeout
+        self.libreoffice_cmd = libreoffice_cmd or find_libreoffice_command()
+        self.restarts = 0
+        self._workers: List[_LibreOfficeWorker] = []
+        self._idle: queue.Queue = queue.Queue()
+    
+    def start(self) -> "LibreOfficeConversionPool":
+        """Launch all worker instances."""
+        # Worker profiles are copied from one seed instead of each instance
+        # creating its own on first start
+        profiles = LibreOfficeProfiles(
+            str(self.profiles_folder), timeout=self.startup_timeout, libreoffice_cmd=self.libreoffice_cmd
+        )
+        if self.size > 1:
+            profiles.seed()
+        for i in range(self.size):
+            worker = _LibreOfficeWorker(
+                self.libreoffice_cmd,
+                self.base_port + i,
+                profiles.profile(i),
+                self.startup_timeout
+            )
+            worker.start()
+            self._workers.append(worker)
+            self._idle.put(worker)
+        return self
+    
+    def convert(self, file_path: Path, output_folder: Path) -> Path:
+        """
+        Convert a file to PDF on the next idle worker.
+        
+        Args:
+            file_path: Path to the file to convert
+            output_folder: Folder where the PDF is written
+            
+        Returns:
+            Path to the converted PDF file
+        """
+        output_path = output_folder / (file_path.stem + '.pdf')
+        worker = self._idle.get()
+        try:
+            for attempt in range(2):
+                try:
+                    return self._run_job(worker, file_path, output_path)
+                except TimeoutError:
+                    self._restart(worker)
+                    raise
+                except Exception:
+                    if worker.is_alive() or attempt == 1:
+                        raise
+                    # The instance crashed underneath us: restart it and retry once
+                    self._restart(worker)
+        finally:
+            self._idle.put(worker)
+    
+    def _run_job(self, worker: _LibreOfficeWorker, file_path: Path, output_path: Path) -> Path:
+        """Run a conversion on a helper thread so a hung instance can be detected."""
+        outcome: Dict[str, Any] = {}
+        
+        def job():
+            try:
+                outcome["result"] = worker.convert(file_path, output_path)
+            except Exception as e:
+                outcome["error"] = e
+        
+        thread = threading.Thread(target=job, daemon=True)
+        thread.start()
+        thread.join(self.job_timeout)
+        if thread.is_alive():
+            raise TimeoutError(f"Conversion of {file_path.name} exceeded {self.job_timeout}s")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+    
+    def _restart(self, worker: _LibreOfficeWorker) -> None:
+        """Kill and relaunch a worker instance."""
+        print(f"  Restarting LibreOffice worker on port {worker.port}")
+        self.restarts += 1
+        worker.stop()
+        worker.start()
+    
+    def close(self) -> None:
+        """Stop all worker instances."""
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+        self._idle = queue.Queue()
+    
+    def __enter__(self) -> "LibreOfficeConversionPool":
+        return self.start()
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# ============================================================================
+# SUMMARY CACHE
+# ============================================================================
+
+class SummaryCache:
+    """
+    Persistent SQLite cache of model summaries.
+    
+    Entries are keyed by the hash of the summarized content (a page image or
+    the combined page summaries), the summarization model and the prompt
+    version, so a hit is only returned when the model would be asked the
+    exact same question. The cache can be shared between data rooms: an
+    exhibit that appeared in an earlier deal is summarized for free.
+    
+    When the stored summaries exceed `max_bytes`, the least recently used
+    entries are evicted. The size of the cache is counted when it is opened
+    and kept as a running total, and the last use of entries that were read
+    is written in batches, so neither a hit nor a write scans the table.
+    """
+    
+    # Reads whose last-use time is buffered before it is written
+    TOUCH_BATCH = 100
+    # Entries fetched per eviction query
+    EVICT_BATCH = 64
+    
+    def __init__(self, db_path: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        Initialize the cache.
+        
+        Args:
+            db_path: SQLite database file (created if missing)
+            max_bytes: Size budget for stored summaries before LRU eviction
+        """
+        self.db_path = Path(db_path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total_bytes = 0
+        # Last-use times of entries read since the last flush, by key
+        self._touched: Dict[str, float] = {}
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # SQLite connections cannot cross process boundaries; reopen lazily
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        state["_lock"] = None
+        state["_touched"] = {}
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def _connection(self):
+        import sqlite3
+        
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS summaries ("
+                "key TEXT PRIMARY KEY, summary TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS summaries_last_used ON summaries (last_used)")
+            self._conn.commit()
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM summaries").fetchone()[0]
+        return self._conn
+    
+    @staticmethod
+    def make_key(content_hash: str, model: str, prompt_version: str) -> str:
+        """Combine the parts that determine a summary into a cache key."""
+        return f"{model}|{prompt_version}|{content_hash}"
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached summary for a key, or None on a miss."""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.TOUCH_BATCH:
+                self._flush_touched(conn)
+                conn.commit()
+            self.hits += 1
+            return row[0]
+    
+    def put(self, key: str, summary: str) -> None:
+        """Store a summary and evict old entries if over budget."""
+        size = len(summary.encode('utf-8'))
+        with self._lock:
+            conn = self._connection()
+            self._flush_touched(conn)
+            row = conn.execute("SELECT size FROM summaries WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, summary, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, summary, size, time.time())
+            )
+            self._total_bytes += size - (row[0] if row else 0)
+            self._evict(conn)
+            conn.commit()
+    
+    def _flush_touched(self, conn) -> None:
+        """Write the buffered last-use times of entries that were read."""
+        if self._touched:
+            conn.executemany(
+                "UPDATE summaries SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched = {}
+    
+    def _evict(self, conn) -> None:
+        """Delete least recently used entries until the cache fits its budget."""
+        while self._total_bytes > self.max_bytes:
+            rows = conn.execute(
+                "SELECT key, size FROM summaries ORDER BY last_used LIMIT ?", (self.EVICT_BATCH,)
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            evicted = []
+            for key, size in rows:
+                evicted.append((key,))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+            conn.executemany("DELETE FROM summaries WHERE key = ?", evicted)
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size of the cache."""
+        with self._lock:
+            entries = self._connection().execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+            total = self._total_bytes
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touched(self._conn)
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+
+# ============================================================================
+# PAGE RENDER CACHE
+# ============================================================================
+
+class PageRenderCache:
+    """
+    On-disk LRU cache of page images rendered on demand.
+    
+    Lazily indexed data rooms keep only their PDFs: a page is rendered the
+    first time it is asked for, at the requested DPI, and kept here for the
+    next request. Images are keyed by the PDF (path, size and modification
+    time), the page number, the DPI and the image format. A file's
+    modification time records its last use, so the LRU order survives
+    restarts and is shared by every process using the same folder. When the
+    cached images exceed `max_bytes`, the least recently used ones are
+    deleted until the cache is back under 90% of its budget.
+    
+    Documents the indexer read natively (without a PDF) are converted with
+    LibreOffice the first time one of their pages is requested; the PDF is
+    kept in the documents subfolder and is not evicted.
+    """
+    
+    # PIL format and file suffix of each supported image format
+    FORMATS = {"png": ("PNG", ".png"), "webp": ("WEBP", ".webp"), "jpeg": ("JPEG", ".jpg")}
+    
+    def __init__(
+        self,
+        folder: str,
+        max_bytes: int = 2 * 1024 ** 3,
+        dpi: int = 200,
+        image_format: str = "png",
+        quality: int = 80,
+        poppler_threads: int = 1,
+        timeout: Optional[float] = 120.0
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            folder: Folder holding the rendered images (created if missing)
+            max_bytes: Size budget of the cached images before LRU eviction
+            dpi: Resolution used when a request does not ask for one
+            image_format: "png", "webp" or "jpeg"
+            quality: Quality (1-100) of WebP and JPEG images
+            poppler_threads: Threads poppler uses to render a page
+            timeout: Seconds poppler may take to render a page, or LibreOffice
+                to convert a natively read document, before it is killed
+                (None waits forever)
+        """
+        if image_format not in self.FORMATS:
+            raise ValueError(f"Unknown image format {image_format!r}; expected one of {tuple(self.FORMATS)}")
+        self.folder = Path(folder)
+        self.max_bytes = max_bytes
+        self.dpi = dpi
+        self.image_format = image_format
+        self.quality = quality
+        self.poppler_threads = poppler_threads
+        self.timeout = timeout
+        self.profiles = LibreOfficeProfiles(str(self.folder / "libreoffice"), timeout=timeout or 120.0)
+        self.hits = 0
+        self.misses = 0
+        # Bytes cached as far as this process knows; the folder is rescanned
+        # before anything is evicted
+        self._total: Optional[int] = None
+        self._lock = threading.Lock()
+        self._rendering: Dict[str, threading.Lock] = {}
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_rendering"] = {}
+        state["_total"] = None
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def path_for(self, pdf_path: Path, page_num: int, dpi: int) -> Path:
+        """Cache file of a page at a given DPI."""
+        stat = os.stat(pdf_path)
+        identity = f"{Path(pdf_path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}|{page_num}|{dpi}|{self.image_format}"
+        key = hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]
+        return self.folder / key[:2] / f"{key}{self.FORMATS[self.image_format][1]}"
+    
+    def render(self, pdf_path: Path, page_num: int, dpi: Optional[int] = None) -> Path:
+        """
+        Return the image of a PDF page, rendering it on a cache miss.
+        
+        Concurrent requests for the same page render it once.
+        
+        Args:
+            pdf_path: PDF holding the page
+            page_num: Page number (1-based)
+            dpi: Resolution; the cache's default when None
+            
+        Returns:
+            Path of the cached page image
+        """
+        dpi = dpi or self.dpi
+        path = self.path_for(pdf_path, page_num, dpi)
+        with self._lock:
+            page_lock = self._rendering.setdefault(path.name, threading.Lock())
+        
+        try:
+            with page_lock:
+                if path.exists():
+                    # The modification time is the LRU clock
+                    os.utime(path)
+                    with self._lock:
+                        self.hits += 1
+                    return path
+                
+                with self._lock:
+                    self.misses += 1
+                self._render_page(pdf_path, page_num, dpi, path)
+        finally:
+            with self._lock:
+                self._rendering.pop(path.name, None)
+        
+        self._added(path.stat().st_size)
+        return path
+    
+    def render_document_page(self, document: Dict[str, Any], page_num: int, dpi: Optional[int] = None) -> str:
+        """Page renderer for DataRoom: render a page of an indexed document from its PDF."""
+        pdf_file = document.get("pdf_file")
+        pdf_path = Path(pdf_file) if pdf_file else self.document_pdf(Path(document["original_file"]))
+        return str(self.render(pdf_path, page_num, dpi))
+    
+    def document_pdf(self, file_path: Path) -> Path:
+        """
+        PDF of a document indexed without one, converted with LibreOffice on first use.
+        
+        Pages of the PDF follow LibreOffice's layout, which can break pages
+        at different places than the text pages the indexer read.
+        """
+        stat = os.stat(file_path)
+        identity = f"{Path(file_path).resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+        key = hashlib.sha256(identity.encode('utf-8')).hexdigest()[:32]
+        output_folder = self.folder / "documents" / key
+        pdf_path = output_folder / (Path(file_path).stem + '.pdf')
+        with self._lock:
+            convert_lock = self._rendering.setdefault(key, threading.Lock())
+        
+        try:
+            with convert_lock:
+                if not pdf_path.exists():
+                    output_folder.mkdir(parents=True, exist_ok=True)
+                    try:
+                        run_watched([
+                            find_libreoffice_command(),
+                            '--headless',
+                            self.profiles.argument(),
+                            '--convert-to', 'pdf',
+                            '--outdir', str(output_folder),
+                            str(file_path)
+                        ], timeout=self.timeout, check=True, capture_output=True, text=True)
+                    except subprocess.TimeoutExpired:
+                        raise TimeoutError(f"LibreOffice did not convert {Path(file_path).name} within {self.timeout:.0f}s")
+                    if not pdf_path.exists():
+                        raise RuntimeError(f"LibreOffice produced no PDF for {Path(file_path).name}")
+        finally:
+            with self._lock:
+                self._rendering.pop(key, None)
+        return pdf_path
+    
+    def _render_page(self, pdf_path: Path, page_num: int, dpi: int, path: Path) -> None:
+        images = convert_from_path(
+            str(pdf_path),
+            dpi=dpi,
+            first_page=page_num,
+            last_page=page_num,
+            thread_count=self.poppler_threads,
+            timeout=self.timeout
+        )
+        if not images:
+            raise ValueError(f"Page {page_num} not found in {pdf_path}")
+        
+        pil_format = self.FORMATS[self.image_format][0]
+        image = images[0]
+        if pil_format == "JPEG" and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        options = {} if pil_format == "PNG" else {"quality": self.quality}
+        
+        # Write under a temporary name so readers never see a partial image
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            image.save(temp_path, pil_format, **options)
+            os.replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+            for rendered in images:
+                rendered.close()
+    
+    def _cached_files(self) -> List[Tuple[float, int, Path]]:
+        """(last use, size, path) of every cached image."""
+        files = []
+        for path in self.folder.glob("*/*"):
+            # Images live in two-character shard folders
+            if path.suffix == ".tmp" or len(path.parent.name) != 2:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        return files
+    
+    def _added(self, size: int) -> None:
+        """Account for a new image and evict old ones when over budget."""
+        with self._lock:
+            if self._total is None:
+                self._total = sum(size for _, size, _ in self._cached_files())
+            else:
+                self._total += size
+            if self._total <= self.max_bytes:
+                return
+            
+            files = sorted(self._cached_files())
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    path.unlink()
+                except OSError:
+                    continue
+                total -= size
+            self._total = total
+    
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters and current size of the cache."""
+        files = self._cached_files()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "files": len(files),
+            "bytes": sum(size for _, size, _ in files)
+        }
+
+
+# ============================================================================
+# CONCURRENT SUMMARIZATION
+# ============================================================================
+
+class TokenBucket:
+    """
+    Rate limiter refilled continuously at `rate_per_minute`.
+    
+    The bucket is guarded by a thread lock rather than an asyncio lock, so
+    one bucket can be shared by event loops running in different threads
+    (as happens when several documents are summarized at once).
+    """
+    
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate_per_minute: Sustained number of units (requests or tokens) per minute
+            capacity: Largest burst allowed; defaults to ten seconds' worth
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def _try_take(self, amount: float) -> float:
+        """Take `amount` if available; otherwise return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+    
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Wait until `amount` units are available and take them."""
+        import asyncio
+        
+        # A request larger than the bucket could never be served otherwise
+        amount = min(amount, self.capacity)
+        while True:
+            wait = self._try_take(amount)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """Extract an HTTP status code from an API client exception, if it has one."""
+    for candidate in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "status"):
+            value = getattr(candidate, attribute, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def _run_coroutine_sync(coroutine):
+    """
+    Run a coroutine to completion from synchronous code.
+    
+    Uses a helper thread when the caller is already inside a running event
+    loop (e.g. the indexer invoked from a FastAPI handler).
+    """
+    import asyncio
+    
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+def _run_inline(coroutine):
+    """
+    Run a coroutine that never suspends, without an event loop.
+    
+    The indexer's summarization methods are coroutines so the engine can
+    await a backend's acomplete(); called synchronously they use complete()
+    and finish on their first step.
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as finished:
+        return finished.value
+    coroutine.close()
+    raise RuntimeError("Synchronous summarization suspended; use the summarization engine to await it")
+
+
+class AsyncSummarizationEngine:
+    """
+    Runs many summarization requests concurrently under provider rate limits.
+    
+    Requests are admitted through a requests-per-minute and a
+    tokens-per-minute bucket, at most `max_concurrency` are in flight per
+    batch, and 429 / 5xx / connection errors are retried with exponential
+    backoff and full jitter. Results come back in the order of the calls.
+    Coroutine functions (the indexer's requests to a backend with a native
+    acomplete) are awaited on the event loop. Synchronous callables run on
+    a thread pool of `max_concurrency` threads per batch, so the event
+    loop's small default executor does not cap them.
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        requests_per_minute: float = 500,
+        tokens_per_minute: float = 200_000,
+        tokens_per_request: int = 1500,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0
+    ):
+        """
+        Args:
+            max_concurrency: Maximum requests in flight at once
+            requests_per_minute: Provider request rate limit
+            tokens_per_minute: Provider token rate limit
+            tokens_per_request: Estimated tokens (prompt, image and completion) per request
+            max_retries: Retries per request before the error is raised
+            base_delay: First backoff delay in seconds
+            max_delay: Upper bound of the backoff delay in seconds
+        """
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.tokens_per_request = tokens_per_request
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    @staticmethod
+    def is_retryable(error: BaseException) -> bool:
+        """Rate limiting, server errors and dropped connections are worth retrying."""
+        import asyncio
+        
+        status = _status_code(error)
+        if status is not None:
+            return status == 429 or status >= 500
+        return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError))
+    
+    async def _call(self, semaphore, executor, func, args: tuple):
+        import asyncio
+        import random
+        
+        attempt = 0
+        while True:
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(self.tokens_per_request)
+            try:
+                async with semaphore:
+                    if asyncio.iscoroutinefunction(func):
+                        return await func(*args)
+                    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                attempt += 1
+                await asyncio.sleep(delay)
+    
+    async def map_async(self, func, calls: List[tuple]) -> List[Any]:
+        """Run func(*args) for every args tuple concurrently; results keep call order."""
+        import asyncio
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            return await asyncio.gather(*(self._call(semaphore, executor, func, args) for args in calls))
+    
+    def map(self, func, calls: List[tuple]) -> List[Any]:
+        """Synchronous wrapper around map_async."""
+        return _run_coroutine_sync(self.map_async(func, calls))
+
+
+# ============================================================================
+# SUMMARIZER BACKENDS
+# ============================================================================
+
+def _image_data(image_path: Path) -> Tuple[str, str]:
+    """Return (MIME type, base64 data) of an image file."""
+    mime_types = {'.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
+                  '.webp': 'image/webp', '.gif': 'image/gif'}
+    with open(image_path, 'rb') as image_file:
+        data = base64.b64encode(image_file.read()).decode('utf-8')
+    return mime_types.get(Path(image_path).suffix.lower(), 'image/png'), data
+
+
+class Summarizer:
+    """
+    Model backend used by DataRoomIndexer to answer summarization prompts.
+    
+    Implementations provide `complete` (sync), `acomplete` (async) or both;
+    whichever is missing is derived from the other. AsyncSummarizationEngine
+    awaits a native `acomplete` on its event loop instead of holding a
+    thread per request. Every request is a text prompt plus optional page
+    images, and the answer is the model's text. Token usage is accumulated
+    in `usage()`.
+    """
+    
+    model = "unknown"
+    
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # API clients and locks stay in the process that created them
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state.pop("_clients", None)
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def complete(
+        self,
+        prompt: str,
+        images: Optional[List[Path]] = None,
+        max_tokens: int = 200,
+        json_output: bool = False
+    ) -> str:
+        """
+        Answer a prompt.
+        
+        Args:
+            prompt: Instructions and any text to summarize
+            images: Page images sent along with the prompt, in order
+            max_tokens: Upper bound on the length of the answer
+            json_output: Ask the model to answer with a JSON object
+            
+        Returns:
+            The model's answer
+        """
+        if not self.native_async:
+            raise NotImplementedError("Summarizer must implement complete() or acomplete()")
+        return _run_coroutine_sync(self.acomplete(prompt, images, max_tokens, json_output))
+    
+    async def acomplete(
+        self,
+        prompt: str,
+        images: Optional[List[Path]] = None,
+        max_tokens: int = 200,
+        json_output: bool = False
+    ) -> str:
+        """Async variant of complete()."""
+        import asyncio
+        
+        if type(self).complete is Summarizer.complete:
+            raise NotImplementedError("Summarizer must implement complete() or acomplete()")
+        return await asyncio.to_thread(self.complete, prompt, images, max_tokens, json_output)
+    
+    @property
+    def native_async(self) -> bool:
+        """Whether acomplete() is implemented rather than derived from complete()."""
+        return type(self).acomplete is not Summarizer.acomplete
+    
+    def record_usage(self, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+    
+    def usage(self) -> Dict[str, int]:
+        """Requests made and tokens used so far."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens
+            }
+
+
+class OpenAISummarizer(Summarizer):
+    """Summarizer backed by the OpenAI Chat Completions API."""
+    
+    def __init__(self, model: str = "gpt-4o-mini", image_detail: str = "high", **client_kwargs):
+        """
+        Args:
+            model: OpenAI model name
+            image_detail: "high", "low" or "auto" vision detail for page images
+            **client_kwargs: Passed to openai.OpenAI / openai.AsyncOpenAI
+                (api_key, base_url, timeout, ...)
+        """
+        super().__init__()
+        self.model = model
+        self.image_detail = image_detail
+        self.client_kwargs = client_kwargs
+        self._clients: Dict[str, Any] = {}
+    
+    def _client(self, kind: str):
+        import openai
+        
+        if kind not in self._clients:
+            factory = openai.AsyncOpenAI if kind == "async" else openai.OpenAI
+            self._clients[kind] = factory(**self.client_kwargs)
+        return self._clients[kind]
+    
+    def _request(self, prompt: str, images: Optional[List[Path]], max_tokens: int, json_output: bool) -> Dict[str, Any]:
+        content: List[Dict[str, Any]] = [{"type": "text", "text": prompt}]
+        for image_path in images or []:
+            mime_type, data = _image_data(image_path)
+            content.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:{mime_type};base64,{data}", "detail": self.image_detail}
+            })
+        request = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": content}],
+            "max_tokens": max_tokens
+        }
+        if json_output:
+            request["response_format"] = {"type": "json_object"}
+        return request
+    
+    def _answer(self, response) -> str:
+        if response.usage is not None:
+            self.record_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response.choices[0].message.content
+    
+    def complete(self, prompt, images=None, max_tokens=200, json_output=False) -> str:
+        request = self._request(prompt, images, max_tokens, json_output)
+        return self._answer(self._client("sync").chat.completions.create(**request))
+    
+    async def acomplete(self, prompt, images=None, max_tokens=200, json_output=False) -> str:
+        request = self._request(prompt, images, max_tokens, json_output)
+        return self._answer(await self._client("async").chat.completions.create(**request))
+
+
+class AnthropicSummarizer(Summarizer):
+    """Summarizer backed by the Anthropic Messages API."""
+    
+    def __init__(self, model: str, **client_kwargs):
+        """
+        Args:
+            model: Anthropic model name
+            **client_kwargs: Passed to anthropic.Anthropic / anthropic.AsyncAnthropic
+                (api_key, base_url, timeout, ...)
+        """
+        super().__init__()
+        self.model = model
+        self.client_kwargs = client_kwargs
+        self._clients: Dict[str, Any] = {}
+    
+    def _client(self, kind: str):
+        import anthropic
+        
+        if kind not in self._clients:
+            factory = anthropic.AsyncAnthropic if kind == "async" else anthropic.Anthropic
+            self._clients[kind] = factory(**self.client_kwargs)
+        return self._clients[kind]
+    
+    def _request(self, prompt: str, images: Optional[List[Path]], max_tokens: int) -> Dict[str, Any]:
+        content: List[Dict[str, Any]] = []
+        for image_path in images or []:
+            mime_type, data = _image_data(image_path)
+            content.append({
+                "type": "image",
+                "source": {"type": "base64", "media_type": mime_type, "data": data}
+            })
+        # The prompts already ask for JSON where needed; there is no JSON mode
+        content.append({"type": "text", "text": prompt})
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "messages": [{"role": "user", "content": content}]
+        }
+    
+    def _answer(self, response) -> str:
+        if response.usage is not None:
+            self.record_usage(response.usage.input_tokens, response.usage.output_tokens)
+        return "".join(block.text for block in response.content if getattr(block, "type", "") == "text")
+    
+    def complete(self, prompt, images=None, max_tokens=200, json_output=False) -> str:
+        return self._answer(self._client("sync").messages.create(**self._request(prompt, images, max_tokens)))
+    
+    async def acomplete(self, prompt, images=None, max_tokens=200, json_output=False) -> str:
+        return self._answer(await self._client("async").messages.create(**self._request(prompt, images, max_tokens)))
+
+
+class StubSummarizerError(RuntimeError):
+    """Simulated provider error raised by StubSummarizer."""
+    
+    def __init__(self, message: str, status_code: int = 429):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class StubSummarizer(Summarizer):
+    """
+    Deterministic offline summarizer for tests, benchmarks and load tests.
+    
+    Answers are derived from a hash of the prompt, so identical requests get
+    identical answers. Each request sleeps for `latency` seconds (plus up to
+    `jitter` seconds, seeded) and reports token usage estimated from the
+    prompt length, `image_tokens` per image and `output_tokens`. With
+    `error_rate` > 0 a seeded share of requests fails with a retryable 429
+    so the retry path can be exercised. No network access is needed.
+    """
+    
+    def __init__(
+        self,
+        model: str = "stub",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        output_tokens: int = 60,
+        image_tokens: int = 765,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        """
+        Args:
+            model: Name reported as the summarization model
+            latency: Seconds each request takes
+            jitter: Extra random seconds, up to this much, per request
+            output_tokens: Completion tokens reported per answer (or per
+                page of a JSON batch answer)
+            image_tokens: Prompt tokens counted per image
+            error_rate: Fraction of requests failing with a 429
+            seed: Seed for jitter and simulated errors
+        """
+        import random
+        
+        super().__init__()
+        self.model = model
+        self.latency = latency
+        self.jitter = jitter
+        self.output_tokens = output_tokens
+        self.image_tokens = image_tokens
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+    
+    def _prepare(self, prompt: str, images: Optional[List[Path]], json_output: bool) -> Tuple[float, str]:
+        """Draw this request's delay, raise a simulated error or build the answer."""
+        images = list(images or [])
+        with self._lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            failed = self._random.random() < self.error_rate
+        if failed:
+            raise StubSummarizerError("Simulated rate limit", status_code=429)
+        
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:12]
+        if json_output:
+            pages = [
+                {"summary": f"[stub summary {digest}-{position}]"} for position in range(1, len(images) + 1)
+            ]
+            answer = json.dumps({"pages": pages})
+            completion_tokens = self.output_tokens * max(1, len(images))
+        else:
+            answer = f"[stub summary {digest}]"
+            completion_tokens = self.output_tokens
+        self.record_usage(len(prompt) // 4 + self.image_tokens * len(images), completion_tokens)
+        return delay, answer
+    
+    def complete(self, prompt, images=None, max_tokens=200, json_output=False) -> str:
+        delay, answer = self._prepare(prompt, images, json_output)
+        if delay:
+            time.sleep(delay)
+        return answer
+    
+    async def acomplete(self, prompt, images=None, max_tokens=200, json_output=False) -> str:
+        import asyncio
+        
+        delay, answer = self._prepare(prompt, images, json_output)
+        if delay:
+            await asyncio.sleep(delay)
+        return answer
+
+
+# ============================================================================
+# DUPLICATE PAGE INDEX
+# ============================================================================
+
+class PerceptualHashIndex:
+    """
+    Finds 64-bit perceptual hashes within a Hamming distance of a query.
+    
+    Hashes are split into max_distance + 1 bands; by the pigeonhole
+    principle two hashes at most max_distance bits apart agree exactly on at
+    least one band, so only hashes sharing a band are compared.
+    """
+    
+    def __init__(self, max_distance: int = 4):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        self._bounds = [round(i * 64 / bands) for i in range(bands + 1)]
+        self._tables: List[Dict[int, List[Tuple[int, Any]]]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def _band_keys(self, value: int) -> List[int]:
+        return [
+            (value >> low) & ((1 << (high - low)) - 1)
+            for low, high in zip(self._bounds, self._bounds[1:])
+        ]
+    
+    def add(self, value: int, payload: Any) -> None:
+        """Store a payload under a hash."""
+        with self._lock:
+            for table, key in zip(self._tables, self._band_keys(value)):
+                table.setdefault(key, []).append((value, payload))
+    
+    def find(self, value: int) -> Optional[Any]:
+        """Payload of the closest stored hash within max_distance, or None."""
+        best = None
+        best_distance = self.max_distance + 1
+        with self._lock:
+            for table, key in zip(self._tables, self._band_keys(value)):
+                for candidate, payload in table.get(key, ()):
+                    distance = bin(candidate ^ value).count("1")
+                    if distance < best_distance:
+                        best, best_distance = payload, distance
+        return best
+    
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._tables[0].values())
+
+
+class SharedPageSummaries:
+    """
+    Summaries of the pages seen so far in a build, shared by their copies.
+    
+    The first page with a given digest (see DataRoomIndexer.page_digest)
+    claims it, and its summary request serves every later copy, in any
+    document: a page whose digest matches and whose perceptual hash lies
+    within max_distance waits on the first copy's future instead of asking
+    the model again. When the first copy cannot be summarized its claim is
+    released and the waiting copies are summarized on their own.
+    """
+    
+    def __init__(self, max_distance: int = 4):
+        self.max_distance = max_distance
+        # digest -> (perceptual hash of the first copy, future of its summary)
+        self._entries: Dict[str, Tuple[int, Future]] = {}
+        self._lock = threading.Lock()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Futures belong to the build running in this process
+        state = self.__dict__.copy()
+        state["_entries"] = {}
+        state["_lock"] = None
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def claim(self, digest: str, page_hash: int) -> Tuple[Future, bool]:
+        """
+        Look up the summary of a page.
+        
+        Returns:
+            Tuple of (future of the page's summary, whether the caller owns
+            it and must resolve it)
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None and bin(entry[0] ^ page_hash).count("1") <= self.max_distance:
+                return entry[1], False
+            future = Future()
+            self._entries.setdefault(digest, (page_hash, future))
+            return future, True
+    
+    def add(self, digest: str, page_hash: int, summary: str) -> None:
+        """Register a page summarized earlier (by a previous or interrupted run)."""
+        with self._lock:
+            self._entries.setdefault(digest, (page_hash, _completed_future(summary)))
+    
+    def release(self, digest: str, future: Future, error: BaseException) -> None:
+        """Give up a claim: waiting copies see the error and later copies claim the digest anew."""
+        if future.done():
+            return
+        with self._lock:
+            if digest in self._entries and self._entries[digest][1] is future:
+                del self._entries[digest]
+        future.set_exception(error)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ============================================================================
+# INDEX STORAGE
+# ============================================================================
+# Two on-disk layouts are supported:
+#   "json"     data_room_index.json holding every document and page record
+#   "sharded"  index/catalog.json with one small record per document plus
+#              index/pages/<doc_id>.<hash>.jsonl holding that document's page
+#              records, named by content so saved shards are never rewritten
+
+INDEX_FILENAME = "data_room_index.json"
+SHARDED_INDEX_FOLDER = "index"
+CATALOG_FILENAME = "catalog.json"
+INDEX_FORMATS = ("json", "sharded")
+
+# Catalog fields describing a page shard, not part of the document itself
+SHARD_FIELDS = ("page_count", "page_shard", "pages_sha256")
+
+
+class LazyDocument(Mapping):
+    """
+    Document record of a sharded index whose pages are read on first access.
+    
+    Behaves like a document dict of the monolithic format, so DataRoom and
+    the backend can use it unchanged. Catalog fields (doc_id, summdesc,
+    page_count, ...) never touch the page shard.
+    """
+    
+    def __init__(self, entry: Dict[str, Any], shard_path: Path):
+        self._entry = dict(entry)
+        self.shard_path = Path(shard_path)
+        self._pages: Optional[List[Dict[str, Any]]] = None
+    
+    def __getitem__(self, key: str) -> Any:
+        if key == "pages":
+            return self.pages
+        return self._entry[key]
+    
+    def __iter__(self):
+        yield from self._entry
+        yield "pages"
+    
+    def __len__(self) -> int:
+        return len(self._entry) + 1
+    
+    def __repr__(self) -> str:
+        return f"LazyDocument({self._entry.get('doc_id')!r}, pages_loaded={self.pages_loaded})"
+    
+    @property
+    def catalog_fields(self) -> Dict[str, Any]:
+        """Everything but the pages, as stored in the catalog."""
+        return dict(self._entry)
+    
+    @property
+    def pages_loaded(self) -> bool:
+        return self._pages is not None
+    
+    @property
+    def pages(self) -> List[Dict[str, Any]]:
+        """Page records, read from the shard the first time they are needed."""
+        if self._pages is None:
+            self._pages = list(self.iter_pages())
+        return self._pages
+    
+    def iter_pages(self):
+        """Stream page records from the shard without keeping them."""
+        if self._pages is not None:
+            yield from self._pages
+            return
+        with open(self.shard_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def plain_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a (possibly lazy) document record into a monolithic-format dict."""
+    return {key: value for key, value in document.items() if key not in SHARD_FIELDS}
+
+
+def detect_index_format(output_folder: str) -> Optional[str]:
+    """Return the format of the index saved in an output folder, or None if there is none."""
+    output_folder = Path(output_folder)
+    if (output_folder / SHARDED_INDEX_FOLDER / CATALOG_FILENAME).exists():
+        return "sharded"
+    if (output_folder / INDEX_FILENAME).exists():
+        return "json"
+    return None
+
+
+def read_data_room_index(location: str) -> Dict[str, Any]:
+    """
+    Load a data room index in either format.
+    
+    Args:
+        location: Output folder of the indexer, a data_room_index.json file
+            or a sharded index's catalog.json
+    
+    Returns:
+        Index dict with "metadata" and "documents". Documents of a sharded
+        index are LazyDocument records whose pages are read on demand.
+    """
+    path = Path(location)
+    if path.is_dir():
+        if detect_index_format(path) == "sharded":
+            path = path / SHARDED_INDEX_FOLDER / CATALOG_FILENAME
+        else:
+            path = path / INDEX_FILENAME
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get("format") != "sharded":
+        return data
+    
+    return {
+        "metadata": data.get("metadata", {}),
+        "documents": [
+            LazyDocument(entry, path.parent / entry["page_shard"]) for entry in data["documents"]
+        ]
+    }
+
+
+def _write_atomically(path: Path, data: bytes) -> None:
+    """Replace a file in one step so readers never see it half written."""
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def _shard_name(doc_id: str, pages_sha256: str) -> str:
+    """File name of a page shard; changes whenever the shard's content does."""
+    return f"{doc_id}.{pages_sha256[:16]}.jsonl"
+
+
+def write_data_room_index(
+    data_room_index: Dict[str, Any],
+    output_folder: str,
+    index_format: str = "json"
+) -> Path:
+    """
+    Save a data room index in the given format, replacing any saved index.
+    
+    The sharded layout names each page shard after its document and content
+    hash, so a write never changes a shard the saved catalog refers to. New
+    shards are written first and the catalog last, and shards the new
+    catalog no longer refers to are removed after the swap: a reader that
+    loaded the old catalog should read its pages before the next write.
+    Shards of lazy documents that were never loaded are left untouched.
+    
+    Args:
+        data_room_index: Index with "metadata" and "documents"
+        output_folder: Folder the index is saved in
+        index_format: "json" or "sharded"
+    
+    Returns:
+        Path of data_room_index.json or of the sharded catalog
+    """
+    if index_format not in INDEX_FORMATS:
+        raise ValueError(f"Unknown index format {index_format!r}; expected one of {INDEX_FORMATS}")
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    sharded_folder = output_folder / SHARDED_INDEX_FOLDER
+    
+    if index_format == "json":
+        index_path = output_folder / INDEX_FILENAME
+        plain_index = dict(data_room_index)
+        plain_index["documents"] = [plain_document(document) for document in data_room_index["documents"]]
+        _write_atomically(
+            index_path, json.dumps(plain_index, indent=2, ensure_ascii=False).encode('utf-8')
+        )
+        shutil.rmtree(sharded_folder, ignore_errors=True)
+        return index_path
+    
+    pages_folder = sharded_folder / "pages"
+    pages_folder.mkdir(parents=True, exist_ok=True)
+    catalog_documents = []
+    for document in data_room_index["documents"]:
+        if isinstance(document, LazyDocument):
+            entry = document.catalog_fields
+            shard_path = pages_folder / _shard_name(document["doc_id"], entry.get("pages_sha256", ""))
+            if not document.pages_loaded and document.shard_path.resolve() == shard_path.resolve():
+                catalog_documents.append(entry)
+                continue
+        else:
+            entry = {key: value for key, value in document.items() if key != "pages"}
+        
+        pages = document.get("pages", [])
+        data = "".join(json.dumps(page, ensure_ascii=False) + "\n" for page in pages).encode('utf-8')
+        pages_sha256 = hashlib.sha256(data).hexdigest()
+        shard_path = pages_folder / _shard_name(document["doc_id"], pages_sha256)
+        if not shard_path.exists():
+            _write_atomically(shard_path, data)
+        entry.update({
+            "page_count": len(pages),
+            "page_shard": shard_path.relative_to(sharded_folder).as_posix(),
+            "pages_sha256": pages_sha256
+        })
+        catalog_documents.append(entry)
+    
+    catalog = {
+        "format": "sharded",
+        "version": 1,
+        "metadata": data_room_index.get("metadata", {}),
+        "documents": catalog_documents
+    }
+    catalog_path = sharded_folder / CATALOG_FILENAME
+    _write_atomically(catalog_path, json.dumps(catalog, indent=2, ensure_ascii=False).encode('utf-8'))
+    
+    # Drop shards of removed documents and the monolithic index
+    kept = {(sharded_folder / entry["page_shard"]).name for entry in catalog_documents}
+    for shard_path in pages_folder.glob("*.jsonl"):
+        if shard_path.name not in kept:
+            shard_path.unlink()
+    (output_folder / INDEX_FILENAME).unlink(missing_ok=True)
+    return catalog_path
+
+
+def convert_index_format(output_folder: str, index_format: str) -> Path:
+    """
+    Convert the index saved in an output folder to another format.
+    
+    Converting from "json" to "sharded" and back yields the original index.
+    
+    Args:
+        output_folder: Folder holding the index
+        index_format: Target format, "json" or "sharded"
+    
+    Returns:
+        Path of the converted index
+    """
+    current = detect_index_format(output_folder)
+    if current is None:
+        raise FileNotFoundError(f"No data room index found in {output_folder}")
+    data_room_index = read_data_room_index(output_folder)
+    if current != index_format:
+        # Every shard is rewritten in the new layout
+        data_room_index["documents"] = [plain_document(document) for document in data_room_index["documents"]]
+    return write_data_room_index(data_room_index, output_folder, index_format)
+
+
+# ============================================================================
+# FAILURE QUARANTINE
+# ============================================================================
+
+class FailureQuarantine:
+    """
+    Persistent record of files that keep hanging or crashing LibreOffice or poppler.
+    
+    Every timeout or crash of a file is counted; once a file reaches
+    `threshold` of them it is quarantined and later runs skip it instead of
+    spending another timeout on it. The record is keyed by the file's path
+    in the data room and remembers its size and modification time, so a
+    file that is replaced or fixed gets another chance. A successful run
+    clears the file's record; release() clears it by hand.
+    """
+    
+    # Failure kinds (see failure_kind) that count towards quarantine; other
+    # errors, such as a model request failing, say nothing about the file
+    COUNTED_KINDS = ("timeout", "crash")
+    
+    def __init__(self, path: str, threshold: int = 2):
+        """
+        Args:
+            path: JSON file holding the record (created when first saved)
+            threshold: Timeouts or crashes after which a file is skipped
+                (0 never quarantines)
+        """
+        self.path = Path(path)
+        self.threshold = threshold
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f).get("files", {})
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable quarantine record {self.path}: {e}")
+    
+    @staticmethod
+    def _stat(file_path: Path) -> Dict[str, Any]:
+        try:
+            stat = file_path.stat()
+        except OSError:
+            return {"size": None, "mtime": None}
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+    
+    def _current(self, key: str, file_path: Path) -> Optional[Dict[str, Any]]:
+        """The file's entry, unless the file has changed since it was recorded."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if {"size": entry.get("size"), "mtime": entry.get("mtime")} != self._stat(file_path):
+            del self.entries[key]
+            return None
+        return entry
+    
+    def is_quarantined(self, key: str, file_path: Path) -> bool:
+        """Whether a file has failed often enough to be skipped."""
+        entry = self._current(key, file_path)
+        return bool(self.threshold) and entry is not None and entry["failures"] >= self.threshold
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+    
+    def record_failure(self, key: str, file_path: Path, kind: str, error: str) -> Optional[Dict[str, Any]]:
+        """
+        Count a failure of a file.
+        
+        Returns:
+            The file's entry, or None when the kind of failure is not counted
+        """
+        if kind not in self.COUNTED_KINDS:
+            return None
+        entry = self._current(key, file_path) or {**self._stat(file_path), "failures": 0}
+        entry.update(
+            failures=entry["failures"] + 1, kind=kind, error=error,
+            last_failed_at=datetime.now().isoformat()
+        )
+        self.entries[key] = entry
+        return entry
+    
+    def record_success(self, key: str) -> None:
+        self.entries.pop(key, None)
+    
+    def release(self, key: Optional[str] = None) -> None:
+        """Give one file (or, without a key, every file) another chance."""
+        if key is None:
+            self.entries = {}
+        else:
+            self.entries.pop(key, None)
+    
+    def save(self) -> None:
+        _write_atomically(self.path, json.dumps({"version": 1, "files": self.entries}, indent=2, ensure_ascii=False).encode('utf-8'))
+
+
+# ============================================================================
+# INDEXING JOURNAL
+# ============================================================================
+
+class IndexJournal:
+    """
+    Append-only JSONL write-ahead log of indexing progress.
+    
+    Each finished step of a document (PDF conversion, page rendering, every
+    page summary and finally the complete document record) is appended as
+    one line as soon as it completes, so an interrupted run can be resumed
+    without redoing that work. Lines are flushed immediately, and document
+    records are also fsync'd. A line torn by a crash is skipped on replay.
+    """
+    
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._file = None
+        self._lock = threading.Lock()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Only the parent process writes the journal
+        state = self.__dict__.copy()
+        state["_file"] = None
+        state["_lock"] = None
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def replay(self) -> Tuple[Optional[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """
+        Read back the journal.
+        
+        Returns:
+            Tuple of (indexing settings of the journaled run, progress per
+            source file). Progress holds the file's "sha256" and whichever of
+            "pdf_path", "page_paths", "pages" (page number -> page record) and
+            "document" were recorded.
+        """
+        settings = None
+        files: Dict[str, Dict[str, Any]] = {}
+        if not self.path.exists():
+            return settings, files
+        
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                event = entry.get("event")
+                if event == "start":
+                    settings = entry.get("settings")
+                    continue
+                progress = files.get(entry.get("file"))
+                if progress is None or progress["sha256"] != entry.get("sha256"):
+                    # A changed source file invalidates its earlier progress
+                    progress = files[entry.get("file")] = {"sha256": entry.get("sha256"), "pages": {}}
+                if event == "pdf":
+                    progress["pdf_path"] = entry["pdf_path"]
+                elif event == "pages":
+                    progress["page_paths"] = entry["page_paths"]
+                    progress["pages"] = {}
+                elif event == "page":
+                    progress["pages"][entry["page_num"]] = entry["record"]
+                elif event == "document":
+                    progress["document"] = entry["document"]
+        return settings, files
+    
+    def open(self, settings: Dict[str, Any], resume: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Start journaling a run.
+        
+        Args:
+            settings: Indexing settings of this run
+            resume: Continue the existing journal instead of starting a new one.
+                Ignored when it was written with different settings.
+        
+        Returns:
+            Progress per source file recorded by the interrupted run (empty
+            unless resuming)
+        """
+        files: Dict[str, Dict[str, Any]] = {}
+        if resume:
+            previous_settings, files = self.replay()
+            if previous_settings != settings:
+                if previous_settings is not None:
+                    print("Indexing settings changed since the interrupted run; starting over")
+                files = {}
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        torn = False
+        if files:
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                torn = f.read(1) != b"\n"
+        self._file = open(self.path, 'a' if files else 'w', encoding='utf-8')
+        if torn:
+            self._file.write("\n")
+        self.record("start", settings=settings, started_at=datetime.now().isoformat())
+        return files
+    
+    def record(self, event: str, durable: bool = False, **fields) -> None:
+        """Append one entry; with durable=True it is fsync'd before returning."""
+        line = json.dumps({"event": event, **fields}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._file.flush()
+            if durable:
+                os.fsync(self._file.fileno())
+    
+    def close(self, remove: bool = False) -> None:
+        """Stop journaling; remove the journal once the index is safely written."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if remove:
+            self.path.unlink(missing_ok=True)
+
+
+# ============================================================================
+# INDEXING METRICS
+# ============================================================================
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    import math
+    
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(round(fraction * len(sorted_values), 9))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class IndexingMetrics:
+    """
+    Timers and counters for the stages of an indexing run.
+    
+    Every timed stage occurrence (one PDF conversion, one poppler render,
+    one model request, ...) adds its duration to that stage, and counters
+    track totals such as the pages summarized. When `events_path` is given
+    each occurrence is also appended to that file as one JSON line, so a
+    run can be followed or analysed while it is in progress.
+    
+    Worker processes receive a detached copy that buffers its events; the
+    parent merges the copy back once the worker's task has finished.
+    """
+    
+    # Stages reported first, in pipeline order
+    STAGES = ("discover", "convert", "rasterize", "encode", "summarize_page", "summarize_doc", "write_index")
+    
+    def __init__(self, events_path: Optional[Path] = None):
+        """
+        Args:
+            events_path: JSONL file to append stage events to
+        """
+        self.events_path = Path(events_path) if events_path else None
+        self.durations: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        # A detached copy (in a worker process) holds its events until the
+        # parent merges it
+        self._detached = False
+        self._pending_events: Optional[List[Dict[str, Any]]] = None
+        self._stream = None
+        self._lock = threading.Lock()
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_stream"] = None
+        if not self._detached:
+            # Sent to a worker: start from an empty copy that buffers its events
+            state.update(
+                durations={}, counters={}, finished=None, _detached=True,
+                _pending_events=[] if self.events_path is not None else None,
+                events_path=None
+            )
+        return state
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def stage(self, name: str, **fields):
+        """Time the enclosed block as one occurrence of a stage."""
+        start = time.monotonic()
+        try:
+            yield
+        except BaseException:
+            self.record(name, time.monotonic() - start, error=True, **fields)
+            raise
+        self.record(name, time.monotonic() - start, **fields)
+    
+    def record(self, name: str, seconds: float, **fields) -> None:
+        """Add one occurrence of a stage that took `seconds`."""
+        with self._lock:
+            self.durations.setdefault(name, []).append(seconds)
+        self._emit({"stage": name, "seconds": round(seconds, 6), **fields})
+    
+    def count(self, name: str, amount: int = 1) -> None:
+        """Increase a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def clear(self) -> None:
+        """Forget everything recorded so far (the events file is kept)."""
+        with self._lock:
+            self.durations = {}
+            self.counters = {}
+        if self._pending_events is not None:
+            self._pending_events = []
+    
+    def merge(self, other: "IndexingMetrics") -> None:
+        """Add the durations, counters and events recorded by a detached copy."""
+        with self._lock:
+            for name, seconds in other.durations.items():
+                self.durations.setdefault(name, []).extend(seconds)
+            for name, amount in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + amount
+        for event in other._pending_events or []:
+            self._emit(event, stamped=True)
+    
+    def _emit(self, event: Dict[str, Any], stamped: bool = False) -> None:
+        if self.events_path is None and self._pending_events is None:
+            return
+        if not stamped:
+            event = {"ts": datetime.now().isoformat(), **event}
+        line = json.dumps(event, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._pending_events is not None:
+                self._pending_events.append(event)
+                return
+            if self._stream is None:
+                self.events_path.parent.mkdir(parents=True, exist_ok=True)
+                self._stream = open(self.events_path, 'a', encoding='utf-8')
+            self._stream.write(line + "\n")
+            self._stream.flush()
+    
+    def finish(self) -> None:
+        """Stop the run clock and close the event stream."""
+        with self._lock:
+            if self.finished is None:
+                self.finished = time.monotonic()
+            if self._stream is not None:
+                self._stream.close()
+                self._stream = None
+    
+    def summary(self) -> Dict[str, Any]:
+        """
+        Aggregate the run.
+        
+        Returns:
+            Wall time, pages summarized and pages per second, plus per stage
+            the number of occurrences, total seconds and p50 / p95 / max
+            seconds, and all counters
+        """
+        with self._lock:
+            durations = {name: sorted(seconds) for name, seconds in self.durations.items()}
+            counters = dict(self.counters)
+            wall_seconds = (self.finished or time.monotonic()) - self.started
+        
+        order = [name for name in self.STAGES if name in durations]
+        order += sorted(name for name in durations if name not in self.STAGES)
+        stages = {}
+        for name in order:
+            seconds = durations[name]
+            stages[name] = {
+                "count": len(seconds),
+                "total_seconds": round(sum(seconds), 6),
+                "p50_seconds": round(_percentile(seconds, 0.50), 6),
+                "p95_seconds": round(_percentile(seconds, 0.95), 6),
+                "max_seconds": round(seconds[-1], 6)
+            }
+        pages = counters.get("pages", 0)
+        return {
+            "wall_seconds": round(wall_seconds, 6),
+            "pages": pages,
+            "pages_per_second": round(pages / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+            "stages": stages,
+            "counters": counters
+        }
+    
+    def report(self) -> None:
+        """Print the summary as a table."""
+        summary = self.summary()
+        print(f"Throughput: {summary['pages']} pages in {summary['wall_seconds']:.1f}s "
+              f"({summary['pages_per_second']:.2f} pages/s)")
+        if summary["stages"]:
+            print(f"  {'stage':<16}{'count':>7}{'total s':>10}{'p50 s':>9}{'p95 s':>9}")
+        for name, stats in summary["stages"].items():
+            print(f"  {name:<16}{stats['count']:>7}{stats['total_seconds']:>10.2f}"
+                  f"{stats['p50_seconds']:>9.3f}{stats['p95_seconds']:>9.3f}")
+
+
+def _call_measured(func, args: tuple):
+    """
+    Run an indexer method in a pool worker and hand back what it measured.
+    
+    In a worker process the method's indexer is a copy with detached metrics;
+    returning them lets the parent merge the worker's timings.
+    """
+    metrics = getattr(getattr(func, "__self__", None), "metrics", None)
+    if isinstance(metrics, IndexingMetrics) and metrics._detached:
+        # A worker that hands work to its own pool (a large PDF split into
+        # page ranges) sends a copy still holding the worker's measurements;
+        # only this task's belong to the result
+        metrics.clear()
+    result = func(*args)
+    return result, metrics
+
+
+class _DocIdSequence:
+    """Hands out sequential doc_ids, skipping ids already used by other documents."""
+    
+    def __init__(self, taken: Optional[set] = None):
+        self.taken = set(taken or ())
+        self.counter = 1
+    
+    def peek(self) -> str:
+        """The id the next successful document will receive."""
+        while f"doc_{self.counter:03d}" in self.taken:
+            self.counter += 1
+        return f"doc_{self.counter:03d}"
+    
+    def take(self) -> str:
+        """Claim the next id."""
+        doc_id = self.peek()
+        self.taken.add(doc_id)
+        return doc_id
+
 
 class DataRoomIndexer:
     """
@@ -34,12 +2239,97 @@ class DataRoomIndexer:
     - Index generation
     """
     
+    # Bump when a prompt changes so cached summaries are not reused
+    PAGE_PROMPT_VERSION = "page-v1"
+    PAGE_BATCH_PROMPT_VERSION = "page-batch-v1"
+    PAGE_TEXT_PROMPT_VERSION = "page-text-v1"
+    DOCUMENT_PROMPT_VERSION = "document-v1"
+    SECTION_PROMPT_VERSION = "section-v1"
+    
+    # Page image formats and the suffix of their files; "auto" stores pages
+    # without colour as grayscale PNG and coloured pages as WebP
+    PAGE_IMAGE_FORMATS = {"png": ".png", "png_gray": ".png", "webp": ".webp", "jpeg": ".jpg", "auto": None}
+    
+    # Pixels lighter than this count as paper when trimming margins
+    TRIM_WHITE_LEVEL = 245
+    
+    SUPPORTED_EXTENSIONS = [
+        '.pdf', '.docx', '.doc', '.xlsx', '.xls',
+        '.pptx', '.ppt', '.txt', '.rtf', '.odt'
+    ]
+    
+    # Extensions read without LibreOffice, and the module each one needs
+    NATIVE_EXTENSIONS = {'.txt': None, '.docx': 'docx', '.xlsx': 'openpyxl'}
+    
+    # Skipped during discovery unless other exclude patterns are given
+    DEFAULT_EXCLUDE_PATTERNS = (".*", "~$*")
+    
+    # Rough token accounting for multi-page requests
+    MODEL_CONTEXT_TOKENS = {
+        "gpt-4o": 128_000,
+        "gpt-4o-mini": 128_000,
+        "gpt-5-nano": 400_000,
+    }
+    DEFAULT_CONTEXT_TOKENS = 128_000
+    BATCH_PROMPT_TOKENS = 250
+    SUMMARY_OUTPUT_TOKENS = 120
+    MAX_OUTPUT_TOKENS = 4096
+    
+    # Summary and text markers for pages that carry no content
+    BLANK_PAGE_SUMMARY = "[Blank page - no content]"
+    BLANK_PAGE_PHRASES = ("intentionally left blank", "intentionally blank", "page left blank")
+    
     def __init__(
         self,
         input_folder: str,
         output_folder: str,
         summarization_model: str = "gpt-4o-mini",  # or "gpt-5-nano" when available
-        dpi: int = 200
+        dpi: int = 200,
+        conversion_workers: int = 2,
+        raster_workers: int = 2,
+        summary_workers: int = 4,
+        pipeline_queue_size: int = 8,
+        conversion_pool: Optional[LibreOfficeConversionPool] = None,
+        raster_chunk_size: int = 10,
+        poppler_threads: int = 1,
+        split_workers: int = 1,
+        min_pages_per_range: int = 50,
+        summary_cache: Optional[SummaryCache] = None,
+        summarization_engine: Optional[AsyncSummarizationEngine] = None,
+        pages_per_request: int = 1,
+        batch_token_budget: int = 30_000,
+        text_fast_path: bool = True,
+        min_text_chars: int = 200,
+        blank_detection: bool = True,
+        blank_ink_threshold: float = 0.002,
+        page_dedup: bool = True,
+        dedup_max_distance: int = 4,
+        section_fan_in: int = 20,
+        max_summary_depth: int = 3,
+        index_format: str = "json",
+        doc_id_scheme: str = "stable",
+        recursive: bool = True,
+        include_patterns: Optional[List[str]] = None,
+        exclude_patterns: Optional[List[str]] = None,
+        min_file_size: int = 0,
+        max_file_size: Optional[int] = None,
+        discovery_workers: int = 8,
+        summarizer: Optional[Summarizer] = None,
+        metrics_events_path: Optional[str] = None,
+        image_format: str = "png",
+        image_quality: int = 80,
+        trim_margins: bool = False,
+        image_report: bool = False,
+        lazy_pages: bool = False,
+        render_cache: Optional[PageRenderCache] = None,
+        subprocess_timeout: Optional[float] = 60.0,
+        timeout_per_mb: float = 10.0,
+        timeout_per_page: float = 5.0,
+        max_subprocess_timeout: float = 1800.0,
+        quarantine_after: int = 2,
+        libreoffice_profiles_folder: Optional[str] = None,
+        native_extraction: bool = False,
+        native_page_chars: int = 3000
     ):
         """
         Initialize the data room indexer.
@@ -49,11 +2339,193 @@ class DataRoomIndexer:
             output_folder: Path where processed files and index will be saved
             summarization_model: Model to use for summarization
             dpi: DPI for page image extraction (higher = better quality, larger files)
+            conversion_workers: Processes used for LibreOffice conversion in pipelined mode
+            raster_workers: Processes used for page extraction in pipelined mode
+            summary_workers: Threads used for (I/O-bound) summarization in pipelined mode
+            pipeline_queue_size: Maximum number of documents waiting between two
+                pipeline stages before the upstream stage blocks
+            conversion_pool: Started LibreOfficeConversionPool used instead of
+                launching a new LibreOffice process per file
+            raster_chunk_size: Pages rendered per poppler call; bounds the number
+                of decoded page images held in memory at once
+            poppler_threads: Threads poppler uses to render each chunk
+            split_workers: Page ranges one large PDF is split into so they
+                render in parallel (1, the default, renders every document
+                in a single process); pipelined runs queue the ranges on the
+                raster_workers pool instead of starting more processes
+            min_pages_per_range: Fewest pages a range is given; a document is
+                split into at most page_count // min_pages_per_range ranges,
+                so only long documents are split and longer ones use more
+                processes
+            summary_cache: Cache consulted before every page and document
+                summarization request
+            summarization_engine: Summarize the pages of a document concurrently
+                under rate limits instead of one request at a time
+            pages_per_request: Maximum page images packed into one vision
+                request (1 sends each page on its own)
+            batch_token_budget: Estimated prompt tokens allowed per multi-page
+                request; batches shrink for large page images
+            text_fast_path: Summarize pages with a usable text layer from their
+                text and send only the other pages to the vision model
+            min_text_chars: Non-whitespace characters a page needs for its
+                text layer to count as usable
+            blank_detection: Give blank and near-blank pages a canned summary
+                instead of sending them to the model
+            blank_ink_threshold: Largest inked fraction of a page that still
+                counts as blank
+            page_dedup: Group near-identical pages (signature blocks, cover
+                sheets, boilerplate annexes) into clusters and summarize
+                confirmed copies once across the data room
+            dedup_max_distance: Largest Hamming distance between two page
+                dHashes that still puts them in the same cluster
+            section_fan_in: Summaries combined per prompt when summarizing long
+                documents hierarchically; shorter documents are summarized in
+                one step
+            max_summary_depth: Maximum number of section levels
+            index_format: "json" saves a single data_room_index.json; "sharded"
+                saves a catalog plus one page shard per document, which
+                consumers can load lazily
+            doc_id_scheme: "stable" derives each doc_id from the file's relative
+                path and content hash and keeps earlier ids as aliases in
+                "legacy_ids"; "sequential" numbers documents doc_001, doc_002, ...
+                in discovery order
+            recursive: Also index documents in subfolders of the input folder
+            include_patterns: Globs a file must match to be indexed (all
+                supported files when empty)
+            exclude_patterns: Globs of files and folders to skip; defaults to
+                DEFAULT_EXCLUDE_PATTERNS (hidden entries and Office lock files)
+            min_file_size: Smallest file size in bytes that is indexed
+            max_file_size: Largest file size in bytes that is indexed
+            discovery_workers: Threads listing folders during discovery
+            summarizer: Model backend answering the summarization prompts
+                (OpenAISummarizer, AnthropicSummarizer, StubSummarizer or any
+                Summarizer); its model replaces summarization_model. Without
+                one, placeholder summaries are produced.
+            metrics_events_path: JSONL file receiving one line per timed stage
+                event (conversion, render, model request, ...) during builds
+            image_format: Storage format of page images: "png" (lossless
+                colour), "png_gray" (lossless grayscale, suits text pages),
+                "webp", "jpeg" or "auto" (grayscale PNG for pages without
+                colour, WebP for the others)
+            image_quality: Quality (1-100) of WebP and JPEG page images
+            trim_margins: Crop the blank margins around the page content
+                before saving; near-blank pages are kept whole
+            image_report: Also measure what each page would take as today's
+                lossless colour PNG and report the bytes saved (costs an extra
+                PNG encode per page)
+            lazy_pages: Keep only the PDF and page metadata instead of
+                rendering every page; page records get no page_image and
+                pages are rendered on demand through the render cache. Only
+                pages summarized from their image are rendered at index time.
+            render_cache: PageRenderCache used in lazy mode (defaults to one in
+                the output folder's render_cache subfolder)
+            subprocess_timeout: Seconds a LibreOffice or poppler call on a
+                small file may run before its process group is killed (None
+                disables the timeouts)
+            timeout_per_mb: Seconds added to the timeout per MB of the file
+            timeout_per_page: Seconds added to a poppler render's timeout per
+                page rendered
+            max_subprocess_timeout: Upper bound of a single call's timeout
+            quarantine_after: Timeouts or crashes after which a file is
+                skipped by later runs until it changes (0 never skips); see
+                FailureQuarantine and failure_report.json
+            libreoffice_profiles_folder: Where the private LibreOffice user
+                profiles of the conversion workers are kept (defaults to the
+                output folder's lo_profiles subfolder)
+            native_extraction: Read .txt, .docx (python-docx) and .xlsx
+                (openpyxl) files directly and summarize them from their text,
+                without converting them to PDF; LibreOffice renders their
+                pages only when a page image is requested. Files that cannot
+                be read this way are converted as usual. Off by default:
+                native pages are split by native_page_chars, so page N of
+                the summaries is not necessarily page N of the rendering
+            native_page_chars: Characters of text per page of a natively read
+                document; hard page breaks (form feeds, Word page breaks,
+                worksheets) always start a new page
         """
+        if index_format not in INDEX_FORMATS:
+            raise ValueError(f"Unknown index format {index_format!r}; expected one of {INDEX_FORMATS}")
+        if image_format not in self.PAGE_IMAGE_FORMATS:
+            raise ValueError(
+                f"Unknown image format {image_format!r}; expected one of {tuple(self.PAGE_IMAGE_FORMATS)}"
+            )
+        if doc_id_scheme not in ("stable", "sequential"):
+            raise ValueError(f"Unknown doc_id scheme {doc_id_scheme!r}; expected 'stable' or 'sequential'")
+
         self.input_folder = Path(input_folder)
         self.output_folder = Path(output_folder)
         self.summarization_model = summarization_model
         self.dpi = dpi
+        self.conversion_workers = conversion_workers
+        self.raster_workers = raster_workers
+        self.summary_workers = summary_workers
+        self.pipeline_queue_size = pipeline_queue_size
+        self.conversion_pool = conversion_pool
+        self.raster_chunk_size = max(1, raster_chunk_size)
+        self.poppler_threads = poppler_threads
+        self.split_workers = max(1, split_workers)
+        self.min_pages_per_range = max(1, min_pages_per_range)
+        self.summary_cache = summary_cache
+        self.summarization_engine = summarization_engine
+        self.pages_per_request = max(1, pages_per_request)
+        self.batch_token_budget = batch_token_budget
+        self.text_fast_path = text_fast_path
+        self.min_text_chars = min_text_chars
+        self.blank_detection = blank_detection
+        self.blank_ink_threshold = blank_ink_threshold
+        self.page_dedup = page_dedup
+        self.dedup_max_distance = dedup_max_distance
+        self.shared_pages = SharedPageSummaries(dedup_max_distance)
+        self.section_fan_in = max(2, section_fan_in)
+        self.max_summary_depth = max(1, max_summary_depth)
+        self.index_format = index_format
+        self.doc_id_scheme = doc_id_scheme
+        self.recursive = recursive
+        self.include_patterns = list(include_patterns or [])
+        self.exclude_patterns = list(
+            self.DEFAULT_EXCLUDE_PATTERNS if exclude_patterns is None else exclude_patterns
+        )
+        self.min_file_size = min_file_size
+        self.max_file_size = max_file_size
+        self.discovery_workers = max(1, discovery_workers)
+        self.summarizer = summarizer
+        if summarizer is not None:
+            self.summarization_model = summarizer.model
+        self.metrics_events_path = metrics_events_path
+        self.image_format = image_format
+        self.image_quality = min(100, max(1, image_quality))
+        self.trim_margins = trim_margins
+        self.image_report = image_report
+        self.lazy_pages = lazy_pages
+        if lazy_pages and render_cache is None:
+            render_cache = PageRenderCache(
+                str(self.output_folder / "render_cache"),
+                dpi=dpi,
+                image_format=image_format if image_format in PageRenderCache.FORMATS else "png",
+                quality=self.image_quality,
+                poppler_threads=poppler_threads,
+                timeout=subprocess_timeout and min(max_subprocess_timeout, subprocess_timeout + timeout_per_page)
+            )
+        self.render_cache = render_cache
+        self.subprocess_timeout = subprocess_timeout
+        self.timeout_per_mb = timeout_per_mb
+        self.timeout_per_page = timeout_per_page
+        self.max_subprocess_timeout = max_subprocess_timeout
+        self.quarantine = FailureQuarantine(str(self.output_folder / "quarantine.json"), quarantine_after)
+        self.libreoffice_profiles = LibreOfficeProfiles(
+            libreoffice_profiles_folder or str(self.output_folder / "lo_profiles"),
+            timeout=subprocess_timeout or 120.0
+        )
+        # Documents that failed in the current (or last) build
+        self.failures: List[Dict[str, Any]] = []
+        self.native_extraction = native_extraction
+        self.native_page_chars = max(100, native_page_chars)
+        # Stage timings and counters of the current (or last) build
+        self.metrics = IndexingMetrics(metrics_events_path)
+        # Write-ahead journal of the running build and what it can resume
+        self.journal: Optional[IndexJournal] = None
+        self._run_fingerprints: Dict[Path, Dict[str, Any]] = {}
+        self._resume_progress: Dict[Path, Dict[str, Any]] = {}
         
         # Create output directories
         self.pages_folder = self.output_folder / "pages"
@@ -61,6 +2533,17 @@ class DataRoomIndexer:
         self.pages_folder.mkdir(parents=True, exist_ok=True)
         self.pdfs_folder.mkdir(parents=True, exist_ok=True)
     
+    def __getstate__(self) -> Dict[str, Any]:
+        # Process pool workers get a copy of the indexer; the conversion pool
+        # (live processes and sockets) stays with the parent process, and so
+        # does the state of the running build, which grows with the data room
+        state = self.__dict__.copy()
+        state["conversion_pool"] = None
+        state["journal"] = None
+        state["quarantine"] = None
+        state.update(_run_fingerprints={}, _resume_progress={}, failures=[])
+        return state
+    
     def convert_to_pdf(self, file_path: Path) -> Path:
         """
         Convert a file to PDF using LibreOffice.
@@ -69,76 +2552,243 @@ class DataRoomIndexer:
             file_path: Path to the file to convert
             
         Returns:
-            Path to the converted PDF file
+            Path to the converted PDF file
+        """
+        with self.metrics.stage("convert", file=file_path.name):
+            output_folder = self.pdf_output_folder(file_path)
+        
+            # Check if already PDF
+            if file_path.suffix.lower() == '.pdf':
+                # Copy to pdfs folder
+                output_path = output_folder / file_path.name
+                shutil.copy2(file_path, output_path)
+                return output_path
+        
+            if self.conversion_pool is not None:
+                return self.conversion_pool.convert(file_path, output_folder)
+        
+            # Determine LibreOffice command based on OS
+            import platform
+            system = platform.system()
+            libreoffice_cmd = find_libreoffice_command()
+        
+            # Convert using LibreOffice
+            timeout = self.subprocess_timeout_for(file_path)
+            try:
+                result = run_watched([
+                    libreoffice_cmd,
+                    '--headless',
+                    self.libreoffice_profiles.argument(),
+                    '--convert-to', 'pdf',
+                    '--outdir', str(output_folder),
+                    str(file_path)
+                ], timeout=timeout, check=True, capture_output=True, text=True)
+            
+                # Return path to converted PDF
+                pdf_name = file_path.stem + '.pdf'
+                return output_folder / pdf_name
+            
+            except subprocess.TimeoutExpired:
+                raise TimeoutError(f"LibreOffice did not convert {file_path.name} within {timeout:.0f}s")
+            except subprocess.CalledProcessError as e:
+                print(f"Error converting {file_path}: {e}")
+                print(f"STDOUT: {e.stdout}")
+                print(f"STDERR: {e.stderr}")
+                raise
+            except FileNotFoundError:
+                print("LibreOffice not found. Please install LibreOffice:")
+                print("  Ubuntu/Debian: sudo apt-get install libreoffice")
+                print("  macOS: brew install --cask libreoffice")
+                print("  Windows: winget install TheDocumentFoundation.LibreOffice")
+                print("           Or download from https://www.libreoffice.org/")
+                print(f"\nOS Detected: {system}")
+                if system == 'Windows':
+                    print("\nSearched the following paths:")
+                    for path in WINDOWS_LIBREOFFICE_PATHS:
+                        exists = "✓ Found" if Path(path).exists() else "✗ Not found"
+                        print(f"  {exists}: {path}")
+                raise
+    
+    def pdf_output_folder(self, file_path: Path) -> Path:
+        """
+        Folder a file's PDF is written to.
+        
+        Mirrors the file's folder inside the data room, so files with the same
+        name in different folders do not overwrite each other's PDF.
+        """
+        try:
+            relative_folder = file_path.parent.relative_to(self.input_folder)
+        except ValueError:
+            return self.pdfs_folder
+        output_folder = self.pdfs_folder / relative_folder
+        output_folder.mkdir(parents=True, exist_ok=True)
+        return output_folder
+    
+    def subprocess_timeout_for(self, file_path: Path, pages: int = 0) -> Optional[float]:
+        """
+        Seconds a LibreOffice or poppler call on a file may run before it is killed.
+        
+        The timeout grows with the file's size and the number of pages
+        rendered, so large documents get the time they need while a small
+        file that hangs is given up on quickly.
+        
+        Args:
+            file_path: File the call works on
+            pages: Pages the call renders
+            
+        Returns:
+            Timeout in seconds, or None when timeouts are disabled
+        """
+        if self.subprocess_timeout is None:
+            return None
+        try:
+            size_mb = file_path.stat().st_size / 2**20
+        except OSError:
+            size_mb = 0.0
+        return min(
+            self.max_subprocess_timeout,
+            self.subprocess_timeout + self.timeout_per_mb * size_mb + self.timeout_per_page * pages
+        )
+    
+    def convert_many_to_pdf(
+        self,
+        file_paths: List[Path],
+        batch_size: int = 50
+    ) -> Tuple[Dict[Path, Path], Dict[Path, Exception]]:
+        """
+        Convert many files to PDF with one LibreOffice invocation per batch.
+        
+        Files are grouped by extension and each group is split into batches
+        of at most `batch_size` files, so the per-process startup cost is paid
+        once per batch rather than once per file. Files whose PDF names would
+        collide are placed in different batches, which lets every output be
+        mapped back to its source by name.
+        
+        Args:
+            file_paths: Files to convert
+            batch_size: Maximum number of files per LibreOffice invocation
+            
+        Returns:
+            Tuple of (source path -> PDF path for converted files,
+            source path -> error for files that failed)
         """
-        # Check if already PDF
-        if file_path.suffix.lower() == '.pdf':
-            # Copy to pdfs folder
-            output_path = self.pdfs_folder / file_path.name
-            import shutil
-            shutil.copy2(file_path, output_path)
-            return output_path
-        
-        # Determine LibreOffice command based on OS
-        import platform
-        system = platform.system()
-        
-        if system == 'Windows':
-            # Try common Windows paths for soffice.exe
-            possible_paths = [
-                r'C:\Program Files\LibreOffice\program\soffice.exe',
-                r'C:\Program Files (x86)\LibreOffice\program\soffice.exe',
-            ]
-            libreoffice_cmd = None
-            for path in possible_paths:
-                if Path(path).exists():
-                    libreoffice_cmd = path
-                    break
+        converted: Dict[Path, Path] = {}
+        failures: Dict[Path, Exception] = {}
+        
+        groups: Dict[str, List[Path]] = {}
+        for file_path in file_paths:
+            groups.setdefault(file_path.suffix.lower(), []).append(file_path)
+        
+        for suffix, group in sorted(groups.items()):
+            if suffix == '.pdf' or self.conversion_pool is not None:
+                # Nothing to batch: PDFs are copied and the pool keeps its own
+                # instances warm
+                for file_path in group:
+                    try:
+                        converted[file_path] = self.convert_to_pdf(file_path)
+                    except Exception as e:
+                        failures[file_path] = e
+                continue
             
-            if not libreoffice_cmd:
-                # Try using PATH (command is 'soffice' on Windows)
-                libreoffice_cmd = 'soffice'
-        else:
-            # Linux/Mac use 'libreoffice' command
-            libreoffice_cmd = 'libreoffice'
+            for batch in self._conversion_batches(group, batch_size):
+                print(f"  Converting batch of {len(batch)} {suffix} files...")
+                with self.metrics.stage("convert", files=len(batch)):
+                    batch_converted, batch_failures = self._convert_batch(batch)
+                converted.update(batch_converted)
+                failures.update(batch_failures)
+        
+        return converted, failures
+    
+    @staticmethod
+    def _conversion_batches(file_paths: List[Path], batch_size: int) -> List[List[Path]]:
+        """Split files into batches in which no two files produce the same PDF name."""
+        batches: List[List[Path]] = []
+        batch_stems: List[set] = []
+        for file_path in file_paths:
+            stem = file_path.stem.lower()
+            for batch, stems in zip(batches, batch_stems):
+                if len(batch) < batch_size and stem not in stems:
+                    batch.append(file_path)
+                    stems.add(stem)
+                    break
+            else:
+                batches.append([file_path])
+                batch_stems.append({stem})
+        return batches
+    
+    def _convert_batch(self, batch: List[Path]) -> Tuple[Dict[Path, Path], Dict[Path, Exception]]:
+        """
+        Run one LibreOffice process over a batch and map outputs back to sources.
+        
+        The batch gets the sum of its files' timeouts. When it runs out, the
+        files left without a PDF are converted one at a time, so only the
+        file that hangs fails.
+        """
+        # Files of a batch may come from different folders, so LibreOffice
+        # writes into a staging folder and each PDF is then moved into place
+        staging_folder = self.pdfs_folder / "_batch"
+        staging_folder.mkdir(exist_ok=True)
+        expected = {file_path: staging_folder / (file_path.stem + '.pdf') for file_path in batch}
+        
+        # Remove outputs of earlier runs so only fresh files count as converted
+        for pdf_path in expected.values():
+            if pdf_path.exists():
+                pdf_path.unlink()
         
-        # Convert using LibreOffice
+        timeouts = [self.subprocess_timeout_for(file_path) for file_path in batch]
+        batch_error = None
+        timed_out = False
         try:
-            result = subprocess.run([
-                libreoffice_cmd,
+            run_watched([
+                find_libreoffice_command(),
                 '--headless',
+                self.libreoffice_profiles.argument(),
                 '--convert-to', 'pdf',
-                '--outdir', str(self.pdfs_folder),
-                str(file_path)
-            ], check=True, capture_output=True, text=True)
-            
-            # Return path to converted PDF
-            pdf_name = file_path.stem + '.pdf'
-            return self.pdfs_folder / pdf_name
-            
+                '--outdir', str(staging_folder),
+                *[str(file_path) for file_path in batch]
+            ], timeout=None if None in timeouts else sum(timeouts), check=True, capture_output=True, text=True)
         except subprocess.CalledProcessError as e:
-            print(f"Error converting {file_path}: {e}")
-            print(f"STDOUT: {e.stdout}")
-            print(f"STDERR: {e.stderr}")
-            raise
-        except FileNotFoundError:
-            print("LibreOffice not found. Please install LibreOffice:")
-            print("  Ubuntu/Debian: sudo apt-get install libreoffice")
-            print("  macOS: brew install --cask libreoffice")
-            print("  Windows: winget install TheDocumentFoundation.LibreOffice")
-            print("           Or download from https://www.libreoffice.org/")
-            print(f"\nOS Detected: {system}")
-            if system == 'Windows':
-                print("\nSearched the following paths:")
-                for path in possible_paths:
-                    exists = "✓ Found" if Path(path).exists() else "✗ Not found"
-                    print(f"  {exists}: {path}")
+            # LibreOffice keeps going after a bad file, so some outputs may exist
+            batch_error = (e.stderr or str(e)).strip()
+        except subprocess.TimeoutExpired:
+            print(f"  Batch of {len(batch)} files timed out; converting the rest one at a time")
+            timed_out = True
+        
+        converted: Dict[Path, Path] = {}
+        failures: Dict[Path, Exception] = {}
+        for file_path, pdf_path in expected.items():
+            if pdf_path.exists():
+                converted[file_path] = self.pdf_output_folder(file_path) / pdf_path.name
+                os.replace(pdf_path, converted[file_path])
+            elif timed_out:
+                try:
+                    converted[file_path] = self.convert_to_pdf(file_path)
+                except Exception as e:
+                    failures[file_path] = e
+            else:
+                failures[file_path] = RuntimeError(batch_error or "LibreOffice produced no PDF for this file")
+        return converted, failures
+    
+    def get_pdf_page_count(self, pdf_path: Path) -> int:
+        """Read the number of pages of a PDF with poppler's pdfinfo."""
+        try:
+            info = pdfinfo_from_path(str(pdf_path), timeout=self.subprocess_timeout_for(pdf_path))
+        except Exception as e:
+            print(f"Error reading page count of {pdf_path}: {e}")
             raise
+        return int(info["Pages"])
     
     def extract_pages_as_images(self, pdf_path: Path, doc_id: str) -> List[Path]:
         """
         Extract each page of a PDF as an image.
         
+        Pages are rendered in chunks of `raster_chunk_size` and each chunk is
+        saved and released before the next one is rendered, so peak memory
+        depends on the chunk size rather than on the length of the document.
+        Long documents are split into page ranges (see page_ranges) that are
+        rendered by separate processes; page files are numbered by their page
+        in the PDF either way.
+        
         Args:
             pdf_path: Path to the PDF file
             doc_id: Unique identifier for this document
@@ -150,31 +2800,236 @@ class DataRoomIndexer:
         doc_pages_folder = self.pages_folder / doc_id
         doc_pages_folder.mkdir(exist_ok=True)
         
-        # Convert PDF pages to images
-        try:
-            images = convert_from_path(
-                str(pdf_path),
-                dpi=self.dpi,
-                fmt='png'
-            )
-        except Exception as e:
-            print(f"Error extracting pages from {pdf_path}: {e}")
-            raise
+        page_count = self.get_pdf_page_count(pdf_path)
+        ranges = self.page_ranges(page_count)
+        if len(ranges) <= 1:
+            return self.extract_page_range(pdf_path, doc_id, 1, page_count)
+        
+        print(f"  Rendering {page_count} pages in {len(ranges)} ranges")
+        with ProcessPoolExecutor(max_workers=len(ranges)) as range_pool:
+            futures = [
+                self._submit_measured(range_pool, self.extract_page_range, pdf_path, doc_id, first_page, last_page)
+                for first_page, last_page in ranges
+            ]
+            page_paths = []
+            for future in futures:
+                page_paths.extend(future.result())
+        return page_paths
+    
+    def page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        """
+        Split a document's pages into the ranges rendered by separate processes.
+        
+        A document gets one range per min_pages_per_range pages, up to
+        split_workers ranges, so short documents are not split at all (a
+        worker process costs more than rendering a few pages) and long ones
+        are spread over every worker. Ranges are whole raster chunks where
+        possible and cover pages 1 to page_count in order.
+        
+        Args:
+            page_count: Number of pages in the document
+            
+        Returns:
+            List of (first_page, last_page) tuples, both inclusive
+        """
+        range_count = min(self.split_workers, page_count // self.min_pages_per_range)
+        if range_count <= 1:
+            return [(1, page_count)] if page_count else []
+        
+        range_size = -(-page_count // range_count)
+        range_size = -(-range_size // self.raster_chunk_size) * self.raster_chunk_size
+        return [
+            (first_page, min(first_page + range_size - 1, page_count))
+            for first_page in range(1, page_count + 1, range_size)
+        ]
+    
+    def extract_page_range(self, pdf_path: Path, doc_id: str, first_page: int, last_page: int) -> List[Path]:
+        """
+        Render pages first_page to last_page of a PDF in raster chunks.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            doc_id: Unique identifier for this document
+            first_page: First page to render (1-based)
+            last_page: Last page to render (inclusive)
+            
+        Returns:
+            List of paths to the rendered page images, in page order
+        """
+        doc_pages_folder = self.pages_folder / doc_id
+        doc_pages_folder.mkdir(exist_ok=True)
         
-        # Save each page
         page_paths = []
-        for i, image in enumerate(images, start=1):
-            page_path = doc_pages_folder / f"page_{i:03d}.png"
-            image.save(page_path, 'PNG')
-            page_paths.append(page_path)
+        for chunk_start in range(first_page, last_page + 1, self.raster_chunk_size):
+            chunk_end = min(chunk_start + self.raster_chunk_size - 1, last_page)
+            
+            # Convert this range of PDF pages to images
+            try:
+                with self.metrics.stage("rasterize", doc_id=doc_id, pages=chunk_end - chunk_start + 1):
+                    images = convert_from_path(
+                        str(pdf_path),
+                        dpi=self.dpi,
+                        fmt='png',
+                        first_page=chunk_start,
+                        last_page=chunk_end,
+                        thread_count=self.poppler_threads,
+                        timeout=self.subprocess_timeout_for(pdf_path, chunk_end - chunk_start + 1)
+                    )
+            except Exception as e:
+                print(f"Error extracting pages {chunk_start}-{chunk_end} from {pdf_path}: {e}")
+                raise
+            
+            # Save each page of the chunk
+            with self.metrics.stage("encode", doc_id=doc_id, pages=len(images)):
+                for i, image in enumerate(images, start=chunk_start):
+                    page_paths.append(self.save_page_image(image, doc_pages_folder / f"page_{i:03d}"))
+                    image.close()
+            self.metrics.count("pages_rendered", len(images))
+            del images
         
         return page_paths
     
+    # ------------------------------------------------------------------------
+    # Page image storage
+    # ------------------------------------------------------------------------
+    
+    def save_page_image(self, image, path_stem: Path) -> Path:
+        """
+        Save a rendered page in the configured image format.
+        
+        Margins are trimmed first when trim_margins is set. The stored size
+        (and with image_report the size the page would have as a lossless
+        colour PNG) is added to the metrics counters.
+        
+        Args:
+            image: Rendered page (PIL image)
+            path_stem: Path of the page image without suffix
+            
+        Returns:
+            Path of the saved page image
+        """
+        stored = self.trim_page_margins(image) if self.trim_margins else image
+        image_format = self.image_format
+        if image_format == "auto":
+            image_format = "png_gray" if self.is_grayscale_image(stored) else "webp"
+        page_path = path_stem.with_suffix(self.PAGE_IMAGE_FORMATS[image_format])
+        
+        if image_format == "png":
+            stored.save(page_path, 'PNG')
+        elif image_format == "png_gray":
+            stored.convert('L').save(page_path, 'PNG', optimize=True)
+        elif image_format == "webp":
+            stored.save(page_path, 'WEBP', quality=self.image_quality, method=4)
+        else:
+            if stored.mode not in ('RGB', 'L'):
+                stored = stored.convert('RGB')
+            stored.save(page_path, 'JPEG', quality=self.image_quality, optimize=True)
+        
+        try:
+            self.metrics.count("image_bytes", os.path.getsize(page_path))
+        except OSError:
+            pass
+        if self.image_report:
+            baseline = io.BytesIO()
+            image.save(baseline, 'PNG')
+            self.metrics.count("image_baseline_bytes", baseline.tell())
+        if stored is not image:
+            stored.close()
+        return page_path
+    
+    def trim_page_margins(self, image):
+        """
+        Crop the blank margins around the content of a page.
+        
+        A padding of a tenth of an inch is kept around the content. Pages
+        whose content covers less than a tenth of the page (blank pages, a
+        lone page number) are returned whole, so blank detection still sees
+        them as blank.
+        """
+        grayscale = image.convert('L')
+        mask = grayscale.point(lambda value: 255 if value < self.TRIM_WHITE_LEVEL else 0)
+        bbox = mask.getbbox()
+        grayscale.close()
+        mask.close()
+        if bbox is None:
+            return image
+        
+        width, height = image.size
+        left, top, right, bottom = bbox
+        if (right - left) * (bottom - top) < 0.1 * width * height:
+            return image
+        padding = max(1, self.dpi // 10)
+        box = (max(0, left - padding), max(0, top - padding), min(width, right + padding), min(height, bottom + padding))
+        if box == (0, 0, width, height):
+            return image
+        return image.crop(box)
+    
+    @staticmethod
+    def is_grayscale_image(image, tolerance: int = 24, max_colour_share: float = 0.002) -> bool:
+        """
+        Whether a page has (practically) no colour.
+        
+        Checked on a thumbnail: the page counts as grayscale when fewer than
+        `max_colour_share` of its pixels have channels differing by more
+        than `tolerance`.
+        """
+        import numpy as np
+        
+        if image.mode in ('1', 'L', 'LA', 'I', 'F'):
+            return True
+        sample = image.convert('RGB')
+        sample.thumbnail((128, 128))
+        pixels = np.asarray(sample, dtype=np.int16)
+        sample.close()
+        if pixels.ndim != 3:
+            return False
+        spread = pixels.max(axis=2) - pixels.min(axis=2)
+        return float((spread > tolerance).mean()) < max_colour_share
+    
+    def image_storage_report(self) -> Dict[str, Any]:
+        """
+        Page image storage of the current (or last) build.
+        
+        Returns:
+            Pages rendered, bytes stored in total and per page, and with
+            image_report the bytes the same pages take as lossless colour PNG
+            and the bytes saved per page
+        """
+        counters = self.metrics.summary()["counters"]
+        pages = counters.get("pages_rendered", 0)
+        stored = counters.get("image_bytes", 0)
+        report = {
+            "format": self.image_format,
+            "trim_margins": self.trim_margins,
+            "pages": pages,
+            "bytes": stored,
+            "bytes_per_page": stored // pages if pages else 0
+        }
+        if "image_baseline_bytes" in counters:
+            baseline = counters["image_baseline_bytes"]
+            report.update(
+                baseline_bytes=baseline,
+                saved_bytes_per_page=(baseline - stored) // pages if pages else 0,
+                saved_fraction=round(1 - stored / baseline, 4) if baseline else 0.0
+            )
+        return report
+    
     def image_to_base64(self, image_path: Path) -> str:
         """Convert image to base64 string for API transmission."""
         with open(image_path, 'rb') as image_file:
             return base64.b64encode(image_file.read()).decode('utf-8')
     
+    async def _complete(self, awaited: bool, prompt: str, **kwargs) -> str:
+        """
+        Ask the summarizer backend for an answer.
+        
+        Requests run by the summarization engine for a backend with a native
+        acomplete() are awaited (awaited=True); all others call complete().
+        """
+        if awaited:
+            return await self.summarizer.acomplete(prompt, **kwargs)
+        return self.summarizer.complete(prompt, **kwargs)
+    
     def summarize_page_with_ai(self, image_path: Path, page_num: int) -> str:
         """
         Use AI to generate a summary of a page image.
@@ -186,8 +3041,17 @@ class DataRoomIndexer:
         Returns:
             Summary text describing the page content
         """
-        # In production, this would call your AI API
-        # For this example, we'll show the structure
+        return _run_inline(self._summarize_page(image_path, page_num))
+    
+    async def _summarize_page(self, image_path: Path, page_num: int, awaited: bool = False) -> str:
+        cache_key = None
+        if self.summary_cache is not None:
+            cache_key = SummaryCache.make_key(
+                self.file_content_hash(image_path), self.summarization_model, self.PAGE_PROMPT_VERSION
+            )
+            cached = self.summary_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
         prompt = f"""Analyze this document page (page {page_num}) and provide a concise summary.
 
@@ -199,140 +3063,1195 @@ Focus on:
 
 Provide a 1-2 sentence summary that captures the essential content of this page."""
         
-        # Example using OpenAI API (uncomment and configure in production)
+        if self.summarizer is not None:
+            summary = await self._complete(awaited, prompt, images=[image_path], max_tokens=200)
+        else:
+            # Placeholder when no summarizer backend is configured
+            summary = f"[Summary of page {page_num} - to be generated by AI model]"
+        
+        if cache_key is not None:
+            self.summary_cache.put(cache_key, summary)
+        return summary
+    
+    def summarize_pages(
+        self,
+        page_paths: List[Path],
+        page_texts: Optional[List[str]] = None,
+        done_pages: Optional[Dict[int, Dict[str, Any]]] = None,
+        on_page=None
+    ) -> List[Dict[str, Any]]:
         """
-        import openai
+        Summarize the pages of a document, in page order.
         
-        # Read and encode image
-        image_base64 = self.image_to_base64(image_path)
-        
-        response = openai.chat.completions.create(
-            model=self.summarization_model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=200
-        )
+        Blank pages get a canned summary without any model call, and confirmed
+        copies of a page seen earlier in the build, in this or another
+        document, wait for that page's summary (see SharedPageSummaries).
+        Pages with a usable text layer are summarized from their text. The
+        remaining pages go to the vision model, one per request or packed
+        into multi-page requests when pages_per_request > 1. All requests run
+        concurrently when a summarization engine is configured.
+        
+        Args:
+            page_paths: Paths to the page images, in page order
+            page_texts: Extracted text of each page, if available
+            done_pages: Records of pages already summarized by an interrupted
+                run, by page number; these pages are not summarized again
+            on_page: Called with (page_num, record) as soon as a model request
+                for the page completes, or the summary of its first copy is in
+            
+        Returns:
+            One record per page with its summary ("summdesc"), whether it is
+            blank ("blank"), its perceptual hash and exact digest ("phash"
+            and "digest", when computed) and the route taken to produce the
+            summary ("blank", "duplicate", "text" or "vision")
+        """
+        page_texts = page_texts or []
+        done_pages = done_pages or {}
+        records: List[Dict[str, Any]] = [{} for _ in page_paths]
+        
+        # (summarizer, its coroutine variant, arguments, page numbers it covers)
+        calls = []
+        vision_pages = []
+        # Futures of the first copies this document summarizes for the build,
+        # and of the first copies its other pages wait for, by page number
+        claimed: Dict[int, Future] = {}
+        copies: Dict[int, Future] = {}
+        for page_num, page_path in enumerate(page_paths, start=1):
+            text = page_texts[page_num - 1] if page_num <= len(page_texts) else ""
+            record = records[page_num - 1]
+            if page_num in done_pages:
+                record.update(done_pages[page_num])
+                if self.page_dedup and record.get("phash") and record.get("digest"):
+                    self.shared_pages.add(record["digest"], int(record["phash"], 16), record["summdesc"])
+                continue
+            
+            record["blank"] = self.blank_detection and self.is_blank_page(page_path, text)
+            if record["blank"]:
+                record["route"] = "blank"
+                record["summdesc"] = self.BLANK_PAGE_SUMMARY
+                continue
+            
+            page_hash = self.page_hash(page_path) if self.page_dedup else None
+            digest = self.page_digest(page_path, text) if page_hash is not None else None
+            if page_hash is not None:
+                record["phash"] = f"{page_hash:016x}"
+            if digest is not None:
+                record["digest"] = digest
+                future, owner = self.shared_pages.claim(digest, page_hash)
+                if not owner:
+                    record["route"] = "duplicate"
+                    copies[page_num] = future
+                    continue
+                claimed[page_num] = future
+            
+            if self._summarized_from_text(page_path, text):
+                record["route"] = "text"
+                calls.append((self.summarize_page_text_with_ai, self._summarize_page_text, (text, page_num), [page_num]))
+            else:
+                record["route"] = "vision"
+                vision_pages.append(page_num)
+        
+        if self.pages_per_request > 1 and vision_pages:
+            vision_paths = [page_paths[n - 1] for n in vision_pages]
+            for batch in self.plan_page_batches(vision_paths, vision_pages):
+                batch_paths = [page_paths[n - 1] for n in batch]
+                calls.append((self.summarize_pages_batch_with_ai, self._summarize_pages_batch, (batch_paths, batch), batch))
+        else:
+            for page_num in vision_pages:
+                calls.append((
+                    self.summarize_page_with_ai, self._summarize_page, (page_paths[page_num - 1], page_num), [page_num]
+                ))
+        calls.sort(key=lambda call: call[3][0])
+        
+        def finish_call(nums, result):
+            if on_page is not None:
+                summaries = result if isinstance(result, list) else [result]
+                for page_num, summary in zip(nums, summaries):
+                    on_page(page_num, {**records[page_num - 1], "summdesc": summary})
+            return result
+        
+        def run_call(func, coroutine_func, args, nums):
+            with self.metrics.stage("summarize_page", pages=len(nums), route=records[nums[0] - 1]["route"]):
+                result = self._invoke_summarizer(func, args)
+            return finish_call(nums, result)
+        
+        async def await_call(func, coroutine_func, args, nums):
+            with self.metrics.stage("summarize_page", pages=len(nums), route=records[nums[0] - 1]["route"]):
+                result = await coroutine_func(*args, awaited=True)
+            return finish_call(nums, result)
+        
+        try:
+            if self.summarization_engine is not None:
+                print(f"    {len(page_paths)} pages in {len(calls)} requests, up to "
+                      f"{self.summarization_engine.max_concurrency} concurrent...")
+                results = self.summarization_engine.map(
+                    await_call if self._awaits_summarizer() else run_call, calls
+                )
+            else:
+                results = []
+                for func, coroutine_func, args, nums in calls:
+                    label = f"{nums[0]}" if len(nums) == 1 else f"{nums[0]}-{nums[-1]}"
+                    route = records[nums[0] - 1]["route"]
+                    print(f"    Summarizing page {label}/{len(page_paths)} ({route})...")
+                    results.append(run_call(func, coroutine_func, args, nums))
+            
+            for (_, _, _, nums), result in zip(calls, results):
+                summaries = result if isinstance(result, list) else [result]
+                for page_num, summary in zip(nums, summaries):
+                    records[page_num - 1]["summdesc"] = summary
+            for page_num, future in claimed.items():
+                future.set_result(records[page_num - 1]["summdesc"])
+        except BaseException as e:
+            # Copies waiting on this document's pages summarize themselves
+            for page_num, future in claimed.items():
+                self.shared_pages.release(records[page_num - 1]["digest"], future, e)
+            raise
+        
+        # Copies wait only after this document's own first copies are
+        # resolved, so two documents never wait on each other
+        requests = len(calls)
+        for page_num, future in copies.items():
+            record = records[page_num - 1]
+            try:
+                record["summdesc"] = future.result()
+            except Exception:
+                text = page_texts[page_num - 1] if page_num <= len(page_texts) else ""
+                if self._summarized_from_text(page_paths[page_num - 1], text):
+                    record["route"] = "text"
+                    record["summdesc"] = self.summarize_page_text_with_ai(text, page_num)
+                else:
+                    record["route"] = "vision"
+                    record["summdesc"] = self.summarize_page_with_ai(page_paths[page_num - 1], page_num)
+                requests += 1
+            if on_page is not None:
+                on_page(page_num, dict(record))
+        
+        self.metrics.count("pages", len(page_paths))
+        self.metrics.count("model_requests", requests)
+        for record in records:
+            if record.get("route"):
+                self.metrics.count(f"pages_{record['route']}")
+        return records
+    
+    def _summarized_from_text(self, page_path: Optional[Path], text: str) -> bool:
+        """Whether a page goes to the text model rather than the vision model."""
+        # A page without an image (lazily indexed or read natively) can only
+        # be summarized from its text
+        return page_path is None or self.text_fast_path and self.has_usable_text(text)
+    
+    @staticmethod
+    def _invoke_summarizer(func, args: tuple):
+        """Call a summarizer with its arguments (lets the engine run mixed request types)."""
+        return func(*args)
+    
+    def _awaits_summarizer(self) -> bool:
+        """Whether engine requests await the backend's native acomplete()."""
+        return self.summarizer is not None and self.summarizer.native_async
+    
+    # ------------------------------------------------------------------------
+    # Blank page detection
+    # ------------------------------------------------------------------------
+    
+    @staticmethod
+    def ink_ratio(pixels, margin: float = 0.05, contrast: int = 60) -> float:
+        """
+        Fraction of a grayscale page that carries ink.
+        
+        The outer `margin` of the page is ignored so scanner edges and
+        punch holes do not count, and ink is measured against the page's own
+        background level (its median) so grey scans are handled like white
+        pages.
+        
+        Args:
+            pixels: 2-D NumPy array of 8-bit grayscale values
+            margin: Fraction of width/height cropped from each side
+            contrast: How much darker than the background a pixel must be
+        """
+        import numpy as np
+        
+        height, width = pixels.shape
+        dy, dx = int(height * margin), int(width * margin)
+        body = pixels[dy:height - dy or None, dx:width - dx or None]
+        if body.size == 0:
+            return 0.0
+        background = np.median(body)
+        return float(np.mean(body < background - contrast))
+    
+    def is_blank_page(self, image_path: Path, text: str = "") -> bool:
+        """
+        Flag blank and near-blank pages before they are summarized.
+        
+        A page is blank when almost none of it is inked, or when its text
+        layer only says that it was left blank. Detection errors never
+        flag a page, so a page is never skipped by accident.
+        """
+        normalised = " ".join(text.lower().split())
+        if normalised and len(normalised) < 80 and any(p in normalised for p in self.BLANK_PAGE_PHRASES):
+            return True
+        if image_path is None:
+            # Lazily indexed or natively read page, which has only its text
+            return not normalised
+        
+        try:
+            import numpy as np
+            
+            with Image.open(image_path) as image:
+                grayscale = image.convert("L")
+                # Statistics on a thumbnail are as good and much cheaper
+                grayscale.thumbnail((256, 256))
+                pixels = np.asarray(grayscale, dtype=np.uint8)
+            if pixels.ndim != 2:
+                return False
+            return self.ink_ratio(pixels) < self.blank_ink_threshold
+        except Exception as e:
+            print(f"    Blank detection failed for {image_path.name}: {e}")
+            return False
+    
+    # ------------------------------------------------------------------------
+    # Duplicate page detection
+    # ------------------------------------------------------------------------
+    
+    @staticmethod
+    def dhash_pixels(pixels) -> int:
+        """
+        Difference hash of a page already reduced to 8 rows x 9 columns.
+        
+        Each bit records whether a pixel is brighter than its right-hand
+        neighbour, which survives rescaling, recompression and small shifts.
+        """
+        import numpy as np
+        
+        bits = (np.asarray(pixels)[:, 1:] > np.asarray(pixels)[:, :-1]).flatten()
+        value = 0
+        for bit in bits:
+            value = (value << 1) | int(bit)
+        return value
+    
+    def page_hash(self, image_path: Path) -> Optional[int]:
+        """64-bit dHash of a page image, or None if it cannot be computed."""
+        if image_path is None:
+            return None
+        try:
+            import numpy as np
+            
+            with Image.open(image_path) as image:
+                small = image.convert("L").resize((9, 8), Image.LANCZOS)
+                pixels = np.asarray(small, dtype=np.int16)
+            if pixels.shape != (8, 9):
+                return None
+            return self.dhash_pixels(pixels)
+        except Exception as e:
+            print(f"    Perceptual hash failed for {image_path.name}: {e}")
+            return None
+    
+    def page_digest(self, image_path: Path, text: str = "") -> Optional[str]:
+        """
+        Exact fingerprint confirming that two near-identical pages are copies.
+        
+        A 64-bit dHash cannot tell apart two pages of dense text that differ
+        by a few words, so summaries are only shared between pages whose text
+        layers match or, without usable text, whose images are the same bytes.
+        """
+        if self.has_usable_text(text):
+            return hashlib.sha256(" ".join(text.split()).encode('utf-8')).hexdigest()
+        if image_path is None:
+            return None
+        try:
+            return self.file_content_hash(image_path)
+        except OSError as e:
+            print(f"    Page digest failed for {image_path.name}: {e}")
+            return None
+    
+    def assign_page_clusters(self, documents: List[Dict[str, Any]]) -> None:
+        """
+        Group near-identical pages across the data room.
+        
+        Runs over the final index in document order, so the first occurrence
+        of a page is always the canonical one regardless of processing order.
+        Every hashed page gets a "cluster_id"; later copies are marked
+        "duplicate" so tools can skip them. Summaries are already shared while
+        pages are summarized; when documents were summarized concurrently and
+        a later copy made the model request, the first copy in document order
+        takes over its route, so sequential and pipelined builds agree.
+        """
+        clusters = PerceptualHashIndex(self.dedup_max_distance)
+        confirmed: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for document in documents:
+            for page in document["pages"]:
+                if not page.get("phash"):
+                    continue
+                page_hash = int(page["phash"], 16)
+                cluster_id = clusters.find(page_hash)
+                page["duplicate"] = cluster_id is not None
+                if cluster_id is None:
+                    cluster_id = f"pc_{page['phash']}"
+                    clusters.add(page_hash, cluster_id)
+                page["cluster_id"] = cluster_id
+                if page.get("digest"):
+                    confirmed.setdefault((cluster_id, page["digest"]), []).append(page)
+        
+        for first, *copies in confirmed.values():
+            if first.get("route") != "duplicate":
+                continue
+            source = next((
+                page for page in copies
+                if page.get("route") != "duplicate" and page.get("summdesc") == first.get("summdesc")
+            ), None)
+            if source is not None:
+                first["route"], source["route"] = source["route"], "duplicate"
+    
+    # ------------------------------------------------------------------------
+    # Text-layer fast path
+    # ------------------------------------------------------------------------
+    
+    def extract_page_texts(self, pdf_path: Path) -> List[str]:
+        """
+        Extract the text layer of every page with poppler's pdftotext.
+        
+        Returns:
+            Text per page, in page order; empty if the PDF has no text layer
+            or pdftotext is unavailable
+            
+        Raises:
+            TimeoutError: pdftotext hung on the PDF and was killed, which
+                counts towards quarantining the document
+        """
+        timeout = self.subprocess_timeout_for(pdf_path)
+        try:
+            result = run_watched(
+                ['pdftotext', '-layout', '-enc', 'UTF-8', str(pdf_path), '-'],
+                timeout=timeout, check=True, capture_output=True
+            )
+        except subprocess.TimeoutExpired:
+            raise TimeoutError(f"pdftotext did not read {pdf_path.name} within {timeout:.0f}s")
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"  Could not read text layer of {pdf_path.name}: {e}")
+            return []
+        
+        # pdftotext ends every page with a form feed
+        pages = result.stdout.decode('utf-8', errors='replace').split('\f')
+        if pages and not pages[-1].strip():
+            pages = pages[:-1]
+        return pages
+    
+    def has_usable_text(self, text: str) -> bool:
+        """
+        Decide whether a page's text layer is good enough to summarize from.
+        
+        Scanned pages have no text and image-heavy pages very little; broken
+        font encodings produce mostly non-alphanumeric garbage.
+        """
+        content = "".join(text.split())
+        if len(content) < self.min_text_chars:
+            return False
+        alphanumeric = sum(1 for char in content if char.isalnum())
+        return alphanumeric / len(content) >= 0.6
+    
+    def summarize_page_text_with_ai(self, text: str, page_num: int) -> str:
+        """
+        Use AI to summarize a page from its extracted text.
+        
+        Args:
+            text: Text layer of the page
+            page_num: Page number
+            
+        Returns:
+            Summary text describing the page content
+        """
+        return _run_inline(self._summarize_page_text(text, page_num))
+    
+    async def _summarize_page_text(self, text: str, page_num: int, awaited: bool = False) -> str:
+        cache_key = None
+        if self.summary_cache is not None:
+            cache_key = SummaryCache.make_key(
+                hashlib.sha256(text.encode('utf-8')).hexdigest(),
+                self.summarization_model,
+                self.PAGE_TEXT_PROMPT_VERSION
+            )
+            cached = self.summary_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        prompt = f"""Analyze the text of this document page (page {page_num}) and provide a concise summary.
+
+Focus on:
+- Main topics or sections covered
+- Key information (dates, parties, amounts, obligations)
+- Document type indicators (contract clauses, financial data, etc.)
+- Any critical legal terms or conditions
+
+Page text:
+{text}
+
+Provide a 1-2 sentence summary that captures the essential content of this page."""
+        
+        if self.summarizer is not None:
+            summary = await self._complete(awaited, prompt, max_tokens=200)
+        else:
+            # Placeholder when no summarizer backend is configured
+            summary = f"[Summary of page {page_num} text - to be generated by AI model]"
+        
+        if cache_key is not None:
+            self.summary_cache.put(cache_key, summary)
+        return summary
+    
+    @staticmethod
+    def estimate_image_tokens(width: int, height: int) -> int:
+        """
+        Estimate the prompt tokens of a high-detail image.
+        
+        Follows the tiling rule of vision models: the image is scaled to fit
+        2048x2048, then its short side to 768px, and costs 170 tokens per
+        512px tile plus a base of 85.
+        """
+        import math
+        
+        scale = min(1.0, 2048 / max(width, height))
+        width, height = width * scale, height * scale
+        scale = min(1.0, 768 / min(width, height))
+        width, height = width * scale, height * scale
+        tiles = math.ceil(width / 512) * math.ceil(height / 512)
+        return 85 + 170 * tiles
+    
+    def _image_tokens(self, image_path: Path) -> int:
+        with Image.open(image_path) as image:
+            width, height = image.size
+        return self.estimate_image_tokens(width, height)
+    
+    def plan_page_batches(
+        self,
+        page_paths: List[Path],
+        page_nums: Optional[List[int]] = None
+    ) -> List[List[int]]:
+        """
+        Group consecutive pages into multi-page requests.
+        
+        A batch grows until it holds pages_per_request pages or the next page
+        would push the estimated prompt past the token budget (the smaller of
+        batch_token_budget and a quarter of the model's context) or the
+        combined summaries past the output limit.
+        
+        Args:
+            page_paths: Page images to batch
+            page_nums: Page number of each image (defaults to 1..n)
+        
+        Returns:
+            Lists of 1-based page numbers, one list per request
+        """
+        context = self.MODEL_CONTEXT_TOKENS.get(self.summarization_model, self.DEFAULT_CONTEXT_TOKENS)
+        budget = min(self.batch_token_budget, context // 4) - self.BATCH_PROMPT_TOKENS
+        max_pages = min(self.pages_per_request, self.MAX_OUTPUT_TOKENS // self.SUMMARY_OUTPUT_TOKENS)
+        
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        used = 0
+        page_nums = page_nums or list(range(1, len(page_paths) + 1))
+        for page_num, page_path in zip(page_nums, page_paths):
+            tokens = self._image_tokens(page_path)
+            if batch and (len(batch) >= max_pages or used + tokens > budget):
+                batches.append(batch)
+                batch, used = [], 0
+            batch.append(page_num)
+            used += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+    
+    @staticmethod
+    def parse_batch_response(response_text: str, page_nums: List[int]) -> Dict[int, str]:
+        """
+        Parse a multi-page summarization response.
+        
+        Accepts {"pages": [{"page": n, "summary": "..."}]} or a bare list of
+        such objects, optionally wrapped in a Markdown code fence. Pages the
+        model left out are simply missing from the result.
+        """
+        text = response_text.strip()
+        if text.startswith("```"):
+            text = text.split("\n", 1)[1] if "\n" in text else ""
+            text = text.rsplit("```", 1)[0]
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return {}
+        
+        entries = data.get("pages", []) if isinstance(data, dict) else data
+        if not isinstance(entries, list):
+            return {}
+        
+        summaries: Dict[int, str] = {}
+        for position, entry in enumerate(entries):
+            if isinstance(entry, dict) and isinstance(entry.get("summary"), str):
+                page_num = entry.get("page")
+                if page_num not in page_nums and len(entries) == len(page_nums):
+                    page_num = page_nums[position]
+                if page_num in page_nums:
+                    summaries[page_num] = entry["summary"].strip()
+        return summaries
+    
+    def summarize_pages_batch_with_ai(self, image_paths: List[Path], page_nums: List[int]) -> List[str]:
+        """
+        Summarize several pages with one multimodal request.
+        
+        The instructions are sent once for the whole batch and the model
+        answers with JSON holding one summary per page. Pages that are cached
+        are not sent; pages the model leaves out of its answer fall back to
+        summarize_page_with_ai.
+        
+        Args:
+            image_paths: Paths to the page images
+            page_nums: Page number of each image
+            
+        Returns:
+            One summary per page, in the given order
+        """
+        return _run_inline(self._summarize_pages_batch(image_paths, page_nums))
+    
+    async def _summarize_pages_batch(
+        self, image_paths: List[Path], page_nums: List[int], awaited: bool = False
+    ) -> List[str]:
+        summaries: Dict[int, str] = {}
+        cache_keys: Dict[int, str] = {}
+        if self.summary_cache is not None:
+            for image_path, page_num in zip(image_paths, page_nums):
+                cache_keys[page_num] = SummaryCache.make_key(
+                    self.file_content_hash(image_path), self.summarization_model, self.PAGE_BATCH_PROMPT_VERSION
+                )
+                cached = self.summary_cache.get(cache_keys[page_num])
+                if cached is not None:
+                    summaries[page_num] = cached
+        
+        to_send = [(path, num) for path, num in zip(image_paths, page_nums) if num not in summaries]
+        if to_send:
+            page_list = ", ".join(str(num) for _, num in to_send)
+            prompt = f"""You are given {len(to_send)} document pages, one image per page, in this order: pages {page_list}.
+
+For each page, focus on:
+- Main topics or sections covered
+- Key information (dates, parties, amounts, obligations)
+- Document type indicators (contract clauses, financial data, etc.)
+- Any critical legal terms or conditions
+
+Respond with JSON only, in the form:
+{{"pages": [{{"page": <page number>, "summary": "<1-2 sentence summary>"}}]}}
+Include exactly one entry per page."""
+            
+            if self.summarizer is not None:
+                response_text = await self._complete(
+                    awaited,
+                    prompt,
+                    images=[image_path for image_path, _ in to_send],
+                    max_tokens=self.SUMMARY_OUTPUT_TOKENS * len(to_send),
+                    json_output=True
+                )
+            else:
+                # Placeholder when no summarizer backend is configured
+                response_text = json.dumps({"pages": [
+                    {"page": num, "summary": f"[Summary of page {num} - to be generated by AI model]"}
+                    for _, num in to_send
+                ]})
+            
+            parsed = self.parse_batch_response(response_text, [num for _, num in to_send])
+            for image_path, page_num in to_send:
+                if page_num in parsed:
+                    summaries[page_num] = parsed[page_num]
+                    if page_num in cache_keys:
+                        self.summary_cache.put(cache_keys[page_num], parsed[page_num])
+                else:
+                    summaries[page_num] = await self._summarize_page(image_path, page_num, awaited)
+        
+        return [summaries[page_num] for page_num in page_nums]
+    
+    def summarize_document_with_ai(
+        self,
+        page_summaries: List[str],
+        page_ranges: Optional[List[Tuple[int, int]]] = None
+    ) -> str:
+        """
+        Use AI to create a document-level summary from page summaries.
+        
+        Args:
+            page_summaries: List of summaries for each page, or for each
+                section when page_ranges is given
+            page_ranges: First and last page covered by each summary (for
+                the final reduce step of hierarchical summarization)
+            
+        Returns:
+            Overall document summary
+        """
+        if page_ranges is None:
+            combined_summaries = "\n\n".join([
+                f"Page {i+1}: {summary}"
+                for i, summary in enumerate(page_summaries)
+            ])
+        else:
+            combined_summaries = "\n\n".join([
+                f"Pages {start}-{end}: {summary}"
+                for (start, end), summary in zip(page_ranges, page_summaries)
+            ])
+        
+        cache_key = None
+        if self.summary_cache is not None:
+            cache_key = SummaryCache.make_key(
+                hashlib.sha256(combined_summaries.encode('utf-8')).hexdigest(),
+                self.summarization_model,
+                self.DOCUMENT_PROMPT_VERSION
+            )
+            cached = self.summary_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        prompt = f"""Based on these {"page-by-page" if page_ranges is None else "section"} summaries, provide a comprehensive 2-3 sentence summary of the entire document.
+
+Focus on:
+- Document type and purpose
+- Main parties involved (if applicable)
+- Key terms, obligations, or information
+- Overall significance
+
+{"Page" if page_ranges is None else "Section"} summaries:
+{combined_summaries}
+
+Provide a clear, concise summary of the entire document."""
         
-        return response.choices[0].message.content
-        """
+        if self.summarizer is not None:
+            summary = self.summarizer.complete(prompt, max_tokens=250)
+        else:
+            # Placeholder when no summarizer backend is configured
+            summary = "[Document summary to be generated by AI model]"
         
-        # Placeholder for demonstration
-        return f"[Summary of page {page_num} - to be generated by AI model]"
+        if cache_key is not None:
+            self.summary_cache.put(cache_key, summary)
+        return summary
     
-    def summarize_document_with_ai(self, page_summaries: List[str]) -> str:
+    def summarize_section_with_ai(self, summaries: List[str], page_ranges: List[Tuple[int, int]]) -> str:
         """
-        Use AI to create a document-level summary from page summaries.
+        Use AI to condense a run of page or section summaries into a section digest.
         
         Args:
-            page_summaries: List of summaries for each page
+            summaries: Summaries of consecutive pages or lower-level sections
+            page_ranges: First and last page covered by each summary
             
         Returns:
-            Overall document summary
+            Digest of the section
         """
+        return _run_inline(self._summarize_section(summaries, page_ranges))
+    
+    async def _summarize_section(
+        self, summaries: List[str], page_ranges: List[Tuple[int, int]], awaited: bool = False
+    ) -> str:
         combined_summaries = "\n\n".join([
-            f"Page {i+1}: {summary}"
-            for i, summary in enumerate(page_summaries)
+            f"Page {start}: {summary}" if start == end else f"Pages {start}-{end}: {summary}"
+            for (start, end), summary in zip(page_ranges, summaries)
         ])
+        first_page, last_page = page_ranges[0][0], page_ranges[-1][1]
         
-        prompt = f"""Based on these page-by-page summaries, provide a comprehensive 2-3 sentence summary of the entire document.
+        cache_key = None
+        if self.summary_cache is not None:
+            cache_key = SummaryCache.make_key(
+                hashlib.sha256(combined_summaries.encode('utf-8')).hexdigest(),
+                self.summarization_model,
+                self.SECTION_PROMPT_VERSION
+            )
+            cached = self.summary_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        prompt = f"""Below are summaries of pages {first_page}-{last_page} of a longer document. Write a 2-4 sentence digest of this section.
 
 Focus on:
-- Document type and purpose
-- Main parties involved (if applicable)
-- Key terms, obligations, or information
-- Overall significance
+- What the section covers (articles, schedules, exhibits)
+- Parties, dates, amounts and obligations it establishes
+- Any critical legal terms, conditions or exceptions
 
-Page summaries:
+Summaries:
 {combined_summaries}
 
-Provide a clear, concise summary of the entire document."""
+Provide a clear, concise digest of this section."""
+        
+        if self.summarizer is not None:
+            summary = await self._complete(awaited, prompt, max_tokens=300)
+        else:
+            # Placeholder when no summarizer backend is configured
+            summary = f"[Summary of pages {first_page}-{last_page} - to be generated by AI model]"
         
-        # Example using OpenAI API (uncomment and configure in production)
+        if cache_key is not None:
+            self.summary_cache.put(cache_key, summary)
+        return summary
+    
+    def summarize_document_hierarchically(self, page_summaries: List[str]) -> Tuple[str, List[Dict[str, Any]]]:
         """
-        import openai
+        Map-reduce summarization for documents too long for a single prompt.
         
-        response = openai.chat.completions.create(
-            model=self.summarization_model,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=250
-        )
+        Page summaries are grouped into sections of `section_fan_in` pages and
+        each section is digested in parallel (one after another inside a
+        pipelined summarization worker, so summary_workers stays the limit
+        on concurrent requests). Digests are grouped and reduced
+        the same way, level by level, until at most `section_fan_in` remain
+        or `max_summary_depth` levels exist; those are reduced into the
+        document summary. Short documents are summarized in one step.
         
-        return response.choices[0].message.content
+        Args:
+            page_summaries: Summary of each page, in page order
+            
+        Returns:
+            Tuple of (document summary, section records of every level)
+        """
+        if len(page_summaries) <= self.section_fan_in:
+            return self.summarize_document_with_ai(page_summaries), []
+        
+        sections: List[Dict[str, Any]] = []
+        summaries = list(page_summaries)
+        ranges = [(page_num, page_num) for page_num in range(1, len(page_summaries) + 1)]
+        level = 0
+        while len(summaries) > self.section_fan_in and level < self.max_summary_depth:
+            level += 1
+            groups = [
+                (summaries[i:i + self.section_fan_in], ranges[i:i + self.section_fan_in])
+                for i in range(0, len(summaries), self.section_fan_in)
+            ]
+            print(f"    Summarizing {len(groups)} level-{level} sections...")
+            if self.summarization_engine is not None and self._awaits_summarizer():
+                async def digest(summaries, ranges):
+                    return await self._summarize_section(summaries, ranges, awaited=True)
+                digests = self.summarization_engine.map(digest, groups)
+            elif self.summarization_engine is not None:
+                digests = self.summarization_engine.map(self.summarize_section_with_ai, groups)
+            elif getattr(_summary_worker, "active", False):
+                digests = [self.summarize_section_with_ai(*group) for group in groups]
+            else:
+                with ThreadPoolExecutor(max_workers=self.summary_workers) as executor:
+                    digests = list(executor.map(lambda group: self.summarize_section_with_ai(*group), groups))
+            
+            summaries = digests
+            ranges = [(group_ranges[0][0], group_ranges[-1][1]) for _, group_ranges in groups]
+            for number, (digest, (start, end)) in enumerate(zip(digests, ranges), start=1):
+                sections.append({
+                    "section_id": f"L{level}_S{number:03d}",
+                    "level": level,
+                    "page_start": start,
+                    "page_end": end,
+                    "summdesc": digest
+                })
+        
+        return self.summarize_document_with_ai(summaries, ranges), sections
+    
+    # ------------------------------------------------------------------------
+    # Native text extraction
+    # ------------------------------------------------------------------------
+    
+    def reads_natively(self, file_path: Path) -> bool:
+        """Whether a file is read directly instead of being converted to PDF."""
+        suffix = file_path.suffix.lower()
+        if not self.native_extraction or suffix not in self.NATIVE_EXTENSIONS:
+            return False
+        module = self.NATIVE_EXTENSIONS[suffix]
+        if module is None:
+            return True
+        import importlib.util
+        return importlib.util.find_spec(module) is not None
+    
+    def read_native_pages(self, file_path: Path) -> Optional[List[str]]:
+        """
+        Read the text of a .txt, .docx or .xlsx file, split into pages.
+        
+        Returns:
+            Text per page, or None when the file cannot be read natively
+            (it is then converted with LibreOffice instead)
+        """
+        readers = {'.txt': self._text_file_blocks, '.docx': self._docx_blocks, '.xlsx': self._xlsx_blocks}
+        try:
+            with self.metrics.stage("read_native", file=file_path.name):
+                return self.paginate_text(readers[file_path.suffix.lower()](file_path))
+        except Exception as e:
+            print(f"  Could not read {file_path.name} directly ({e}); converting it instead")
+            return None
+    
+    def paginate_text(self, blocks) -> List[str]:
+        """
+        Group the text blocks of a document into pages.
+        
+        A page takes blocks until the next one would exceed native_page_chars
+        characters; _PAGE_BREAK markers always start a new page. Blocks longer
+        than a page are split at line ends, and lines at the page size.
+        
+        Args:
+            blocks: Text blocks (paragraphs, table rows, lines) and
+                _PAGE_BREAK markers, in document order
+            
+        Returns:
+            Text per page (a single empty page for an empty document)
         """
+        pages: List[str] = []
+        current: List[str] = []
+        size = 0
+        for block in blocks:
+            if block is _PAGE_BREAK:
+                if current:
+                    pages.append("\n".join(current))
+                    current, size = [], 0
+                continue
+            for line in block.splitlines() if len(block) > self.native_page_chars else [block]:
+                for start in range(0, max(len(line), 1), self.native_page_chars):
+                    piece = line[start:start + self.native_page_chars]
+                    if current and size + len(piece) > self.native_page_chars:
+                        pages.append("\n".join(current))
+                        current, size = [], 0
+                    current.append(piece)
+                    size += len(piece) + 1
+        if current or not pages:
+            pages.append("\n".join(current))
+        return pages
+    
+    @staticmethod
+    def _text_file_blocks(file_path: Path):
+        """Lines of a text file; form feeds are page breaks."""
+        data = file_path.read_bytes()
+        try:
+            text = data.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            text = data.decode('cp1252', errors='replace')
+        for number, page in enumerate(text.split('\f')):
+            if number:
+                yield _PAGE_BREAK
+            yield from page.splitlines()
+    
+    @staticmethod
+    def _docx_blocks(file_path: Path):
+        """Paragraphs and table rows of a Word document, in document order."""
+        import docx
         
-        # Placeholder for demonstration
-        return "[Document summary to be generated by AI model]"
+        document = docx.Document(str(file_path))
+        for block in document.iter_inner_content():
+            if hasattr(block, "rows"):
+                for row in block.rows:
+                    # Merged cells repeat their text in every grid cell they span
+                    cells = [cell.text.strip() for cell in row.cells]
+                    cells = [text for i, text in enumerate(cells) if i == 0 or text != cells[i - 1]]
+                    while cells and not cells[-1]:
+                        cells.pop()
+                    if cells:
+                        yield " | ".join(cells)
+                continue
+            if block.paragraph_format.page_break_before:
+                yield _PAGE_BREAK
+            if block.text.strip():
+                yield block.text
+            # Hard page breaks, and the page breaks Word saved with its layout
+            if block._p.xpath('./w:r/w:br[@w:type="page"] | ./w:r/w:lastRenderedPageBreak'):
+                yield _PAGE_BREAK
     
-    def process_document(self, file_path: Path, doc_id: str) -> Dict[str, Any]:
+    @staticmethod
+    def _xlsx_blocks(file_path: Path):
+        """Rows of every worksheet, streamed; each worksheet starts a new page."""
+        import openpyxl
+        
+        workbook = openpyxl.load_workbook(str(file_path), read_only=True, data_only=True)
+        try:
+            for number, sheet in enumerate(workbook.worksheets):
+                if number:
+                    yield _PAGE_BREAK
+                yield f"Sheet: {sheet.title}"
+                for row in sheet.iter_rows(values_only=True):
+                    values = ["" if value is None else str(value) for value in row]
+                    while values and not values[-1]:
+                        values.pop()
+                    if any(values):
+                        yield " | ".join(values)
+        finally:
+            workbook.close()
+    
+    def process_document(self, file_path: Path, doc_id: str, pdf_path: Optional[Path] = None) -> Dict[str, Any]:
         """
         Process a single document through the full pipeline.
         
+        Files read natively (see reads_natively) skip conversion and page
+        extraction and are summarized from their text.
+        
         Args:
             file_path: Path to the document file
             doc_id: Unique identifier for this document
+            pdf_path: Already converted PDF (e.g. from convert_many_to_pdf);
+                skips the conversion step when given
             
         Returns:
             Dictionary containing the full document structure with summaries
         """
         print(f"\nProcessing {file_path.name}...")
         
+        if pdf_path is None and self.reads_natively(file_path):
+            page_texts = self.read_native_pages(file_path)
+            if page_texts is not None:
+                print(f"  Read {len(page_texts)} pages without conversion")
+                return self.summarize_native_document(file_path, doc_id, page_texts)
+        
         # Step 1: Convert to PDF
-        print("  Converting to PDF...")
-        pdf_path = self.convert_to_pdf(file_path)
+        if pdf_path is None:
+            print("  Converting to PDF...")
+            pdf_path = self.convert_to_pdf(file_path)
+            self._journal("pdf", file_path, pdf_path=str(pdf_path))
+        
+        # Step 2: Extract pages as images (lazy mode only counts them)
+        if self.lazy_pages:
+            page_paths = self.lazy_page_slots(pdf_path)
+            print(f"  {len(page_paths)} pages, rendered on demand")
+        else:
+            page_paths = self._resumed_page_paths(file_path, doc_id)
+            if page_paths is not None:
+                print(f"  Reusing {len(page_paths)} pages rendered by the interrupted run")
+            else:
+                print("  Extracting pages...")
+                page_paths = self.extract_pages_as_images(pdf_path, doc_id)
+                print(f"  Extracted {len(page_paths)} pages")
+                self._journal("pages", file_path, page_paths=[str(path) for path in page_paths])
+        
+        # Steps 3-5: Summarize and build the document structure
+        return self.summarize_document_pages(file_path, doc_id, pdf_path, page_paths)
+    
+    def lazy_page_slots(self, pdf_path: Path) -> List[None]:
+        """Stand-ins for the page images of a lazily indexed PDF (one None per page)."""
+        return [None] * self.get_pdf_page_count(pdf_path)
+    
+    def _render_pages_for_summary(
+        self,
+        pdf_path: Path,
+        doc_id: str,
+        page_paths: List[Optional[Path]],
+        page_texts: List[str],
+        done_pages: Optional[Dict[int, Dict[str, Any]]] = None
+    ) -> List[Optional[Path]]:
+        """
+        Render, through the render cache, the pages of a lazily indexed PDF
+        that are summarized from their image.
         
-        # Step 2: Extract pages as images
-        print("  Extracting pages...")
-        page_paths = self.extract_pages_as_images(pdf_path, doc_id)
-        print(f"  Extracted {len(page_paths)} pages")
+        Pages whose text layer is usable (with text_fast_path) and pages
+        already summarized by an interrupted run keep no image.
+        """
+        done_pages = done_pages or {}
+        needed = [
+            page_num for page_num in range(1, len(page_paths) + 1)
+            if page_num not in done_pages and not (
+                self.text_fast_path and page_num <= len(page_texts)
+                and self.has_usable_text(page_texts[page_num - 1])
+            )
+        ]
+        if not needed:
+            return page_paths
+        
+        rendered = list(page_paths)
+        with self.metrics.stage("rasterize", doc_id=doc_id, pages=len(needed)):
+            for page_num in needed:
+                rendered[page_num - 1] = self.render_cache.render(pdf_path, page_num, self.dpi)
+        self.metrics.count("pages_rendered", len(needed))
+        return rendered
+    
+    def summarize_document_pages(
+        self,
+        file_path: Path,
+        doc_id: str,
+        pdf_path: Path,
+        page_paths: List[Path]
+    ) -> Dict[str, Any]:
+        """
+        Summarize the extracted pages of a document and build its index entry.
+        
+        This is the final stage of process_document, split out so the pipelined
+        mode can run it on its own worker pool.
         
-        # Step 3: Summarize each page
+        Args:
+            file_path: Path to the original document file
+            doc_id: Unique identifier for this document
+            pdf_path: Path to the converted PDF
+            page_paths: Paths to the extracted page images, in page order
+            
+        Returns:
+            Dictionary containing the full document structure with summaries
+        """
+        # Step 3: Summarize each page, from its text layer where usable
         print("  Summarizing pages...")
-        pages_data = []
-        for i, page_path in enumerate(page_paths, start=1):
-            print(f"    Summarizing page {i}/{len(page_paths)}...")
-            page_summary = self.summarize_page_with_ai(page_path, i)
+        page_texts = self.extract_page_texts(pdf_path) if self.text_fast_path else []
+        done_pages = (self._resume_progress.get(file_path) or {}).get("pages")
+        if self.lazy_pages:
+            page_paths = self._render_pages_for_summary(pdf_path, doc_id, page_paths, page_texts, done_pages)
+        on_page = None
+        if self.journal is not None:
+            on_page = lambda page_num, record: self._journal("page", file_path, page_num=page_num, record=record)
+        page_records = self.summarize_pages(page_paths, page_texts, done_pages, on_page)
+        return self._build_document(file_path, doc_id, pdf_path, page_paths, page_records)
+    
+    def summarize_native_document(self, file_path: Path, doc_id: str, page_texts: List[str]) -> Dict[str, Any]:
+        """
+        Summarize a natively read document from the text of its pages.
+        
+        The index entry has no PDF and its pages no image; a page renderer
+        converts the file when one of its pages is requested.
+        
+        Args:
+            file_path: Path to the original document file
+            doc_id: Unique identifier for this document
+            page_texts: Text of each page (see read_native_pages)
             
+        Returns:
+            Dictionary containing the full document structure with summaries
+        """
+        print("  Summarizing pages...")
+        done_pages = (self._resume_progress.get(file_path) or {}).get("pages")
+        on_page = None
+        if self.journal is not None:
+            on_page = lambda page_num, record: self._journal("page", file_path, page_num=page_num, record=record)
+        page_paths = [None] * len(page_texts)
+        page_records = self.summarize_pages(page_paths, page_texts, done_pages, on_page)
+        return self._build_document(file_path, doc_id, None, page_paths, page_records)
+    
+    def _build_document(
+        self,
+        file_path: Path,
+        doc_id: str,
+        pdf_path: Optional[Path],
+        page_paths: List[Optional[Path]],
+        page_records: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Summarize a document from its page records and build its index entry."""
+        pages_data = []
+        for i, (page_path, record) in enumerate(zip(page_paths, page_records), start=1):
             pages_data.append({
                 "page_num": i,
-                "summdesc": page_summary,
-                "page_image": str(page_path)  # or base64 encoding if needed
+                "summdesc": record["summdesc"],
+                # Lazily indexed and natively read pages are rendered on demand
+                "page_image": None if self.lazy_pages or page_path is None else str(page_path),
+                "route": record["route"],
+                "blank": record["blank"]
             })
+            for key in ("phash", "digest"):
+                if key in record:
+                    pages_data[-1][key] = record[key]
+        page_summaries = [page["summdesc"] for page in pages_data]
         
-        # Step 4: Create document-level summary
+        # Step 4: Create document-level summary (via sections for long documents)
         print("  Creating document summary...")
-        page_summaries = [p["summdesc"] for p in pages_data]
-        doc_summary = self.summarize_document_with_ai(page_summaries)
+        with self.metrics.stage("summarize_doc", doc_id=doc_id, pages=len(page_summaries)):
+            doc_summary, sections = self.summarize_document_hierarchically(page_summaries)
         
         # Step 5: Build document structure
         document = {
             "doc_id": doc_id,
             "original_file": str(file_path),
-            "pdf_file": str(pdf_path),
+            "pdf_file": str(pdf_path) if pdf_path is not None else None,
             "summdesc": doc_summary,
             "pages": pages_data
         }
+        if sections:
+            document["sections"] = sections
         
         print(f"  ✓ Completed {file_path.name}")
         return document
     
-    def build_data_room_index(self) -> Dict[str, Any]:
+    def discover_documents(self) -> List[Path]:
+        """
+        Find all supported documents in the input folder and its subfolders.
+        
+        Folders are listed concurrently on `discovery_workers` threads, which
+        keeps deep trees on network shares fast. Files and folders matching an
+        exclude pattern are skipped (an excluded folder is not entered), and
+        when include patterns are given a file must match one of them.
+        Patterns are globs matched against the path relative to the input
+        folder (e.g. "Finance/*.xlsx") or against the bare name ("*.pdf").
+        Symlinked folders and the output folder are never entered.
+        
+        Returns:
+            Documents sorted by their path relative to the input folder
+        """
+        found: List[Tuple[str, Path]] = []
+        output_folder = self.output_folder.resolve()
+        
+        def list_folder(folder: Path) -> List[Path]:
+            subfolders = []
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    path = Path(entry.path)
+                    relative = path.relative_to(self.input_folder).as_posix()
+                    if self._matches_any(relative, entry.name, self.exclude_patterns):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and path.resolve() != output_folder:
+                            subfolders.append(path)
+                    elif entry.is_file() and self._is_wanted_file(entry, relative):
+                        found.append((relative, path))
+            return subfolders
+        
+        from concurrent.futures import FIRST_COMPLETED, wait
+        
+        with ThreadPoolExecutor(max_workers=self.discovery_workers) as executor:
+            pending = {executor.submit(list_folder, self.input_folder)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        subfolders = future.result()
+                    except OSError as e:
+                        print(f"  ✗ Could not list folder: {e}")
+                        continue
+                    pending.update(executor.submit(list_folder, folder) for folder in subfolders)
+        
+        found.sort()
+        print(f"Discovered {len(found)} documents")
+        return [path for _, path in found]
+    
+    @staticmethod
+    def _matches_any(relative_path: str, name: str, patterns) -> bool:
+        return any(fnmatch.fnmatch(relative_path, pattern) or fnmatch.fnmatch(name, pattern) for pattern in patterns)
+    
+    def _is_wanted_file(self, entry: os.DirEntry, relative_path: str) -> bool:
+        """Apply the extension, include pattern and size rules to one file."""
+        if Path(entry.name).suffix.lower() not in self.SUPPORTED_EXTENSIONS:
+            return False
+        if self.include_patterns and not self._matches_any(relative_path, entry.name, self.include_patterns):
+            return False
+        try:
+            size = entry.stat().st_size
+        except OSError:
+            return False
+        if size < self.min_file_size or (self.max_file_size is not None and size > self.max_file_size):
+            print(f"  Skipping {relative_path}: {size} bytes is outside the size limits")
+            return False
+        return True
+    
+    def folder_of(self, file_path: Path) -> str:
+        """Folder of a source file relative to the input folder ("" at the top level)."""
+        folder = file_path.parent.relative_to(self.input_folder).as_posix()
+        return "" if folder == "." else folder
+    
+    def build_data_room_index(
+        self,
+        pipelined: bool = False,
+        batch_conversion: bool = False,
+        conversion_batch_size: int = 50,
+        incremental: bool = True,
+        resume: bool = False
+    ) -> Dict[str, Any]:
         """
         Process all documents in the input folder and build the complete data room index.
         
+        Args:
+            pipelined: Overlap conversion, page extraction and summarization using
+                a separate worker pool per stage. The resulting index is identical
+                to the sequential one apart from timestamps.
+            batch_conversion: Convert all documents up front with
+                convert_many_to_pdf instead of one LibreOffice process per file
+            conversion_batch_size: Maximum files per LibreOffice invocation
+                when batch_conversion is enabled
+            incremental: Reuse index entries of files whose content and indexing
+                settings are unchanged since the last run (tracked in
+                index_manifest.json) and only process new or modified files
+            resume: Continue a run that was interrupted, using the progress in
+                its journal (index_journal.jsonl): finished documents are kept
+                and conversions, rendered pages and page summaries are reused
+        
+        Progress is journaled as it happens, so a crash loses at most the step
+        in flight; the journal is removed once the index has been written.
+        Files that failed are listed in failure_report.json, and files that
+        keep timing out or crashing are skipped (see quarantine_after).
+        
         Returns:
             Complete data room index structure
         """
@@ -343,56 +4262,806 @@ Provide a clear, concise summary of the entire document."""
         print(f"Output folder: {self.output_folder}")
         print(f"Summarization model: {self.summarization_model}")
         
+        self.metrics = IndexingMetrics(self.metrics_events_path)
+        self.failures = []
+        self.shared_pages.clear()
+        held: List[Path] = []
+        
         # Find all documents in input folder
-        supported_extensions = [
-            '.pdf', '.docx', '.doc', '.xlsx', '.xls', 
-            '.pptx', '.ppt', '.txt', '.rtf', '.odt'
-        ]
+        with self.metrics.stage("discover"):
+            file_paths = self.discover_documents()
+        self.metrics.count("documents_discovered", len(file_paths))
+        
+        # Start the write-ahead journal, picking up an interrupted run if asked
+        self.journal = IndexJournal(self.journal_path)
+        progress = self.journal.open(self.index_settings(), resume)
+        
+        try:
+            # Work out which files changed since the last run
+            fingerprints = {file_path: None for file_path in file_paths}
+            reused: Dict[Path, Dict[str, Any]] = {}
+            fixed_ids: Dict[Path, str] = {}
+            previous_ids: Dict[Path, List[str]] = {}
+            if incremental:
+                fingerprints, reused, fixed_ids, previous_ids = self._plan_incremental_run(file_paths)
+                print(f"Unchanged documents reused: {len(reused)}")
+            elif resume or self.doc_id_scheme == "stable":
+                fingerprints = {file_path: self._fingerprint(file_path, None) for file_path in file_paths}
+            self._run_fingerprints = fingerprints
+            
+            if self.doc_id_scheme == "stable":
+                # Files the manifest does not know (an index written before
+                # manifests existed, or by a non-incremental build) are
+                # matched to the saved index by their path
+                unknown = [file_path for file_path in file_paths if file_path not in previous_ids]
+                if unknown:
+                    previous_ids.update(self._indexed_ids_by_path(unknown))
+                
+                # Every document's id is known up front; reused documents
+                # indexed under another id get a copy of their pages under
+                # the stable one, since the previous index still points at
+                # the old folder until the new index is written
+                fixed_ids = {
+                    file_path: self.stable_doc_id(self._manifest_key(file_path), fingerprints[file_path]["sha256"])
+                    for file_path in file_paths
+                }
+                for file_path, document in reused.items():
+                    if document["doc_id"] != fixed_ids[file_path]:
+                        self._relocate_document(document, fixed_ids[file_path], keep_source=True)
+            
+            pdf_paths: Dict[Path, Path] = {}
+            if progress:
+                resumed = self._plan_resume(file_paths, reused, progress)
+                reused.update(resumed)
+                for file_path, entry in self._resume_progress.items():
+                    if entry.get("pdf_path") and Path(entry["pdf_path"]).exists():
+                        pdf_paths[file_path] = Path(entry["pdf_path"])
+                    folder = Path((entry.get("page_paths") or [""])[0]).parent.name
+                    if folder.startswith("doc_"):
+                        fixed_ids.setdefault(file_path, folder)
+                print(f"Resuming interrupted run: {len(resumed)} documents finished, "
+                      f"{len(self._resume_progress)} partially processed")
+            pending = [file_path for file_path in file_paths if file_path not in reused]
+            
+            # Pages of documents kept from earlier runs serve their copies
+            if self.page_dedup:
+                for file_path in file_paths:
+                    for page in (reused[file_path].get("pages", []) if file_path in reused else []):
+                        if page.get("phash") and page.get("digest"):
+                            self.shared_pages.add(page["digest"], int(page["phash"], 16), page["summdesc"])
+            
+            # Files that keep hanging or crashing are not tried again
+            held = [
+                file_path for file_path in pending
+                if self.quarantine.is_quarantined(self._manifest_key(file_path), file_path)
+            ]
+            if held:
+                print(f"Quarantined documents skipped: {len(held)}")
+                self.metrics.count("documents_quarantined", len(held))
+                pending = [file_path for file_path in pending if file_path not in held]
+            
+            doc_ids = _DocIdSequence(
+                {document["doc_id"] for document in reused.values()} | set(fixed_ids.values())
+            )
+            
+            if batch_conversion:
+                print("Converting documents in batches...")
+                converted, failures = self.convert_many_to_pdf(
+                    [
+                        file_path for file_path in pending
+                        if file_path not in pdf_paths and not self.reads_natively(file_path)
+                    ],
+                    conversion_batch_size
+                )
+                for file_path, pdf_path in converted.items():
+                    self._journal("pdf", file_path, pdf_path=str(pdf_path))
+                for file_path, error in failures.items():
+                    print(f"  ✗ Failed to process {file_path.name}: {error}")
+                    self._record_failure(file_path, error, "convert")
+                pdf_paths.update(converted)
+                pending = [
+                    file_path for file_path in pending
+                    if file_path in pdf_paths or file_path not in failures
+                ]
+            
+            if pipelined:
+                processed = self._process_documents_pipelined(pending, pdf_paths, doc_ids, fixed_ids)
+            else:
+                processed = self._process_documents_sequential(pending, pdf_paths, doc_ids, fixed_ids)
+            for file_path in processed:
+                self.quarantine.record_success(self._manifest_key(file_path))
+            
+            # Keep discovery order; deleted and failed files are simply absent
+            indexed = [
+                (file_path, reused.get(file_path) or processed[file_path])
+                for file_path in file_paths
+                if file_path in reused or file_path in processed
+            ]
+            
+            for file_path, document in indexed:
+                document["folder"] = self.folder_of(file_path)
+            if self.doc_id_scheme == "stable":
+                self.assign_legacy_ids(indexed, previous_ids)
+            documents = [document for _, document in indexed]
+            if self.page_dedup:
+                self.assign_page_clusters(documents)
+            data_room_index = self._write_index(documents)
+            if incremental:
+                self._write_manifest(indexed, fingerprints)
+            self._remove_stale_page_folders(documents)
+        finally:
+            self.journal.close()
+            self.metrics.finish()
+            self.quarantine.save()
+            self._write_failure_report(held)
+            self._resume_progress = {}
+            self._run_fingerprints = {}
         
-        documents = []
-        doc_counter = 1
+        # The index is complete, so there is nothing left to resume
+        self.journal.close(remove=True)
+        self.journal = None
+        return data_room_index
+    
+    # ------------------------------------------------------------------------
+    # Document ids
+    # ------------------------------------------------------------------------
+    
+    @staticmethod
+    def stable_doc_id(relative_path: str, content_hash: str) -> str:
+        """
+        Deterministic doc_id of a source file.
+        
+        Derived from the file's path inside the data room and its content
+        hash, so it does not depend on which other files exist or fail.
+        """
+        digest = hashlib.sha256(f"{relative_path}\n{content_hash}".encode('utf-8')).hexdigest()
+        return f"doc_{digest[:12]}"
+    
+    def assign_legacy_ids(
+        self,
+        indexed: List[Tuple[Path, Dict[str, Any]]],
+        previous_ids: Optional[Dict[Path, List[str]]] = None
+    ) -> None:
+        """
+        Record the ids each document can still be referred to by.
+        
+        A document keeps every id its source file had in earlier runs (for
+        example doc_003 from before stable ids, or the id of an earlier
+        version of the file) in "legacy_ids". Documents without any history
+        get no alias: an id an older index gave to a file that has since
+        been removed must not start resolving to a different document.
+        
+        Args:
+            indexed: (source file, document) pairs in discovery order
+            previous_ids: Ids each file was indexed under before
+        """
+        previous_ids = previous_ids or {}
+        for file_path, document in indexed:
+            document["legacy_ids"] = [
+                legacy_id
+                for legacy_id in dict.fromkeys(previous_ids.get(file_path, []) + document.get("legacy_ids", []))
+                if legacy_id != document["doc_id"]
+            ]
+    
+    def _indexed_ids_by_path(self, file_paths: List[Path]) -> Dict[Path, List[str]]:
+        """
+        Ids the saved index gives each of the files, matched by original_file.
+        
+        Args:
+            file_paths: Discovered source files
+        
+        Returns:
+            The doc_id and legacy ids of each file found in the saved index
+        """
+        if detect_index_format(self.output_folder) is None:
+            return {}
+        try:
+            documents = self.load_index()["documents"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable previous index: {e}")
+            return {}
+        
+        known: Dict[str, List[str]] = {}
+        for document in documents:
+            key = self._original_file_key(document.get("original_file"))
+            if key is not None and "doc_id" in document:
+                known.setdefault(key, [document["doc_id"]] + list(document.get("legacy_ids", [])))
+        return {
+            file_path: known[self._manifest_key(file_path)]
+            for file_path in file_paths
+            if self._manifest_key(file_path) in known
+        }
+    
+    def _original_file_key(self, original_file: Optional[str]) -> Optional[str]:
+        """Path of an indexed document's source file inside the data room, if it lies there."""
+        if not original_file:
+            return None
+        for path, folder in ((Path(original_file), self.input_folder),
+                             (Path(original_file).resolve(), self.input_folder.resolve())):
+            try:
+                return path.relative_to(folder).as_posix()
+            except ValueError:
+                continue
+        return None
+    
+    def _remove_stale_page_folders(self, documents: List[Dict[str, Any]]) -> None:
+        """Delete page folders no document in the index refers to."""
+        kept = {document["doc_id"] for document in documents}
+        for folder in self.pages_folder.iterdir():
+            if folder.is_dir() and folder.name not in kept:
+                shutil.rmtree(folder, ignore_errors=True)
+    
+    # ------------------------------------------------------------------------
+    # Crash recovery
+    # ------------------------------------------------------------------------
+    
+    @property
+    def journal_path(self) -> Path:
+        return self.output_folder / "index_journal.jsonl"
+    
+    def _journal(self, event: str, file_path: Path, durable: bool = False, **fields) -> None:
+        """Record progress on a source file in the journal of the running build."""
+        if self.journal is None:
+            return
+        fingerprint = self._run_fingerprints.get(file_path) or {}
+        self.journal.record(
+            event, durable=durable, file=self._manifest_key(file_path),
+            sha256=fingerprint.get("sha256"), **fields
+        )
+    
+    def _plan_resume(
+        self,
+        file_paths: List[Path],
+        reused: Dict[Path, Dict[str, Any]],
+        progress: Dict[str, Dict[str, Any]]
+    ) -> Dict[Path, Dict[str, Any]]:
+        """
+        Match the interrupted run's journal against the discovered files.
+        
+        Progress only counts for files whose content is unchanged. Partial
+        progress is kept in self._resume_progress for the processing stages.
+        
+        Returns:
+            Document record per file the interrupted run finished
+        """
+        finished: Dict[Path, Dict[str, Any]] = {}
+        self._resume_progress = {}
+        for file_path in file_paths:
+            entry = progress.get(self._manifest_key(file_path))
+            fingerprint = self._run_fingerprints.get(file_path) or {}
+            if file_path in reused or not entry or entry["sha256"] is None:
+                continue
+            if entry["sha256"] != fingerprint.get("sha256"):
+                continue
+            if "document" in entry:
+                finished[file_path] = entry["document"]
+            else:
+                self._resume_progress[file_path] = entry
+        return finished
+    
+    def _resumed_page_paths(self, file_path: Path, folder_id: str) -> Optional[List[Path]]:
+        """Pages the interrupted run rendered for a file, if they are still in place."""
+        entry = self._resume_progress.get(file_path) or {}
+        page_paths = [Path(page_path) for page_path in entry.get("page_paths") or []]
+        folder = self.pages_folder / folder_id
+        if page_paths and all(path.parent == folder and path.exists() for path in page_paths):
+            return page_paths
+        return None
+    
+    # ------------------------------------------------------------------------
+    # Failure handling
+    # ------------------------------------------------------------------------
+    
+    @property
+    def failure_report_path(self) -> Path:
+        return self.output_folder / "failure_report.json"
+    
+    def _record_failure(self, file_path: Path, error: BaseException, stage: Optional[str] = None) -> None:
+        """Add a failed file to this run's failures and count it towards quarantine."""
+        kind = failure_kind(error)
+        key = self._manifest_key(file_path)
+        entry = self.quarantine.record_failure(key, file_path, kind, str(error))
+        self.metrics.count(f"failures_{kind}")
+        self.failures.append({
+            "file": key,
+            "stage": stage,
+            "kind": kind,
+            "error": str(error),
+            "failures": entry["failures"] if entry else None,
+            "quarantined": self.quarantine.is_quarantined(key, file_path)
+        })
+    
+    def _write_failure_report(self, held: List[Path]) -> None:
+        """
+        Save failure_report.json: the files that failed in this run and the
+        quarantined files it skipped.
+        """
+        skipped = []
+        for file_path in held:
+            key = self._manifest_key(file_path)
+            skipped.append({"file": key, **(self.quarantine.get(key) or {})})
+        report = {
+            "created_at": datetime.now().isoformat(),
+            "failed": self.failures,
+            "quarantined": skipped
+        }
+        _write_atomically(self.failure_report_path, json.dumps(report, indent=2, ensure_ascii=False).encode('utf-8'))
+        if self.failures or skipped:
+            timeouts = sum(1 for failure in self.failures if failure["kind"] == "timeout")
+            print(f"Failed documents: {len(self.failures)} ({timeouts} timed out), "
+                  f"quarantined and skipped: {len(skipped)} - see {self.failure_report_path}")
+    
+    # ------------------------------------------------------------------------
+    # Incremental re-indexing
+    # ------------------------------------------------------------------------
+    
+    @property
+    def manifest_path(self) -> Path:
+        return self.output_folder / "index_manifest.json"
+    
+    def index_settings(self) -> Dict[str, Any]:
+        """Settings that change the output of indexing; a change invalidates every entry."""
+        settings = {
+            "dpi": self.dpi,
+            "model": self.summarization_model,
+            "text_fast_path": self.text_fast_path,
+            "min_text_chars": self.min_text_chars,
+            "blank_detection": self.blank_detection,
+            "blank_ink_threshold": self.blank_ink_threshold,
+            "page_dedup": self.page_dedup,
+            "dedup_max_distance": self.dedup_max_distance,
+            "pages_per_request": self.pages_per_request,
+            "batch_token_budget": self.batch_token_budget,
+            "section_fan_in": self.section_fan_in,
+            "max_summary_depth": self.max_summary_depth
+        }
+        if self.image_format != "png" or self.trim_margins:
+            settings["images"] = {
+                "format": self.image_format, "quality": self.image_quality, "trim_margins": self.trim_margins
+            }
+        if self.lazy_pages:
+            settings["lazy_pages"] = True
+        if self.native_extraction:
+            settings["native_extraction"] = {"page_chars": self.native_page_chars}
+        return settings
+    
+    @staticmethod
+    def file_content_hash(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+        """SHA-256 of a file's contents, read in chunks."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _manifest_key(self, file_path: Path) -> str:
+        return file_path.relative_to(self.input_folder).as_posix()
+    
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Load the file entries of the previous run's manifest, if any."""
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("files", {})
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable manifest {self.manifest_path}: {e}")
+            return {}
+    
+    def _fingerprint(self, file_path: Path, previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Describe a source file by content hash, size and mtime.
+        
+        When size and mtime match the previous manifest entry the stored hash
+        is trusted, so unchanged files are not read again.
+        """
+        stat = file_path.stat()
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime:
+            content_hash = previous["sha256"]
+        else:
+            content_hash = self.file_content_hash(file_path)
+        return {"sha256": content_hash, "size": stat.st_size, "mtime": stat.st_mtime}
+    
+    def _plan_incremental_run(self, file_paths: List[Path]):
+        """
+        Compare discovered files against the previous manifest and index.
+        
+        Nothing is deleted here: the previous index stays valid until the new
+        one is written, and page folders it no longer needs are removed after
+        that (see _remove_stale_page_folders).
+        
+        Args:
+            file_paths: Discovered source files
         
-        for file_path in self.input_folder.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in supported_extensions:
-                doc_id = f"doc_{doc_counter:03d}"
+        Returns:
+            Tuple of (fingerprint per file, previous document entry per unchanged
+            file, previous doc_id per modified file, every id each file was
+            previously known under)
+        """
+        manifest = self._load_manifest()
+        previous_documents: Dict[str, Dict[str, Any]] = {}
+        if manifest and detect_index_format(self.output_folder) is not None:
+            previous_documents = {
+                document["doc_id"]: document for document in self.load_index()["documents"]
+            }
+        
+        settings = self.index_settings()
+        fingerprints: Dict[Path, Dict[str, Any]] = {}
+        reused: Dict[Path, Dict[str, Any]] = {}
+        fixed_ids: Dict[Path, str] = {}
+        previous_ids: Dict[Path, List[str]] = {}
+        for file_path in file_paths:
+            entry = manifest.get(self._manifest_key(file_path))
+            fingerprints[file_path] = self._fingerprint(file_path, entry)
+            if not entry or entry.get("doc_id") not in previous_documents:
+                continue
+            previous_ids[file_path] = [entry["doc_id"]] + list(
+                previous_documents[entry["doc_id"]].get("legacy_ids", [])
+            )
+            if entry["sha256"] == fingerprints[file_path]["sha256"] and entry.get("settings") == settings:
+                reused[file_path] = plain_document(previous_documents[entry["doc_id"]])
+            else:
+                # Modified file keeps its id so references to it stay valid
+                fixed_ids[file_path] = entry["doc_id"]
+        
+        return fingerprints, reused, fixed_ids, previous_ids
+    
+    def _write_manifest(
+        self,
+        indexed: List[Tuple[Path, Dict[str, Any]]],
+        fingerprints: Dict[Path, Dict[str, Any]]
+    ) -> None:
+        """Record the fingerprint and settings of every indexed source file."""
+        settings = self.index_settings()
+        files = {}
+        for file_path, document in indexed:
+            files[self._manifest_key(file_path)] = {
+                **fingerprints[file_path],
+                "settings": settings,
+                "doc_id": document["doc_id"]
+            }
+        
+        manifest = json.dumps({"version": 1, "files": files}, indent=2, ensure_ascii=False)
+        _write_atomically(self.manifest_path, manifest.encode('utf-8'))
+    
+    def _process_documents_sequential(
+        self,
+        file_paths: List[Path],
+        pdf_paths: Optional[Dict[Path, Path]] = None,
+        doc_ids: Optional[_DocIdSequence] = None,
+        fixed_ids: Optional[Dict[Path, str]] = None
+    ) -> Dict[Path, Dict[str, Any]]:
+        """Process documents one at a time, numbering only the successful ones."""
+        documents = {}
+        doc_ids = doc_ids or _DocIdSequence()
+        fixed_ids = fixed_ids or {}
+        
+        for file_path in file_paths:
+            doc_id = fixed_ids.get(file_path) or doc_ids.peek()
+            try:
+                documents[file_path] = self.process_document(file_path, doc_id, (pdf_paths or {}).get(file_path))
+                if file_path not in fixed_ids:
+                    doc_ids.take()
+                self._journal("document", file_path, durable=True, document=documents[file_path])
+            except Exception as e:
+                print(f"  ✗ Failed to process {file_path.name}: {e}")
+                self.metrics.count("documents_failed")
+                self._record_failure(file_path, e)
+                continue
+        
+        return documents
+    
+    def _process_documents_pipelined(
+        self,
+        file_paths: List[Path],
+        pdf_paths: Optional[Dict[Path, Path]] = None,
+        doc_ids: Optional[_DocIdSequence] = None,
+        fixed_ids: Optional[Dict[Path, str]] = None
+    ) -> Dict[Path, Dict[str, Any]]:
+        """
+        Run conversion, page extraction and summarization as overlapping stages.
+        
+        Each stage owns a worker pool and hands its futures to the next stage
+        through a bounded queue, so a slow stage applies backpressure instead of
+        letting work pile up in memory. Documents are collected in discovery
+        order. Because the final doc_id depends on how many earlier documents
+        succeeded, pages are extracted under a pending id and moved into place
+        once the document's position is known.
+        """
+        print(
+            f"Pipelined mode: {self.conversion_workers} conversion / "
+            f"{self.raster_workers} extraction / {self.summary_workers} summarization workers"
+        )
+        
+        stage_queues = [queue.Queue(maxsize=self.pipeline_queue_size) for _ in range(4)]
+        documents = {}
+        
+        # A conversion pool does its work in its own soffice processes, so
+        # feeding it only needs threads. Otherwise every conversion process
+        # gets a private LibreOffice profile, copied from a seed made up front
+        pdf_paths = pdf_paths or {}
+        if self.conversion_pool is not None:
+            convert_pool = ThreadPoolExecutor(max_workers=self.conversion_workers)
+        else:
+            if any(
+                file_path.suffix.lower() != '.pdf' and file_path not in pdf_paths
+                and not self.reads_natively(file_path)
+                for file_path in file_paths
+            ):
+                self.libreoffice_profiles.seed()
+            import multiprocessing
+            slots = multiprocessing.Queue()
+            for slot in range(1, self.conversion_workers + 1):
+                slots.put(slot)
+            convert_pool = ProcessPoolExecutor(
+                max_workers=self.conversion_workers, initializer=_init_conversion_worker, initargs=(slots,)
+            )
+        
+        with convert_pool, \
+                ProcessPoolExecutor(max_workers=self.raster_workers) as raster_pool, \
+                ThreadPoolExecutor(
+                    max_workers=self.summary_workers, initializer=_init_summary_worker
+                ) as summary_pool:
+            # (result of the previous stage, submission of this stage's work)
+            # Natively read files pass the first two stages without a PDF
+            # and are read and summarized in the summarization stage
+            stages = [
+                ("file_path", lambda state: _completed_future(pdf_paths[state["file_path"]])
+                    if state["file_path"] in pdf_paths
+                    else _completed_future(None) if self.reads_natively(state["file_path"])
+                    else self._submit_measured(convert_pool, self.convert_to_pdf, state["file_path"])),
+                ("pdf_path", lambda state: _completed_future(None) if state["pdf_path"] is None
+                    else self._submit_extraction(raster_pool, state)),
+                ("page_paths", lambda state: summary_pool.submit(
+                    self.process_document, state["file_path"], state["pending_id"])
+                    if state["pdf_path"] is None
+                    else summary_pool.submit(
+                        self.summarize_document_pages, state["file_path"], state["pending_id"],
+                        state["pdf_path"], state["page_paths"])),
+            ]
+            
+            threads = [threading.Thread(
+                target=self._feed_pipeline, args=(file_paths, stage_queues[0], fixed_ids), daemon=True
+            )]
+            for stage_index, (result_key, submit) in enumerate(stages):
+                threads.append(threading.Thread(
+                    target=self._run_pipeline_stage,
+                    args=(stage_queues[stage_index], stage_queues[stage_index + 1], result_key, submit),
+                    daemon=True
+                ))
+            for thread in threads:
+                thread.start()
+            
+            doc_ids = doc_ids or _DocIdSequence()
+            fixed_ids = fixed_ids or {}
+            while True:
+                item = stage_queues[-1].get()
+                if item is _PIPELINE_DONE:
+                    break
+                state, future = item
                 try:
-                    document = self.process_document(file_path, doc_id)
-                    documents.append(document)
-                    doc_counter += 1
+                    document = future.result()
                 except Exception as e:
-                    print(f"  ✗ Failed to process {file_path.name}: {e}")
+                    print(f"  ✗ Failed to process {state['file_path'].name}: {e}")
+                    self.metrics.count("documents_failed")
+                    self._record_failure(state["file_path"], e)
+                    self._discard_pending_pages(state["pending_id"])
                     continue
+                doc_id = fixed_ids.get(state["file_path"]) or doc_ids.take()
+                documents[state["file_path"]] = self._relocate_document(document, doc_id)
+                self._journal("document", state["file_path"], durable=True, document=documents[state["file_path"]])
+            
+            for thread in threads:
+                thread.join()
+        
+        return documents
+    
+    def _feed_pipeline(
+        self,
+        file_paths: List[Path],
+        outbox: queue.Queue,
+        fixed_ids: Optional[Dict[Path, str]] = None
+    ) -> None:
+        """
+        Put every discovered file into the first pipeline queue.
+        
+        Documents whose id is already known (stable ids) are extracted
+        straight into their page folder; the others use a pending folder
+        derived from the path, so a resumed run finds the pages it rendered.
+        """
+        fixed_ids = fixed_ids or {}
+        for file_path in file_paths:
+            pending_id = fixed_ids.get(file_path)
+            if pending_id is None:
+                path_hash = hashlib.sha1(str(file_path).encode('utf-8')).hexdigest()[:12]
+                pending_id = f"_pending_{path_hash}"
+            state = {"pending_id": pending_id}
+            outbox.put((state, _completed_future(file_path)))
+        outbox.put(_PIPELINE_DONE)
+    
+    def _run_pipeline_stage(self, inbox: queue.Queue, outbox: queue.Queue, result_key: str, submit) -> None:
+        """
+        Wait for each upstream result in order and submit the next stage's work.
+        
+        Failed items are forwarded with their exception so the collector can
+        report them in the same position as the sequential path would.
+        """
+        while True:
+            item = inbox.get()
+            if item is _PIPELINE_DONE:
+                outbox.put(_PIPELINE_DONE)
+                return
+            state, future = item
+            try:
+                state[result_key] = future.result()
+                self._journal_stage_result(state, result_key)
+                next_future = submit(state)
+            except Exception as e:
+                next_future = _completed_future(exception=e)
+            outbox.put((state, next_future))
+    
+    def _submit_extraction(self, raster_pool, state: Dict[str, Any]) -> Future:
+        """Render a document's pages, unless an interrupted run already did."""
+        if self.lazy_pages:
+            try:
+                return _completed_future(self.lazy_page_slots(state["pdf_path"]))
+            except Exception as e:
+                return _completed_future(exception=e)
+        page_paths = self._resumed_page_paths(state["file_path"], state["pending_id"])
+        if page_paths is not None:
+            return _completed_future(page_paths)
+        pdf_path, doc_id = state["pdf_path"], state["pending_id"]
+        if self.split_workers <= 1:
+            return self._submit_measured(raster_pool, self.extract_pages_as_images, pdf_path, doc_id)
+        
+        # The ranges of a long document share the raster pool with other
+        # documents rather than starting a pool inside a raster worker
+        (self.pages_folder / doc_id).mkdir(exist_ok=True)
+        ranges = self.page_ranges(self.get_pdf_page_count(pdf_path)) or [(1, 0)]
+        return self._concatenated([
+            self._submit_measured(raster_pool, self.extract_page_range, pdf_path, doc_id, first_page, last_page)
+            for first_page, last_page in ranges
+        ])
+    
+    @staticmethod
+    def _concatenated(futures: List[Future]) -> Future:
+        """Future of the lists returned by `futures`, joined in order."""
+        outer: Future = Future()
+        remaining = [len(futures)]
+        lock = threading.Lock()
+        
+        def finish(_) -> None:
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            errors = [future.exception() for future in futures if future.exception() is not None]
+            if errors:
+                outer.set_exception(errors[0])
+            else:
+                outer.set_result([item for future in futures for item in future.result()])
+        
+        for future in futures:
+            future.add_done_callback(finish)
+        return outer
+    
+    def _submit_measured(self, executor, func, *args) -> Future:
+        """
+        Submit an indexer method to a worker pool, keeping what it measures.
         
-        # Build final index
+        Work done in another process is timed by that process's copy of the
+        metrics, which is merged into this run's metrics when it finishes.
+        """
+        outer: Future = Future()
+        
+        def finish(inner: Future) -> None:
+            error = inner.exception()
+            if error is not None:
+                outer.set_exception(error)
+                return
+            result, metrics = inner.result()
+            if metrics is not None and metrics is not self.metrics:
+                self.metrics.merge(metrics)
+            outer.set_result(result)
+        
+        executor.submit(_call_measured, func, args).add_done_callback(finish)
+        return outer
+    
+    def _journal_stage_result(self, state: Dict[str, Any], result_key: str) -> None:
+        """Journal a conversion or page rendering finished by a pipeline stage."""
+        progress = self._resume_progress.get(state["file_path"]) or {}
+        if result_key != "file_path" and state["pdf_path"] is None:
+            # Read natively; process_document journals its own progress
+            return
+        if result_key == "pdf_path" and progress.get("pdf_path") != str(state["pdf_path"]):
+            self._journal("pdf", state["file_path"], pdf_path=str(state["pdf_path"]))
+        elif result_key == "page_paths" and not self.lazy_pages:
+            page_paths = [str(path) for path in state["page_paths"]]
+            if progress.get("page_paths") != page_paths:
+                self._journal("pages", state["file_path"], page_paths=page_paths)
+    
+    def _relocate_document(self, document: Dict[str, Any], doc_id: str, keep_source: bool = False) -> Dict[str, Any]:
+        """
+        Move a document's pages from its pending id to its final doc_id.
+        
+        With keep_source the pages are copied instead, leaving the old folder
+        for _remove_stale_page_folders once the new index is written.
+        """
+        pending_folder = self.pages_folder / document["doc_id"]
+        final_folder = self.pages_folder / doc_id
+        if pending_folder.exists() and pending_folder != final_folder:
+            if final_folder.exists():
+                shutil.rmtree(final_folder)
+            if keep_source:
+                shutil.copytree(pending_folder, final_folder)
+            else:
+                pending_folder.rename(final_folder)
+        
+        document["doc_id"] = doc_id
+        for page in document["pages"]:
+            if page.get("page_image"):
+                page["page_image"] = str(final_folder / Path(page["page_image"]).name)
+        return document
+    
+    def _discard_pending_pages(self, pending_id: str) -> None:
+        """Remove pages extracted for a document that failed a later stage."""
+        pending_folder = self.pages_folder / pending_id
+        if pending_folder.exists():
+            shutil.rmtree(pending_folder, ignore_errors=True)
+    
+    def _write_index(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the final index structure and save it to JSON."""
         data_room_index = {
             "metadata": {
                 "total_documents": len(documents),
-                "created_at": str(Path.ctime(self.output_folder)),
+                "created_at": datetime.now().isoformat(),
                 "model_used": self.summarization_model
             },
             "documents": documents
         }
         
-        # Save index to JSON
-        index_path = self.output_folder / "data_room_index.json"
-        with open(index_path, 'w', encoding='utf-8') as f:
-            json.dump(data_room_index, f, indent=2, ensure_ascii=False)
+        # Save index in the configured format
+        with self.metrics.stage("write_index", documents=len(documents)):
+            index_path = write_data_room_index(data_room_index, self.output_folder, self.index_format)
         
         print("\n" + "=" * 70)
         print("Data Room Indexing Complete!")
         print("=" * 70)
         print(f"Total documents processed: {len(documents)}")
         print(f"Index saved to: {index_path}")
-        
+        if self.summary_cache is not None:
+            stats = self.summary_cache.stats()
+            print(f"Summary cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+        if self.lazy_pages:
+            stats = self.render_cache.stats()
+            print(f"Render cache: {stats['files']} page images, {stats['bytes'] / 2**20:.1f} MB "
+                  f"(pages are rendered on demand)")
+        if self.summarizer is not None:
+            # Requests made inside worker processes are counted in those processes
+            usage = self.summarizer.usage()
+            print(f"Summarizer: {usage['calls']} calls, {usage['prompt_tokens']} prompt tokens, "
+                  f"{usage['completion_tokens']} completion tokens")
+        self.metrics.finish()
+        self.metrics.report()
+        images = self.image_storage_report()
+        if images["pages"]:
+            print(f"Page images ({images['format']}): {images['bytes'] / 2**20:.1f} MB, "
+                  f"{images['bytes_per_page']} bytes/page")
+            if "baseline_bytes" in images:
+                print(f"  Lossless PNG would take {images['baseline_bytes'] / 2**20:.1f} MB: saved "
+                      f"{images['saved_bytes_per_page']} bytes/page ({images['saved_fraction']:.0%})")
+
         return data_room_index
     
     def load_index(self, index_path: Path = None) -> Dict[str, Any]:
-        """Load a previously created data room index."""
-        if index_path is None:
-            index_path = self.output_folder / "data_room_index.json"
+        """
+        Load a previously created data room index.
         
-        with open(index_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        The format is detected, so either a data_room_index.json or a sharded
+        catalog can be given; by default the index in the output folder is
+        loaded. Pages of a sharded index are read lazily.
+        """
+        return read_data_room_index(index_path or self.output_folder)
 
 
 # ============================================================================
@@ -410,7 +5079,7 @@ def main():
     indexer = DataRoomIndexer(
         input_folder=input_folder,
         output_folder=output_folder,
-        summarization_model="gpt-4o-mini",  # Use "gpt-5-nano" when available
+        summarizer=OpenAISummarizer(model="gpt-4o-mini"),  # or StubSummarizer() offline
         dpi=200  # Image quality for page extraction
     )
     
@@ -509,7 +509,8 @@ def create_agent_with_hitl(
     approval_level: Dict[str, Any],
     review_interface: ReviewInterface,
     reviewer_name: str = "human",
-    enable_audit: bool = True
+    enable_audit: bool = True,
+    page_renderer: Optional[Callable] = None
 ):
     """
     Create Legal Risk Analysis Agent with human-in-the-loop approval.
@@ -520,12 +521,17 @@ def create_agent_with_hitl(
         review_interface: Interface for human review
         reviewer_name: Name of the reviewer for audit logs
         enable_audit: Whether to log all review decisions
+        page_renderer: Renders page images on demand for lazily indexed
+            data rooms (see DataRoom)
         
     Returns:
         Configured agent with HITL enabled
     """
     # Create the base agent with interrupts configured
-    agent = create_legal_risk_analysis_agent(data_room_index)
+    if page_renderer is not None:
+        agent = create_legal_risk_analysis_agent(data_room_index, page_renderer)
+    else:
+        agent = create_legal_risk_analysis_agent(data_room_index)
     
     # Note: The agent's interrupt_on configuration would be set during creation
     # For this example, we'll show how to wrap the invocation with HITL handling
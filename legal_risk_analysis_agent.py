@@ -8,7 +8,7 @@ This system creates a sophisticated legal risk analysis agent that:
 4. Creates interactive dashboards (web artifacts)
 """
 
-from typing import List, Dict, Any, Literal
+from typing import List, Dict, Any, Literal, Optional, Callable
 import json
 from deepagents import create_deep_agent, CompiledSubAgent
 from deepagents.backends import CompositeBackend, StateBackend, StoreBackend
@@ -29,37 +29,69 @@ class DataRoom:
     {
         "documents": [
             {
-                "doc_id": "doc_001",
+                "doc_id": "doc_3f9a2c41b7e0",
+                "legacy_ids": ["doc_001"],        # optional: earlier ids, still accepted
+                "folder": "Finance/Audits",       # optional: location in the data room
                 "summdesc": "Summary of entire document",
                 "pages": [
                     {
                         "page_num": 1,
                         "summdesc": "Summary of page 1",
-                        "page_image": "base64_encoded_image_or_path"
+                        "page_image": "base64_encoded_image_or_path",  # None: render on demand
+                        "cluster_id": "pc_...",   # optional: near-identical page group
+                        "duplicate": False        # optional: copy of an earlier page
+                    }
+                ],
+                "sections": [                     # optional: long documents only
+                    {
+                        "section_id": "L1_S001",
+                        "level": 1,
+                        "page_start": 1,
+                        "page_end": 20,
+                        "summdesc": "Summary of pages 1-20"
                     }
                 ]
             }
         ]
     }
     """
-    def __init__(self, data_room_index: Dict[str, Any]):
+    def __init__(
+        self,
+        data_room_index: Dict[str, Any],
+        page_renderer: Optional[Callable[[Dict[str, Any], int, Optional[int]], str]] = None
+    ):
         self.data_room_index = data_room_index
+        # Renders a page image on demand: (document, page_num, dpi) -> image
+        # path. Needed for lazily indexed data rooms, whose pages have no
+        # stored image (e.g. PageRenderCache.render_document_page).
+        self.page_renderer = page_renderer
+        # Earlier ids of each document (e.g. sequential ids used before stable
+        # ids were introduced) so existing references keep resolving
+        self.aliases = {
+            legacy_id: doc["doc_id"]
+            for doc in data_room_index["documents"]
+            for legacy_id in doc.get("legacy_ids", [])
+        }
     
     def get_document_index(self) -> List[Dict[str, str]]:
-        """Returns simplified index with doc_id and summdesc only"""
-        return [
-            {
+        """Returns simplified index with doc_id and summdesc (and folder, when known)"""
+        index = []
+        for doc in self.data_room_index["documents"]:
+            entry = {
                 "doc_id": doc["doc_id"],
                 "summdesc": doc["summdesc"]
             }
-            for doc in self.data_room_index["documents"]
-        ]
+            if "folder" in doc:
+                entry["folder"] = doc["folder"]
+            index.append(entry)
+        return index
     
     def get_document(self, doc_id: str) -> Dict[str, Any]:
-        """Returns full document with all pages"""
-        for doc in self.data_room_index["documents"]:
-            if doc["doc_id"] == doc_id:
-                return doc
+        """Returns full document with all pages; legacy ids are accepted too"""
+        for candidate in (doc_id, self.aliases.get(doc_id)):
+            for doc in self.data_room_index["documents"]:
+                if doc["doc_id"] == candidate:
+                    return doc
         return None
     
     def get_document_pages_summary(self, doc_id: str) -> str:
@@ -68,14 +100,48 @@ class DataRoom:
         if not doc:
             return f"Error: Document {doc_id} not found"
         
-        page_summaries = [
-            f"Page {page['page_num']}: {page['summdesc']}"
-            for page in doc["pages"]
-        ]
+        page_summaries = []
+        for page in doc["pages"]:
+            # Flag pages the indexer identified as blank or as copies of a
+            # page seen earlier in the data room, so they can be skipped
+            if page.get("blank"):
+                marker = " [blank page]"
+            elif page.get("duplicate"):
+                marker = f" [duplicate page, cluster {page.get('cluster_id')}]"
+            else:
+                marker = ""
+            page_summaries.append(f"Page {page['page_num']}{marker}: {page['summdesc']}")
         return "\n\n".join(page_summaries)
     
-    def get_document_pages_images(self, doc_id: str, page_nums: List[int]) -> List[Dict[str, Any]]:
-        """Returns page images for specified pages"""
+    def get_document_sections_summary(self, doc_id: str) -> str:
+        """Returns section summaries of a long document, coarsest level first"""
+        doc = self.get_document(doc_id)
+        if not doc:
+            return f"Error: Document {doc_id} not found"
+        
+        sections = doc.get("sections")
+        if not sections:
+            return self.get_document_pages_summary(doc_id)
+        
+        ordered = sorted(sections, key=lambda s: (-s["level"], s["page_start"]))
+        return "\n\n".join(
+            f"Pages {section['page_start']}-{section['page_end']} "
+            f"(level {section['level']}): {section['summdesc']}"
+            for section in ordered
+        )
+    
+    def get_document_pages_images(
+        self,
+        doc_id: str,
+        page_nums: List[int],
+        dpi: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Returns page images for specified pages.
+        
+        Pages without a stored image, and every page when a DPI is requested,
+        are rendered by the page renderer when one is configured.
+        """
         doc = self.get_document(doc_id)
         if not doc:
             return [{"error": f"Document {doc_id} not found"}]
@@ -84,11 +150,25 @@ class DataRoom:
         for page_num in page_nums:
             page = next((p for p in doc["pages"] if p["page_num"] == page_num), None)
             if page:
-                results.append({
+                page_image = page.get("page_image")
+                if self.page_renderer is not None and (not page_image or dpi):
+                    try:
+                        page_image = self.page_renderer(doc, page_num, dpi)
+                    except Exception as e:
+                        results.append({
+                            "page_num": page_num,
+                            "error": f"Could not render page {page_num} of document {doc_id}: {e}"
+                        })
+                        continue
+                result = {
                     "page_num": page_num,
-                    "page_image": page["page_image"],
+                    "page_image": page_image,
                     "summdesc": page["summdesc"]
-                })
+                }
+                if page.get("cluster_id"):
+                    result["cluster_id"] = page["cluster_id"]
+                    result["duplicate"] = page.get("duplicate", False)
+                results.append(result)
             else:
                 results.append({
                     "page_num": page_num,
@@ -106,12 +186,15 @@ def create_data_room_tools(data_room: DataRoom):
     """Creates tools for accessing the data room"""
     
     @tool
-    def get_document(doc_id: str) -> str:
+    def get_document(doc_id: str, sections: bool = False) -> str:
         """
         Retrieve a document's complete page-by-page summary.
         
         Args:
             doc_id: The unique identifier for the document (e.g., "doc_001")
+            sections: If True, return section summaries (each covering a page
+                range) instead of every page. Useful for very long documents;
+                falls back to page summaries when the document has no sections.
             
         Returns:
             Combined summary of all pages in the document, with each page's
@@ -120,16 +203,20 @@ def create_data_room_tools(data_room: DataRoom):
         Use this when you need to understand the full content of a document
         without viewing the actual page images.
         """
+        if sections:
+            return data_room.get_document_sections_summary(doc_id)
         return data_room.get_document_pages_summary(doc_id)
     
     @tool
-    def get_document_pages(doc_id: str, page_nums: List[int]) -> str:
+    def get_document_pages(doc_id: str, page_nums: List[int], dpi: Optional[int] = None) -> str:
         """
         Retrieve specific page images and summaries from a document.
         
         Args:
             doc_id: The unique identifier for the document
             page_nums: List of page numbers to retrieve (e.g., [1, 3, 5])
+            dpi: Optional resolution to render the pages at (e.g. 300 to read
+                fine print); the stored resolution is used when omitted
             
         Returns:
             JSON string containing page images and summaries for the requested pages.
@@ -138,7 +225,7 @@ def create_data_room_tools(data_room: DataRoom):
         Use this when you need to examine the actual content of specific pages,
         such as reviewing signatures, tables, charts, or specific clauses.
         """
-        results = data_room.get_document_pages_images(doc_id, page_nums)
+        results = data_room.get_document_pages_images(doc_id, page_nums, dpi)
         return json.dumps(results, indent=2)
     
     @tool
@@ -147,7 +234,8 @@ def create_data_room_tools(data_room: DataRoom):
         List all documents available in the data room with their summaries.
         
         Returns:
-            JSON string containing all documents with their doc_id and summdesc.
+            JSON string containing all documents with their doc_id and summdesc,
+            plus the data room folder each document was filed in when known.
             
         Use this to get an overview of all available documents before starting
         your analysis. This helps you plan which documents to examine in detail.
@@ -434,19 +522,24 @@ Remember: This dashboard will be used by executives who need to quickly understa
 # AGENT CREATION FUNCTION
 # ============================================================================
 
-def create_legal_risk_analysis_agent(data_room_index: Dict[str, Any]):
+def create_legal_risk_analysis_agent(
+    data_room_index: Dict[str, Any],
+    page_renderer: Optional[Callable[[Dict[str, Any], int, Optional[int]], str]] = None
+):
     """
     Creates the main Legal Risk Analysis Deep Agent with all subagents.
     
     Args:
         data_room_index: Dictionary containing the data room structure
+        page_renderer: Renders page images on demand (see DataRoom); required
+            for lazily indexed data rooms
         
     Returns:
         Configured deep agent ready for legal risk analysis
     """
     
     # Initialize data room
-    data_room = DataRoom(data_room_index)
+    data_room = DataRoom(data_room_index, page_renderer)
     
     # Create data room tools
     data_room_tools = create_data_room_tools(data_room)
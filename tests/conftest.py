@@ -51,6 +51,15 @@ def mock_tool_decorator(func):
 
 sys.modules['langchain_core.tools'].tool = mock_tool_decorator
 
+# Keep the real Pillow, when installed, for tests that need actual images
+try:
+    import PIL.Image
+    REAL_PIL_MODULES = {
+        name: module for name, module in sys.modules.items() if name == 'PIL' or name.startswith('PIL.')
+    }
+except ImportError:
+    REAL_PIL_MODULES = {}
+
 # Mock pdf2image and PIL
 sys.modules['pdf2image'] = MagicMock()
 sys.modules['PIL'] = MagicMock()
@@ -155,6 +164,34 @@ def temp_dir():
         yield Path(tmpdir)
 
 
+@pytest.fixture
+def pil_image(monkeypatch):
+    """Provides the real PIL.Image module, skipping when Pillow is not installed.
+
+    The mocked PIL modules are swapped out for the test, since Pillow
+    imports its plugins lazily.
+    """
+    if not REAL_PIL_MODULES:
+        pytest.skip("could not import 'PIL': No module named 'PIL'")
+    for name, module in REAL_PIL_MODULES.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    return REAL_PIL_MODULES['PIL.Image']
+
+
+@pytest.fixture
+def make_indexer(temp_dir):
+    """Provides a factory for DataRoomIndexer instances reading temp_dir/input."""
+    from data_room_indexer import DataRoomIndexer
+
+    def factory(**kwargs):
+        input_folder = temp_dir / "input"
+        input_folder.mkdir(exist_ok=True)
+        kwargs.setdefault("output_folder", str(temp_dir / "output"))
+        return DataRoomIndexer(input_folder=str(input_folder), **kwargs)
+
+    return factory
+
+
 @pytest.fixture
 def temp_input_folder(temp_dir):
     """Provides a temporary input folder with sample files."""
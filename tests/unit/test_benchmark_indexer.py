@@ -0,0 +1,176 @@
+"""
+Unit tests for the indexer benchmark suite in benchmark_indexer.py
+"""
+
+import pytest
+import json
+import os
+import re
+import sys
+import zlib
+import random
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from benchmark_indexer import (
+    SCAN_HEIGHT,
+    SCAN_WIDTH,
+    compare_results,
+    folder_size,
+    generate_data_room,
+    main,
+    run_scenario,
+    write_docx,
+    write_scanned_pdf,
+    write_text_pdf,
+)
+from data_room_indexer import DataRoomIndexer
+
+
+def _check_xref(data: bytes) -> int:
+    """Assert every xref entry points at its object; return the page count."""
+    xref_offset = int(re.search(rb"startxref\n(\d+)", data).group(1))
+    assert data[xref_offset:xref_offset + 4] == b"xref"
+    entries = re.findall(rb"(\d{10}) 00000 n", data[xref_offset:])
+    for number, offset in enumerate(entries, start=1):
+        assert data[int(offset):].startswith(f"{number} 0 obj".encode())
+    return int(re.search(rb"/Type /Pages .* /Count (\d+)", data).group(1))
+
+
+class TestGenerator:
+    """Tests for the synthetic data room generator."""
+
+    def test_text_pdf_structure(self, temp_dir):
+        """Test that text PDFs are well formed and carry their text."""
+        path = temp_dir / "a.pdf"
+        write_text_pdf(path, 3, random.Random(1))
+
+        data = path.read_bytes()
+        assert data.startswith(b"%PDF-1.4")
+        assert _check_xref(data) == 3
+        assert b"(Section 2. " in data
+
+    def test_scanned_pdf_has_page_images(self, temp_dir):
+        """Test that scanned PDFs hold one full-page grayscale image per page."""
+        path = temp_dir / "scan.pdf"
+        write_scanned_pdf(path, 2, random.Random(1))
+
+        data = path.read_bytes()
+        assert _check_xref(data) == 2
+        streams = re.findall(rb"/FlateDecode /Length (\d+) >>\nstream\n", data)
+        assert len(streams) == 2
+        start = data.index(b"stream\n", data.index(b"/FlateDecode")) + len(b"stream\n")
+        pixels = zlib.decompress(data[start:start + int(streams[0])])
+        assert len(pixels) == SCAN_WIDTH * SCAN_HEIGHT
+        assert min(pixels) < 100 and max(pixels) > 228
+
+    def test_docx_page_breaks(self, temp_dir):
+        """Test that Word documents get a page break between pages."""
+        docx_module = MagicMock()
+        with patch.dict(sys.modules, {"docx": docx_module}):
+            write_docx(temp_dir / "a.docx", 4, random.Random(1))
+
+        document = docx_module.Document.return_value
+        assert document.add_page_break.call_count == 3
+        document.save.assert_called_once_with(str(temp_dir / "a.docx"))
+
+    def test_generation_is_reproducible(self, temp_dir):
+        """Test that the same seed produces the same files and manifest."""
+        first = generate_data_room(str(temp_dir / "a"), 3, 2, 0, 0, pages=(1, 4), seed=7)
+        second = generate_data_room(str(temp_dir / "b"), 3, 2, 0, 0, pages=(1, 4), seed=7)
+
+        assert first == second
+        assert first["files"] == 5
+        assert first["bytes"] == folder_size(temp_dir / "a")
+        files = sorted(p.relative_to(temp_dir / "a") for p in (temp_dir / "a").rglob("*.pdf"))
+        assert files == sorted(p.relative_to(temp_dir / "b") for p in (temp_dir / "b").rglob("*.pdf"))
+        for relative in files:
+            assert (temp_dir / "a" / relative).read_bytes() == (temp_dir / "b" / relative).read_bytes()
+
+    def test_page_counts_match_manifest(self, temp_dir):
+        """Test that the manifest's page counts are the pages actually written."""
+        room = generate_data_room(str(temp_dir / "room"), 4, 1, 0, 0, pages=(2, 5), seed=3)
+
+        pages = sum(_check_xref(path.read_bytes()) for path in (temp_dir / "room").rglob("*.pdf"))
+        assert pages == room["pages"]
+        assert room["by_kind"]["scanned_pdf"]["files"] == 1
+        assert len({path.parent.name for path in (temp_dir / "room").rglob("*.pdf")}) == 4
+
+
+class TestRunner:
+    """Tests for running and comparing benchmarks."""
+
+    @staticmethod
+    def _fake_extract(self, pdf_path, doc_id):
+        """Write one fake page per page of the synthetic PDF."""
+        folder = self.pages_folder / doc_id
+        folder.mkdir(exist_ok=True)
+        paths = []
+        for i in range(1, _check_xref(pdf_path.read_bytes()) + 1):
+            paths.append(folder / f"page_{i:03d}.png")
+            paths[-1].write_bytes(f"{pdf_path.name} {i}".encode())
+        return paths
+
+    def test_run_scenario_records_results(self, temp_dir):
+        """Test a scenario end to end with the stub summarizer."""
+        room = generate_data_room(str(temp_dir / "room"), 2, 1, 0, 0, pages=(1, 3), seed=1)
+
+        with patch.object(DataRoomIndexer, 'extract_pages_as_images', self._fake_extract), \
+                patch.object(DataRoomIndexer, 'extract_page_texts', return_value=[]), \
+                patch.object(DataRoomIndexer, 'is_blank_page', return_value=False), \
+                patch.object(DataRoomIndexer, 'page_hash', return_value=None):
+            result = run_scenario("sequential", str(temp_dir / "room"), str(temp_dir / "out"))
+
+        assert result["documents"] == 3
+        assert result["pages"] == room["pages"]
+        assert result["model_calls"] == room["pages"] + 3
+        assert result["bytes_written"] == folder_size(temp_dir / "out") > 0
+        assert result["pages_per_second"] > 0
+        assert "summarize_page" in result["stages"]
+        if sys.platform != "win32":
+            assert result["peak_rss_bytes"] > 0
+
+    def test_compare_results_flags_regressions(self):
+        """Test that only changes beyond the tolerance in the wrong direction count."""
+        baseline = {"scenarios": {
+            "sequential": {"wall_seconds": 10.0, "pages_per_second": 5.0, "peak_rss_bytes": 100, "bytes_written": 50},
+            "pipelined": {"wall_seconds": 4.0, "pages_per_second": 12.0, "peak_rss_bytes": 100, "bytes_written": 50},
+        }}
+        current = {"scenarios": {
+            "sequential": {"wall_seconds": 12.0, "pages_per_second": 4.0, "peak_rss_bytes": 105, "bytes_written": 40},
+            "pipelined": {"wall_seconds": 3.0, "pages_per_second": 16.0, "peak_rss_bytes": None, "bytes_written": 50},
+            "new": {"wall_seconds": 1.0},
+        }}
+
+        regressions = compare_results(baseline, current, tolerance=0.1)
+
+        assert len(regressions) == 2
+        assert regressions[0].startswith("sequential: wall_seconds")
+        assert regressions[1].startswith("sequential: pages_per_second")
+
+    def test_main_saves_and_compares(self, temp_dir):
+        """Test the command line: generate, run, save and compare."""
+        fake_results = {"scenarios": {"sequential": {
+            "documents": 1, "pages": 2, "wall_seconds": 1.0, "pages_per_second": 2.0,
+            "peak_rss_bytes": 1, "bytes_written": 1
+        }}}
+        baseline = temp_dir / "baseline.json"
+        baseline.write_text(json.dumps({"scenarios": {"sequential": {"wall_seconds": 0.5}}}))
+        output = temp_dir / "results.json"
+
+        with patch('benchmark_indexer.run_benchmarks', return_value=fake_results) as run:
+            code = main([
+                "--room", str(temp_dir / "room"), "--work", str(temp_dir / "runs"),
+                "--text-pdfs", "1", "--scanned-pdfs", "0", "--docx", "0", "--xlsx", "0",
+                "--pages", "2-2", "--scenario", "sequential",
+                "--output", str(output), "--compare", str(baseline)
+            ])
+
+        assert code == 1
+        assert run.call_args.args[2] == ["sequential"]
+        saved = json.loads(output.read_text())
+        assert saved["data_room"]["pages"] == 2
+        assert (temp_dir / "room" / "benchmark_room.json").exists()
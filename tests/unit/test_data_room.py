@@ -54,6 +54,15 @@ class TestGetDocumentIndex:
         assert "doc_002" in doc_ids
         assert "doc_003" in doc_ids
 
+    def test_get_document_index_includes_folder(self, sample_data_room_index):
+        """Test that the folder of a document is listed when the indexer recorded it."""
+        sample_data_room_index["documents"][0]["folder"] = "Commercial/MSAs"
+        data_room = DataRoom(sample_data_room_index)
+        index = data_room.get_document_index()
+
+        assert index[0]["folder"] == "Commercial/MSAs"
+        assert "folder" not in index[1]
+
     def test_get_document_index_empty(self, empty_data_room_index):
         """Test get_document_index with empty data room."""
         data_room = DataRoom(empty_data_room_index)
@@ -99,6 +108,15 @@ class TestGetDocument:
         assert doc["pages"][0]["page_num"] == 1
         assert doc["pages"][1]["page_num"] == 2
 
+    def test_get_document_by_legacy_id(self, sample_data_room_index):
+        """Test that earlier ids of a document still resolve to it."""
+        sample_data_room_index["documents"][1]["legacy_ids"] = ["doc_legacy_7"]
+        data_room = DataRoom(sample_data_room_index)
+
+        assert data_room.get_document("doc_legacy_7")["doc_id"] == "doc_002"
+        assert "Page 1:" in data_room.get_document_pages_summary("doc_legacy_7")
+        assert data_room.get_document("doc_001")["doc_id"] == "doc_001"
+
     def test_get_document_empty_data_room(self, empty_data_room_index):
         """Test get_document with empty data room."""
         data_room = DataRoom(empty_data_room_index)
@@ -146,6 +164,55 @@ class TestGetDocumentPagesSummary:
         # Should not have multiple page separators
         assert summary.count("\n\n") == 0
 
+    def test_get_pages_summary_marks_blank_and_duplicate_pages(self, sample_data_room_index):
+        """Test that pages flagged by the indexer are labelled for the agent."""
+        pages = sample_data_room_index["documents"][0]["pages"]
+        pages[1].update({"blank": True})
+        pages[2].update({"cluster_id": "pc_00ff", "duplicate": True})
+        data_room = DataRoom(sample_data_room_index)
+
+        summary = data_room.get_document_pages_summary("doc_001")
+
+        assert "Page 1: Title page" in summary
+        assert "Page 2 [blank page]:" in summary
+        assert "Page 3 [duplicate page, cluster pc_00ff]:" in summary
+
+
+class TestGetDocumentSectionsSummary:
+    """Tests for get_document_sections_summary method."""
+
+    def test_sections_listed_coarsest_first(self, sample_data_room_index):
+        """Test that higher-level sections come before their parts."""
+        sample_data_room_index["documents"][0]["sections"] = [
+            {"section_id": "L1_S001", "level": 1, "page_start": 1, "page_end": 2, "summdesc": "Opening"},
+            {"section_id": "L1_S002", "level": 1, "page_start": 3, "page_end": 3, "summdesc": "Payment"},
+            {"section_id": "L2_S001", "level": 2, "page_start": 1, "page_end": 3, "summdesc": "Whole"},
+        ]
+        data_room = DataRoom(sample_data_room_index)
+
+        summary = data_room.get_document_sections_summary("doc_001").split("\n\n")
+
+        assert summary == [
+            "Pages 1-3 (level 2): Whole",
+            "Pages 1-2 (level 1): Opening",
+            "Pages 3-3 (level 1): Payment",
+        ]
+
+    def test_falls_back_to_pages(self, sample_data_room_index):
+        """Test that documents without sections return page summaries."""
+        data_room = DataRoom(sample_data_room_index)
+        tools = create_data_room_tools(data_room)
+
+        get_doc_tool = next(t for t in tools if t.name == "get_document")
+        result = get_doc_tool.invoke({"doc_id": "doc_002", "sections": True})
+
+        assert "Page 1:" in result
+
+    def test_sections_not_found(self, sample_data_room_index):
+        """Test section summary for a non-existent document."""
+        data_room = DataRoom(sample_data_room_index)
+        assert "not found" in data_room.get_document_sections_summary("doc_999")
+
 
 class TestGetDocumentPagesImages:
     """Tests for get_document_pages_images method."""
@@ -206,6 +273,40 @@ class TestGetDocumentPagesImages:
             assert result["page_num"] == i
             assert "page_image" in result
 
+    def test_lazy_pages_are_rendered_on_demand(self, sample_data_room_index):
+        """Test that pages without a stored image go to the page renderer."""
+        for page in sample_data_room_index["documents"][0]["pages"]:
+            page["page_image"] = None
+        calls = []
+
+        def renderer(doc, page_num, dpi):
+            calls.append((doc["doc_id"], page_num, dpi))
+            return f"/cache/{doc['doc_id']}_{page_num}.png"
+
+        data_room = DataRoom(sample_data_room_index, page_renderer=renderer)
+        results = data_room.get_document_pages_images("doc_001", [2])
+
+        assert results[0]["page_image"] == "/cache/doc_001_2.png"
+        assert calls == [("doc_001", 2, None)]
+
+    def test_requested_dpi_rerenders_stored_pages(self, sample_data_room_index):
+        """Test that asking for a DPI renders even pages that have a stored image."""
+        data_room = DataRoom(sample_data_room_index, page_renderer=lambda doc, page_num, dpi: f"/cache/{dpi}.png")
+
+        assert data_room.get_document_pages_images("doc_001", [1])[0]["page_image"] == "/path/to/doc_001/page_001.png"
+        assert data_room.get_document_pages_images("doc_001", [1], dpi=300)[0]["page_image"] == "/cache/300.png"
+
+    def test_render_failure_is_reported(self, sample_data_room_index):
+        """Test that a failing renderer yields an error entry, not an exception."""
+        def renderer(doc, page_num, dpi):
+            raise FileNotFoundError("PDF missing")
+
+        data_room = DataRoom(sample_data_room_index, page_renderer=renderer)
+        results = data_room.get_document_pages_images("doc_001", [1, 2], dpi=150)
+
+        assert len(results) == 2
+        assert "PDF missing" in results[0]["error"]
+
 
 class TestCreateDataRoomTools:
     """Tests for create_data_room_tools function."""
@@ -264,6 +365,16 @@ class TestCreateDataRoomTools:
         assert parsed[0]["page_num"] == 1
         assert parsed[1]["page_num"] == 2
 
+    def test_get_document_pages_tool_passes_dpi(self, sample_data_room_index):
+        """Test that the tool forwards a requested DPI to the page renderer."""
+        data_room = DataRoom(sample_data_room_index, page_renderer=lambda doc, page_num, dpi: f"/cache/{page_num}@{dpi}.png")
+        tools = create_data_room_tools(data_room)
+
+        get_pages_tool = next(t for t in tools if t.name == "get_document_pages")
+        parsed = json.loads(get_pages_tool.invoke({"doc_id": "doc_001", "page_nums": [3], "dpi": 300}))
+
+        assert parsed[0]["page_image"] == "/cache/3@300.png"
+
 
 class TestDataRoomEdgeCases:
     """Edge case tests for DataRoom."""